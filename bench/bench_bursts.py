@@ -0,0 +1,181 @@
+"""
+Посты, которые Telegram присылает частями: прежний хендлер (каждое сообщение — отдельный разбор,
+голая ссылка отклоняется) против склейки частей (BurstAggregator). Несколько чатов одновременно
+шлют вперемешку: пересланный текст + ссылка следом, подписи альбома, длинный пост из двух сообщений,
+пачку полных пересылок из одного канала (их склеивать нельзя) и обычные набранные посты.
+Считаются вызовы модели (локальный классификатор выключен), задачи разбора, ожидания ссылки (wait_link),
+отклоненные ссылки и задержка до статусного сообщения.
+
+    python bench/bench_bursts.py [--chats 12] [--rounds 3] [--latency 0.05]
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TOPICS = (
+    "нейросеть собирает презентацию из конспекта и сама подбирает дизайн слайдов",
+    "сервис чистит фон на фотографиях и увеличивает разрешение без потери качества",
+    "расширение пересказывает длинные видео на YouTube и делает таймкоды",
+    "бот в телеграме расшифровывает голосовые и присылает текстом",
+)
+
+
+def scenario(tag, chat, rnd):
+    """
+    Один раунд чата: [(пауза перед сообщением, kwargs FakeMessage, вид)], вид — для подсчета задержек.
+    """
+    def topic():
+        return rnd.choice(TOPICS)
+
+    def url(kind):
+        return f"https://{kind}-{tag}-{chat}-{rnd.randrange(10 ** 9)}.example.app/tool"
+
+    channel = 10 ** 6 + chat
+    part_gap = lambda: rnd.uniform(0.03, 0.15)
+    post_gap = lambda: rnd.uniform(0.8, 1.5)
+    items = []
+    # Пересланный пост: текст, следом ссылка отдельным сообщением
+    items += [(post_gap(), {"text": f"Forward {tag}{chat}: {topic()}", "forward_channel": channel}, "split"),
+              (part_gap(), {"text": url("split"), "forward_channel": channel}, "part")]
+    # Альбом: подписи у двух фото
+    group = f"album-{tag}-{chat}-{rnd.randrange(10 ** 9)}"
+    items += [(post_gap(), {"text": f"Album {tag}{chat}: {topic()}", "media_group_id": group}, "album"),
+              (part_gap(), {"text": f"Скачать: {url('album')}", "media_group_id": group}, "part")]
+    # Длинный пост, разрезанный на два сообщения: ссылка во втором
+    items += [(post_gap(), {"text": f"Long {tag}{chat}: {topic()}. " * 4, "forward_channel": channel}, "long"),
+              (part_gap(), {"text": f"Продолжение: {topic()} — {url('long')}", "forward_channel": channel}, "part")]
+    # Пачка полных пересылок из одного канала — три разных поста
+    for n in range(3):
+        items.append((part_gap() if n else post_gap(),
+                      {"text": f"Batch {tag}{chat}-{n}: {topic()} {url('batch')}", "forward_channel": channel}, "batch"))
+    # Обычный набранный пост со ссылкой
+    items.append((post_gap(), {"text": f"Typed {tag}{chat}: {topic()} {url('typed')}"}, "typed"))
+    return items
+
+
+async def legacy_handler(main, message, state):
+    # Копия прежнего main_content_handler
+    content = message.text or message.caption or ""
+    if re.match(r'^https?://\S+$', content.strip()):
+        await message.reply("⚠️ Это просто ссылка. Если это дополнение к посту, то я потерял контекст. Пожалуйста, отправь пост целиком.")
+        return
+    if len(content.strip()) < 5:
+        return
+    main.prefetch_link(content)
+    await main.bot.send_chat_action(chat_id=message.chat.id, action="typing")
+    status_msg = await message.answer("🌌 <i>В очереди на сканирование...</i>", parse_mode=main.ParseMode.HTML)
+    main.jobs.enqueue(
+        "ingest", "analyze", {"content": content}, main.PRIORITY_INGEST,
+        chat_id=message.chat.id, user_id=message.from_user.id, message_id=status_msg.message_id
+    )
+
+
+async def run_variant(main, fakes, variant, args):
+    rnd = random.Random(7)
+    hf_calls = main.hf.calls
+    with main.jobs._lock:
+        first_job = main.jobs._db.execute("SELECT COALESCE(MAX(id), 0) FROM jobs").fetchone()[0]
+    delays = {}
+    rejected = 0
+
+    async def chat(chat_id):
+        nonlocal rejected
+        for _ in range(args.rounds):
+            for pause, kwargs, kind in scenario(variant[0], chat_id, rnd):
+                await asyncio.sleep(pause)
+                message = fakes.FakeMessage(chat_id=chat_id, user_id=chat_id, **kwargs)
+                sent = time.monotonic()
+                if variant == "legacy":
+                    await legacy_handler(main, message, None)
+                else:
+                    await main.main_content_handler(message, None)
+                rejected += any("потерял контекст" in reply.text for reply in message.replies)
+                if kind != "part":
+                    asyncio.create_task(wait_status(message, kind, sent))
+
+    async def wait_status(message, kind, sent):
+        while not message.replies:
+            await asyncio.sleep(0.005)
+        delays.setdefault(kind, []).append(time.monotonic() - sent)
+
+    await asyncio.gather(*(chat(10 + i) for i in range(args.chats)))
+    if variant != "legacy":
+        await main.post_bursts.flush()
+    await asyncio.sleep(0.05)
+    while True:
+        counts = main.jobs.counts()
+        if not counts.get("queued") and not counts.get("running"):
+            break
+        await asyncio.sleep(0.05)
+    await main.commit_queue.flush()
+
+    with main.jobs._lock:
+        rows = main.jobs._db.execute(
+            "SELECT state, payload FROM jobs WHERE kind = 'ingest' AND id > ?", (first_job,)
+        ).fetchall()
+    link_waits = sum(1 for state, payload in rows if state == "waiting" and json.loads(payload).get("waiting_for") == "link")
+    return {
+        "messages": args.chats * args.rounds * 10,
+        "analysis_jobs": len(rows),
+        "model_calls": main.hf.calls - hf_calls,
+        "link_waits": link_waits,
+        "rejected_links": rejected,
+        "status_delay_p50_ms": {kind: round(statistics.median(v) * 1000, 1) for kind, v in sorted(delays.items())},
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chats", type=int, default=12)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка ответа модели, с")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_bursts_")
+    for name, value in (("TG_TOKEN", "123456:bench"), ("GITHUB_TOKEN", "bench"), ("HF_TOKEN", "bench")):
+        os.environ.setdefault(name, value)
+    os.environ["WARM_STATE_PATH"] = ""
+    # Без локального классификатора каждый разбор идет в каскад: вызовы модели = разборы
+    os.environ.setdefault("LOCAL_CLASSIFIER_CONFIDENCE", "101")
+    os.environ["CLASS_CACHE_PATH"] = os.path.join(workdir, "class_cache.sqlite3")
+    os.environ["MODEL_STATS_PATH"] = os.path.join(workdir, "model_stats.json")
+    os.environ["JOBS_PATH"] = os.path.join(workdir, "jobs.sqlite3")
+    os.environ["VECTORS_PATH"] = os.path.join(workdir, "vectors")
+    os.environ["LINK_META_PATH"] = os.path.join(workdir, "link_meta.sqlite3")
+    import logging
+    logging.disable(logging.ERROR)
+
+    import main
+    from bench import fakes
+
+    with open(os.path.join(ROOT, "index.html"), encoding="utf-8") as f:
+        repo = fakes.FakeRepo({main.FILE_PATH: f.read()}, latency=0.01)
+    main.get_repo = lambda: repo
+    main.hf = fakes.FakeInferenceClient(latency=args.latency, jitter=0.0)
+    main.link_meta = None
+    main.bot = fakes.FakeBot(0.0)
+
+    async def run():
+        main.jobs.start()
+        await asyncio.to_thread(main.warm_up)
+        report = {}
+        for variant in ("legacy", "current"):
+            report[variant] = await run_variant(main, fakes, variant, args)
+        await main.jobs.stop()
+        return report
+
+    print(json.dumps(asyncio.run(run()), ensure_ascii=False, indent=1))
+
+
+if __name__ == "__main__":
+    main_cli()
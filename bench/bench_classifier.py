@@ -0,0 +1,82 @@
+"""
+Локальный классификатор разделов против меток LLM: перекрестная проверка на карточках index.html.
+Печатает точность, долю постов, которые обошлись бы без LLM при разных порогах уверенности,
+точность резервного режима (эвристика против классификатора) и время обучения/предсказания.
+
+    python bench/bench_classifier.py [--folds 5] [--thresholds 60,70,80,90]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--thresholds", default="60,70,80,90")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_classifier_")
+    for name, value in (("TG_TOKEN", "123456:bench"), ("GITHUB_TOKEN", "bench"), ("HF_TOKEN", "bench")):
+        os.environ.setdefault(name, value)
+    os.environ["CLASS_CACHE_PATH"] = os.path.join(workdir, "class_cache.sqlite3")
+    os.environ["MODEL_STATS_PATH"] = os.path.join(workdir, "model_stats.json")
+    os.environ["JOBS_PATH"] = os.path.join(workdir, "jobs.sqlite3")
+    os.environ["VECTORS_PATH"] = os.path.join(workdir, "vectors")
+    os.environ["LINK_META_PATH"] = os.path.join(workdir, "link_meta.sqlite3")
+    import logging
+    logging.disable(logging.WARNING)
+
+    import main
+    from cards import SECTIONS, parse_site
+    from classifier import SectionClassifier, card_text, evaluate
+
+    with open(os.path.join(ROOT, "index.html"), encoding="utf-8") as f:
+        cards = parse_site(f.read()).cards
+
+    report = {"cross_validation": [
+        evaluate(cards, SECTIONS, threshold=int(t), folds=args.folds) for t in args.thresholds.split(",") if t
+    ]}
+
+    # Резервный режим (все модели лежат): старая эвристика против эвристики с классификатором
+    def unavailable():
+        raise RuntimeError("classifier disabled")   # fallback_heuristic_analysis вернется к старому поведению
+
+    heuristic = classifier_fallback = 0
+    for fold in range(args.folds):
+        model = SectionClassifier.from_cards([c for i, c in enumerate(cards) if i % args.folds != fold], SECTIONS)
+        for card in (c for i, c in enumerate(cards) if i % args.folds == fold):
+            text = card_text(card) + f"\n{card.url}"
+            main.get_section_model = lambda: model
+            classifier_fallback += main.fallback_heuristic_analysis(text)["section"] == card.section
+            main.get_section_model = unavailable
+            heuristic += main.fallback_heuristic_analysis(text)["section"] == card.section
+    report["fallback_accuracy"] = {
+        "heuristic": round(heuristic / len(cards), 3),
+        "heuristic_with_classifier": round(classifier_fallback / len(cards), 3),
+    }
+
+    started = time.perf_counter()
+    model = SectionClassifier.from_cards(cards, SECTIONS)
+    train_ms = (time.perf_counter() - started) * 1000
+    texts = [card_text(card) for card in cards]
+    started = time.perf_counter()
+    for text in texts:
+        model.predict(text)
+    report["timing"] = {
+        "cards": len(cards),
+        "train_ms": round(train_ms, 1),
+        "predict_us": round((time.perf_counter() - started) / len(texts) * 1e6, 1),
+        "model_mb": round(model.counts.nbytes / 2 ** 20, 1),
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=1))
+
+
+if __name__ == "__main__":
+    main_cli()
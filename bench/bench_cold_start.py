@@ -0,0 +1,135 @@
+"""
+Время от старта процесса до первого отвеченного /ask: без снапшота и с восстановлением из снапшота.
+Каждый замер — отдельный процесс; HF, GitHub и Telegram заменены локальными заглушками с задержками.
+В regressions — проверка, что измененный на GitHub шард не отдается из старой копии.
+
+    python bench/bench_cold_start.py [--runs 3] [--github-latency 0.25] [--latency 0.8]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import tempfile
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child(args):
+    started = float(os.environ["BENCH_T0"])
+    sys.path.insert(0, ROOT)
+    import logging
+    logging.disable(logging.ERROR)
+
+    import main
+    imported = time.time()
+    import asyncio
+    import threading
+    from bench import fakes
+
+    with open(os.path.join(ROOT, "index.html"), encoding="utf-8") as f:
+        repo = fakes.FakeRepo({main.FILE_PATH: f.read()}, latency=args.github_latency)
+    main.get_repo = lambda: repo
+    main.hf = fakes.FakeInferenceClient(latency=args.latency, jitter=0.0)
+    main.bot = fakes.FakeBot()
+
+    restored = main.restore_warm_state()
+    warm = threading.Thread(target=main.warm_up)
+    warm.start()
+
+    tracker = fakes.JobTracker(main.jobs)
+
+    async def first_answer():
+        main.jobs.start()
+        message = fakes.FakeMessage("/ask нейросеть для презентаций")
+        await main.ask_database_handler(message)
+        answer = await tracker.finish(message, main.bot)
+        await main.jobs.stop()
+        return answer
+
+    answer = asyncio.run(first_answer())
+    answered = time.time()
+    calls_before_answer = len(repo.calls)
+    warm.join()
+    print(json.dumps({
+        "restored": restored,
+        "import_s": round(imported - started, 3),
+        "first_answer_s": round(answered - started, 3),
+        "after_import_s": round(answered - imported, 3),
+        "github_calls_before_answer": calls_before_answer,
+        "answered": bool(answer),
+    }))
+
+
+def shard_edit_regression():
+    """
+    Шард, измененный на GitHub, после листинга каталога перечитывается, а не отдается из старой копии.
+    """
+    sys.path.insert(0, ROOT)
+    from site_cache import SiteStore
+    from bench import fakes
+
+    paths = ["sections/ai.html", "sections/tools.html"]
+    repo = fakes.FakeRepo({path: f"<section>{path}</section>" for path in paths}, latency=0.0)
+    store = SiteStore(lambda: repo, paths, directory="sections")
+    store.get(max_age=0)
+    repo.files["sections/ai.html"] = "<section>edited upstream</section>"
+    expected = ("<section>edited upstream</section>", fakes.git_sha("<section>edited upstream</section>"))
+    first = store.get(max_age=0)["sections/ai.html"]
+    again = store.get(max_age=0)["sections/ai.html"]    # листинг уже 304
+    return first == expected and again == expected
+
+
+def run_child(args, snapshot_path):
+    env = dict(os.environ)
+    env.update({
+        "TG_TOKEN": env.get("TG_TOKEN", "123456:bench"), "GITHUB_TOKEN": "bench", "HF_TOKEN": "bench",
+        "WARM_STATE_PATH": snapshot_path,
+        "CLASS_CACHE_PATH": os.path.join(args.workdir, "class_cache.sqlite3"),
+        "MODEL_STATS_PATH": os.path.join(args.workdir, "model_stats.json"),
+        "JOBS_PATH": os.path.join(args.workdir, "jobs.sqlite3"),
+        "VECTORS_PATH": os.path.join(args.workdir, "vectors"),
+        "LINK_META_PATH": os.path.join(args.workdir, "link_meta.sqlite3"),
+        "BENCH_T0": repr(time.time()),
+    })
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child",
+         "--github-latency", str(args.github_latency), "--latency", str(args.latency)],
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--child", action="store_true")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--github-latency", type=float, default=0.25, help="задержка одного вызова GitHub API, с")
+    parser.add_argument("--latency", type=float, default=0.8, help="задержка ответа модели, с")
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        return
+
+    args.workdir = tempfile.mkdtemp(prefix="bench_cold_")
+    snapshot_path = os.path.join(args.workdir, "warm_state.pickle")
+    report = {}
+    for mode in ("no_snapshot", "snapshot"):
+        if mode == "snapshot":
+            run_child(args, snapshot_path)   # прогрев: фоновая загрузка сохраняет снапшот
+        runs = [run_child(args, snapshot_path if mode == "snapshot" else "") for _ in range(args.runs)]
+        report[mode] = {
+            "restored": all(run["restored"] for run in runs),
+            "import_s": round(statistics.median(run["import_s"] for run in runs), 3),
+            "first_answer_s": round(statistics.median(run["first_answer_s"] for run in runs), 3),
+            "after_import_s": round(statistics.median(run["after_import_s"] for run in runs), 3),
+            "github_calls_before_answer": runs[-1]["github_calls_before_answer"],
+        }
+    report["regressions"] = {"shard_edited_upstream": shard_edit_regression()}
+    print(json.dumps(report, indent=1))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,119 @@
+// Node-часть bench_filters.py: прогоняет логику filters.js без браузера.
+//     node bench/bench_filters.js <cards.json> <search-index.json>
+// cards.json — карточки так, как их прочитал бы filters.js из DOM (заголовок, описание, промпт, ссылка, бейдж).
+const fs = require('fs');
+const path = require('path');
+const { performance } = require('perf_hooks');
+const FilterEngine = require(path.join(__dirname, '..', 'filters.js'));
+
+const QUERIES = ['презентации', 'video editor', 'gpt', 'нейросеть для фото', 'osint telegram'];
+
+function timeIt(fn, minMs = 200) {
+    fn();
+    let runs = 0;
+    const started = performance.now();
+    while (performance.now() - started < minMs) {
+        fn();
+        runs += 1;
+    }
+    return (performance.now() - started) / runs;
+}
+
+// То, что раньше делал DOMContentLoaded (без чтения innerText): фасеты и текст каждой карточки
+function legacyInit(cards) {
+    const bySection = {};
+    cards.forEach(card => {
+        const res = FilterEngine.describeCard(card.title, card.desc, card.xmp, card.link, card.badge);
+        (bySection[card.section] = bySection[card.section] || []).push(res);
+    });
+    Object.values(bySection).forEach(resources => FilterEngine.facetOptions(resources));
+    return bySection;
+}
+
+function indexInit(text, sections) {
+    const index = new FilterEngine.SearchIndex(JSON.parse(text));
+    const bySection = {};
+    Object.entries(sections).forEach(([section, titles]) => {
+        // Заглушки карточек: index.resources сверяет только h3.textContent
+        const elements = titles.map(title => ({ querySelector: () => ({ textContent: title }) }));
+        bySection[section] = index.resources(section, elements);
+        FilterEngine.facetOptions(bySection[section]);
+    });
+    return { index, bySection };
+}
+
+function keystrokes(query) {
+    const out = [];
+    for (let i = 1; i <= query.length; i++) {
+        if (query[i - 1] !== ' ') out.push(query.slice(0, i));
+    }
+    return out;
+}
+
+function main() {
+    const cards = JSON.parse(fs.readFileSync(process.argv[2], 'utf8'));
+    const indexText = fs.readFileSync(process.argv[3], 'utf8');
+    const sections = {};
+    cards.forEach(card => (sections[card.section] = sections[card.section] || []).push(card.title));
+
+    const legacy = legacyInit(cards);
+    const { index, bySection } = indexInit(indexText, sections);
+    const mismatched = Object.keys(sections).filter(section => !bySection[section]);
+
+    // Совпадают ли фасеты из индекса (site_index.py) с теми, что filters.js считает сам
+    let facetsEqual = 0;
+    Object.keys(sections).forEach(section => {
+        (bySection[section] || []).forEach((res, i) => {
+            if (JSON.stringify(res.facets) === JSON.stringify(legacy[section][i].facets)) facetsEqual += 1;
+        });
+    });
+
+    // Поиск в самом большом разделе: как в браузере, каждое нажатие фильтрует один раздел
+    const biggest = Object.keys(sections).sort((a, b) => sections[b].length - sections[a].length)[0];
+    const legacyRes = legacy[biggest];
+    const indexRes = bySection[biggest];
+    const typed = QUERIES.flatMap(keystrokes);
+
+    // Счетчик видимых нужен, чтобы V8 не выбросил проверки как мертвый код
+    let shown = 0;
+    const legacyKeystroke = timeIt(() => {
+        typed.forEach(term => legacyRes.forEach(res => { if (res.fullText.includes(term)) shown += 1; }));
+    }) / typed.length;
+    const indexKeystroke = timeIt(() => {
+        index.termCache.clear();     // каждый повтор — как первый набор запроса
+        typed.forEach(term => {
+            const mask = index.match(term);
+            indexRes.forEach(res => { if (!mask || mask[res.id] === 1) shown += 1; });
+        });
+    }) / typed.length;
+
+    // Сколько карточек трогается в DOM за нажатие: раньше — все в разделе, теперь — только сменившие видимость
+    let flips = 0;
+    let visible = indexRes.map(() => true);
+    index.termCache.clear();
+    typed.forEach(term => {
+        const mask = index.match(term);
+        indexRes.forEach((res, i) => {
+            const now = !mask || mask[res.id] === 1;
+            if (now !== visible[i]) flips += 1;
+            visible[i] = now;
+        });
+    });
+
+    console.log(JSON.stringify({
+        cards: cards.length,
+        index_kb: Math.round(Buffer.byteLength(indexText) / 1024 * 10) / 10,
+        sections_matching_index: Object.keys(sections).length - mismatched.length,
+        facets_equal: `${facetsEqual}/${cards.length}`,
+        init_legacy_ms: +timeIt(() => legacyInit(cards)).toFixed(3),
+        init_index_ms: +timeIt(() => indexInit(indexText, sections)).toFixed(3),
+        keystroke_section: `${biggest} (${sections[biggest].length})`,
+        keystroke_legacy_us: +(legacyKeystroke * 1000).toFixed(1),
+        keystroke_index_us: +(indexKeystroke * 1000).toFixed(1),
+        dom_updates_per_keystroke_legacy: legacyRes.length,
+        dom_updates_per_keystroke_index: +(flips / typed.length).toFixed(2),
+        shown: shown > 0,
+    }));
+}
+
+main();
@@ -0,0 +1,70 @@
+"""
+filters.js: инициализация фильтров и поиск по мере набора — прежний разбор карточек против search-index.json.
+JS-логика гоняется в Node (bench/bench_filters.js) на index.html и на синтетическом сайте в --factors раз больше.
+Чтение innerText/textContent, стили и layout сюда не входят — браузера здесь нет; прежний путь
+платит за них сверх этих цифр на каждой карточке, путь с индексом — нет.
+
+    python bench/bench_filters.py [--factors 1,10]
+"""
+import os
+import sys
+import json
+import argparse
+import subprocess
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--factors", default="1,10")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_filters_")
+    for name, value in (("TG_TOKEN", "123456:bench"), ("GITHUB_TOKEN", "bench"), ("HF_TOKEN", "bench")):
+        os.environ.setdefault(name, value)
+    os.environ["CLASS_CACHE_PATH"] = os.path.join(workdir, "class_cache.sqlite3")
+    os.environ["MODEL_STATS_PATH"] = os.path.join(workdir, "model_stats.json")
+    os.environ["JOBS_PATH"] = os.path.join(workdir, "jobs.sqlite3")
+    os.environ["VECTORS_PATH"] = os.path.join(workdir, "vectors")
+    os.environ["LINK_META_PATH"] = os.path.join(workdir, "link_meta.sqlite3")
+    import logging
+    logging.disable(logging.ERROR)
+
+    import main
+    from cards import parse_site
+    from site_index import SiteIndex, card_badge
+    from bench.synthetic import synthetic_index
+
+    with open(os.path.join(ROOT, "index.html"), encoding="utf-8") as f:
+        html_content = f.read()
+
+    report = {}
+    for factor in (int(s) for s in args.factors.split(",") if s):
+        cards = parse_site(synthetic_index(html_content, factor, main.generate_card_html)).cards
+        # Карточки в порядке страницы по разделам — так их обходит querySelectorAll в каждом разделе
+        order = {}
+        for card in cards:
+            order.setdefault(card.section, []).append(card)
+        cards = [card for section in order.values() for card in section]
+        cards_path = os.path.join(workdir, f"cards_{factor}.json")
+        index_path = os.path.join(workdir, f"index_{factor}.json")
+        with open(cards_path, "w", encoding="utf-8") as f:
+            json.dump([{
+                "section": card.section, "title": card.name, "desc": card.desc,
+                "xmp": card.prompt_body, "link": card.url, "badge": card_badge(card),
+            } for card in cards], f, ensure_ascii=False)
+        with open(index_path, "w", encoding="utf-8") as f:
+            f.write(SiteIndex.from_cards(cards).to_json())
+        out = subprocess.run(
+            ["node", os.path.join(ROOT, "bench", "bench_filters.js"), cards_path, index_path],
+            capture_output=True, text=True, check=True
+        ).stdout
+        report[f"x{factor}"] = json.loads(out.strip().splitlines()[-1])
+    print(json.dumps(report, ensure_ascii=False, indent=1))
+
+
+if __name__ == "__main__":
+    main_cli()
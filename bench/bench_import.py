@@ -0,0 +1,119 @@
+"""
+Пропускная способность bulk_import на синтетическом экспорте с локальными заменителями HF и GitHub.
+
+    python bench/bench_import.py [--messages 1000] [--concurrency 4] [--latency 0.8] [--batch 100]
+
+Ничего не отправляет в сеть: классификация — bench.fakes.FakeInferenceClient,
+репозиторий — bench.fakes.FakeRepo поверх локального index.html.
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+TOPICS = [
+    "Open-source library for parsing PDFs, API included",
+    "Android app that blocks ads without root",
+    "Free course: tutorial on linear algebra for ML",
+    "Windows driver updater that is actually safe",
+    "OSINT toolkit for checking username leaks",
+    "New open-weights model beats GPT-4 on benchmarks",
+    "Indie game with procedural worlds",
+    "Act as a senior code reviewer. You are a strict but fair reviewer...",
+]
+
+
+def synthetic_export(count, seed=0):
+    """
+    Экспорт в формате Telegram Desktop: обычные посты, скрытые ссылки (text_link),
+    повторы ссылок, "голые" ссылки, короткий мусор и служебные сообщения.
+    """
+    rnd = random.Random(seed)
+    messages = []
+    for i in range(count):
+        roll = rnd.random()
+        topic = rnd.choice(TOPICS)
+        url = f"https://example{rnd.randint(0, count // 3)}.dev/tool?utm_source=tg"
+        if roll < 0.05:
+            messages.append({"id": i, "type": "service", "action": "pin_message", "text": ""})
+        elif roll < 0.10:
+            messages.append({"id": i, "type": "message", "text": "ok"})
+        elif roll < 0.15:
+            messages.append({"id": i, "type": "message", "text": url})
+        elif roll < 0.45:
+            messages.append({"id": i, "type": "message", "text": [
+                f"🔥 {topic} #{i}\n\n", {"type": "text_link", "text": "Ссылка", "href": url}, "\nПодробнее в посте."
+            ]})
+        else:
+            messages.append({"id": i, "type": "message", "text": f"🔥 {topic} #{i}\n\n{url}\nПодробнее в посте."})
+    return {"name": "Saved", "type": "saved_messages", "messages": messages}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.8, help="средняя задержка ответа модели, с")
+    parser.add_argument("--github-latency", type=float, default=0.05)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_import_")
+    for name, value in (("TG_TOKEN", "123456:bench"), ("GITHUB_TOKEN", "bench"), ("HF_TOKEN", "bench")):
+        os.environ.setdefault(name, value)
+    os.environ["CLASS_CACHE_PATH"] = os.path.join(workdir, "class_cache.sqlite3")
+    os.environ["MODEL_STATS_PATH"] = os.path.join(workdir, "model_stats.json")
+    os.environ["JOBS_PATH"] = os.path.join(workdir, "jobs.sqlite3")
+    os.environ["VECTORS_PATH"] = os.path.join(workdir, "vectors")
+    os.environ["LINK_META_PATH"] = os.path.join(workdir, "link_meta.sqlite3")
+
+    import main
+    import bulk_import
+    from bench.fakes import FakeInferenceClient, FakeRepo
+
+    export_path = os.path.join(workdir, "result.json")
+    with open(export_path, "w", encoding="utf-8") as f:
+        json.dump(synthetic_export(args.messages), f, ensure_ascii=False)
+
+    with open(os.path.join(ROOT, "index.html"), encoding="utf-8") as f:
+        repo = FakeRepo({main.FILE_PATH: f.read()}, latency=args.github_latency)
+    fake_hf = FakeInferenceClient(latency=args.latency, max_concurrency=main.HF_MAX_CONCURRENCY)
+    main.get_repo = lambda: repo
+    main.hf = fake_hf
+    main.link_meta = None    # загрузка метаданных ссылок — в bench_link_meta.py
+
+    async def go():
+        started = time.perf_counter()
+        importer = await bulk_import.run_import(export_path, concurrency=args.concurrency, batch_size=args.batch)
+        await main.bot.session.close()
+        return importer, time.perf_counter() - started
+
+    importer, elapsed = asyncio.run(go())
+    report = {
+        "messages": args.messages,
+        "concurrency": args.concurrency,
+        "model_latency_s": args.latency,
+        "elapsed_s": round(elapsed, 2),
+        "items_per_min": round(importer.processed * 60 / elapsed, 1),
+        "model_calls": fake_hf.calls,
+        "commits": len(repo.commits),
+        "github_calls": len(repo.calls),
+        "outcomes": importer.counts,
+    }
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=1))
+    else:
+        for key, value in report.items():
+            print(f"{key:>16}: {value}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,87 @@
+"""
+Разбор ответов моделей: старый разбор (регулярки + ast.literal_eval) против json_repair
+на типичных поломках JSON. Печатает долю разобранных ответов (с непустым section)
+по видам поломок и время разбора одного ответа.
+
+    python bench/bench_json.py [--posts 200]
+"""
+import os
+import re
+import sys
+import ast
+import json
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from json_repair import parse_json
+from bench.fakes import CORRUPTIONS, corrupt_json, fake_classification
+
+
+def legacy_parse(raw_response):
+    """
+    Разбор до json_repair (копия для сравнения).
+    """
+    text = raw_response.strip()
+    json_block = re.search(r'```json\s*(\{.*?\})\s*```', text, re.DOTALL)
+    if json_block:
+        text = json_block.group(1)
+    else:
+        start = text.find('{')
+        end = text.rfind('}')
+        if start != -1 and end != -1:
+            text = text[start:end+1]
+    text = re.sub(r',\s*}', '}', text)
+    text = re.sub(r',\s*]', ']', text)
+    try: return json.loads(text)
+    except json.JSONDecodeError: pass
+    try: return ast.literal_eval(text)
+    except Exception: return None
+
+
+def posts(count):
+    with open(os.path.join(ROOT, "index.html"), encoding="utf-8") as f:
+        from cards import parse_site
+        cards = parse_site(f.read()).cards
+    return [f"{card.name}\n{card.desc}\n{card.url}" for card in cards[:count]]
+
+
+def score(parse, corpus, expected):
+    ok = 0
+    started = time.perf_counter()
+    for raw, section in zip(corpus, expected):
+        try:
+            data = parse(raw)
+        except Exception:
+            data = None
+        ok += isinstance(data, dict) and data.get("section") == section
+    elapsed = time.perf_counter() - started
+    return {"parsed": round(ok / len(corpus), 3), "us_per_parse": round(elapsed / len(corpus) * 1e6, 1)}
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--posts", type=int, default=200)
+    args = parser.parse_args()
+
+    samples = [fake_classification(text) for text in posts(args.posts)]
+    expected = [sample["section"] for sample in samples]
+    kinds = {"clean": ["```json\n" + json.dumps(s, ensure_ascii=False) + "\n```" for s in samples]}
+    kinds.update({kind: [corrupt_json(s, kind) for s in samples] for kind in CORRUPTIONS})
+
+    report = {}
+    for kind, corpus in kinds.items():
+        report[kind] = {
+            "legacy": score(legacy_parse, corpus, expected),
+            "json_repair": score(lambda raw: parse_json(raw, "section")[0], corpus, expected),
+        }
+    # Регрессия: скобки в рассуждениях не должны подменять ответ
+    raw = 'Sure! I think {this is} tricky.\n```json\n{"section": "ai", "name": "X"}\n```\nDone {ok}'
+    report["regressions"] = {"prose_braces_literal": parse_json(raw, "section")[0] == {"section": "ai", "name": "X"}}
+    print(json.dumps(report, ensure_ascii=False, indent=1))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,208 @@
+"""
+Загрузка метаданных ссылок (link_meta.LinkMetaFetcher) против локального HTTP-сервера,
+который изображает обычные сайты, редиректы, зависший и огромный ответ и GitHub API.
+Печатает: что удалось достать, время холодной загрузки и из кэша, сколько запросов дошло
+до сервера при одновременных загрузках одной ссылки, и во что обходится ожидание метаданных
+при классификации поста: загрузка перед анализом против предзагрузки из хендлера.
+
+    python bench/bench_link_meta.py [--page-latency 0.5] [--latency 0.8] [--posts 10] [--queue-delay 0.3]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+
+from aiohttp import web
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PAGE = """<!doctype html><html><head><meta charset="utf-8">
+<title>Tool {n} — landing</title>
+<meta property="og:title" content="Tool {n}">
+<meta property="og:description" content="Tool {n} turns long videos into short clips with AI subtitles.">
+<meta property="og:site_name" content="Tool{n}.app">
+</head><body>{filler}</body></html>"""
+
+
+class StandIn:
+    def __init__(self, page_latency):
+        self.page_latency = page_latency
+        self.hits = 0
+        self.app = web.Application()
+        self.app.router.add_get("/page/{n}", self.page)
+        self.app.router.add_get("/r/{n}", self.redirect)
+        self.app.router.add_get("/slow", self.slow)
+        self.app.router.add_get("/huge", self.huge)
+        self.app.router.add_get("/repos/{owner}/{repo}", self.github)
+
+    async def page(self, request):
+        self.hits += 1
+        await asyncio.sleep(self.page_latency)
+        return web.Response(text=PAGE.format(n=request.match_info["n"], filler="x" * 50000), content_type="text/html")
+
+    async def redirect(self, request):
+        self.hits += 1
+        raise web.HTTPFound(f"/page/{request.match_info['n']}")
+
+    async def slow(self, request):
+        self.hits += 1
+        await asyncio.sleep(30)
+        return web.Response(text="late")
+
+    async def huge(self, request):
+        self.hits += 1
+        response = web.StreamResponse(headers={"Content-Type": "text/html"})
+        await response.prepare(request)
+        try:
+            await response.write(b"<html><head><title>Huge</title>")
+            for _ in range(200):
+                await response.write(b"<!-- " + b"x" * 32768 + b" -->")
+        except ConnectionError:
+            pass    # загрузчик перестал читать на max_bytes — так и задумано
+        return response
+
+    async def github(self, request):
+        self.hits += 1
+        owner, repo = request.match_info["owner"], request.match_info["repo"]
+        return web.json_response({
+            "full_name": f"{owner}/{repo}", "html_url": f"https://github.com/{owner}/{repo}",
+            "description": "Open-source clip maker", "stargazers_count": 1234, "language": "Python",
+            "topics": ["video", "ai"], "homepage": "",
+        })
+
+    async def start(self):
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.base = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+async def checks(fetcher, server):
+    started = time.perf_counter()
+    redirected = await fetcher.fetch(f"{server.base}/r/1")
+    cold = time.perf_counter() - started
+    started = time.perf_counter()
+    await fetcher.fetch(f"{server.base}/r/1")
+    cached = time.perf_counter() - started
+    started = time.perf_counter()
+    slow = await fetcher.fetch(f"{server.base}/slow")
+    slow_s = time.perf_counter() - started
+    huge = await fetcher.fetch(f"{server.base}/huge")
+    repo = await fetcher.fetch("https://github.com/someone/clipper/tree/main")
+
+    hits = server.hits
+    await asyncio.gather(*(fetcher.fetch(f"{server.base}/page/2") for _ in range(20)))
+    return {
+        "redirect": {"final_url": redirected.get("final_url", "").replace(server.base, ""),
+                     "title": redirected.get("title"), "description": redirected.get("description")},
+        "cold_ms": round(cold * 1000, 1),
+        "cached_ms": round(cached * 1000, 2),
+        "slow": {"error": slow.get("error"), "seconds": round(slow_s, 2)},
+        "huge": {"bytes_read": huge.get("bytes"), "title": huge.get("title")},
+        "github": {"title": repo.get("title"), "description": repo.get("description"),
+                   "final_url": repo.get("final_url")},
+        "concurrent_same_url": {"fetches": 20, "server_hits": server.hits - hits},
+    }
+
+
+async def classification(main, server, args):
+    """
+    Время от прихода поста до результата анализа: метаданные грузятся перед анализом
+    (последовательно) или стартуют в хендлере и догружаются, пока пост ждет воркера.
+    """
+    def post(i, mode):
+        return f"Глянь {mode} {server.base}/page/{i}"
+
+    fetcher = main.link_meta
+
+    async def without_metadata(text):
+        main.link_meta = None
+        await asyncio.sleep(args.queue_delay)      # пост ждет свободного воркера очереди
+        await main.analyze_content_full_cycle(text)
+        main.link_meta = fetcher
+
+    async def sequential(text):
+        main.link_meta = None
+        await asyncio.sleep(args.queue_delay)
+        await fetcher.fetch(main.extract_url_from_text(text))
+        await main.analyze_content_full_cycle(text)
+        main.link_meta = fetcher
+
+    async def prefetched(text):
+        main.prefetch_link(text)
+        await asyncio.sleep(args.queue_delay)
+        await main.analyze_content_full_cycle(text)
+
+    timings = {}
+    for offset, (mode, flow) in enumerate((("none", without_metadata), ("seq", sequential), ("pre", prefetched))):
+        timings[mode] = []
+        for i in range(args.posts):
+            started = time.perf_counter()
+            await flow(post(offset * 1000 + i, mode))
+            timings[mode].append(time.perf_counter() - started)
+
+    return {
+        "page_latency_s": args.page_latency,
+        "model_latency_s": args.latency,
+        "queue_delay_s": args.queue_delay,
+        "no_metadata_p50_s": round(statistics.median(timings["none"]), 3),
+        "fetch_then_analyze_p50_s": round(statistics.median(timings["seq"]), 3),
+        "prefetched_p50_s": round(statistics.median(timings["pre"]), 3),
+        "metadata_in_prompt": {result: n for (result,), n in main.LINK_META_RESULTS.snapshot().items()},
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--page-latency", type=float, default=0.5)
+    parser.add_argument("--latency", type=float, default=0.8, help="задержка ответа модели, с")
+    parser.add_argument("--posts", type=int, default=10)
+    parser.add_argument("--queue-delay", type=float, default=0.3)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench_link_meta_")
+    for name, value in (("TG_TOKEN", "123456:bench"), ("GITHUB_TOKEN", "bench"), ("HF_TOKEN", "bench")):
+        os.environ.setdefault(name, value)
+    os.environ["CLASS_CACHE_PATH"] = os.path.join(workdir, "class_cache.sqlite3")
+    os.environ["MODEL_STATS_PATH"] = os.path.join(workdir, "model_stats.json")
+    os.environ["JOBS_PATH"] = os.path.join(workdir, "jobs.sqlite3")
+    os.environ["VECTORS_PATH"] = os.path.join(workdir, "vectors")
+    os.environ["LINK_META_PATH"] = os.path.join(workdir, "link_meta.sqlite3")
+    import logging
+    logging.disable(logging.WARNING)
+
+    import main
+    from bench.fakes import FakeInferenceClient
+    from link_meta import LinkMetaCache, LinkMetaFetcher
+
+    async def run():
+        server = StandIn(args.page_latency)
+        await server.start()
+        fetcher = LinkMetaFetcher(
+            LinkMetaCache(os.path.join(workdir, "bench_links.sqlite3")), timeout=main.LINK_META_TIMEOUT,
+            max_bytes=main.LINK_META_MAX_KB * 1024, github_api=server.base, allow_private=True
+        )
+        try:
+            report = {"fetcher": await checks(fetcher, server)}
+            main.hf = FakeInferenceClient(latency=args.latency, jitter=0.0)
+            main.link_meta = fetcher
+            report["classification"] = await classification(main, server, args)
+        finally:
+            await fetcher.close()
+            await server.stop()
+        return report
+
+    print(json.dumps(asyncio.run(run()), ensure_ascii=False, indent=1))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,175 @@
+"""
+Память бота под нагрузкой: пиковый RSS процесса и задержка хендлера постов.
+Каждый вариант — отдельный процесс (ru_maxrss не сбрасывается). Нагрузка: синтетический сайт
+в --factor раз больше index.html, --posts постов через main_content_handler, --asks запросов /ask
+и --users разных пользователей, для которых диспетчер проверяет состояние FSM.
+Варианты: legacy — как до бюджета памяти (gc.collect после каждого поста, MemoryStorage,
+ContentFile держит base64-тело сайта); current — по умолчанию; sampling — с замерами по стадиям;
+budget — с MEMORY_BUDGET_MB=--budget-mb.
+
+    python bench/bench_memory.py [--factor 10] [--posts 60] [--asks 20] [--users 20000] [--budget-mb 260] [--runs 3]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import tempfile
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_POST = (
+    "Пост #{i}: https://mem{i}.example.dev/tool\n"
+    "Новый сервис делает презентации по тексту: загружаешь конспект, получаешь слайды с дизайном."
+)
+
+
+def child(args):
+    sys.path.insert(0, ROOT)
+    import logging
+    logging.disable(logging.ERROR)
+
+    import gc
+    import asyncio
+    import main
+    import site_cache
+    from aiogram.fsm.context import FSMContext
+    from aiogram.fsm.storage.base import StorageKey
+    from aiogram.fsm.storage.memory import MemoryStorage
+    from bench import fakes
+    from bench.synthetic import synthetic_index
+
+    with open(os.path.join(ROOT, "index.html"), encoding="utf-8") as f:
+        html_content = synthetic_index(f.read(), args.factor, main.generate_card_html)
+    repo = fakes.FakeRepo({main.FILE_PATH: html_content}, latency=0.01)
+    del html_content
+    main.get_repo = lambda: repo
+    main.hf = fakes.FakeInferenceClient(latency=args.latency, jitter=0.0)
+    main.link_meta = None
+    main.bot = fakes.FakeBot(0.0)
+
+    handler = main.main_content_handler
+    storage = main.dp.storage
+    if args.variant == "legacy":
+        site_cache._release_body = lambda contents: None
+        storage = MemoryStorage()
+
+        async def handler(message, state):
+            try:
+                await main.main_content_handler(message, state)
+            finally:
+                gc.collect()
+
+    tracker = fakes.JobTracker(main.jobs)
+
+    async def run():
+        main.memory.start()
+        watcher = asyncio.create_task(main.memory.watch(1.0)) if main.memory.budget else None
+        main.jobs.start()
+        await asyncio.to_thread(main.warm_up)
+        handler_samples, post_samples = [], []
+        semaphore = asyncio.Semaphore(8)
+
+        async def post(i):
+            key = StorageKey(bot_id=1, chat_id=i, user_id=i)
+            message = fakes.FakeMessage(SAMPLE_POST.format(i=i), chat_id=i, user_id=i)
+            async with semaphore:
+                started = time.perf_counter()
+                await storage.get_state(key)     # StateFilter(None) диспетчера
+                await handler(message, FSMContext(storage=storage, key=key))
+                handler_samples.append(time.perf_counter() - started)
+                await tracker.finish(message, main.bot)
+                post_samples.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(post(i) for i in range(args.posts)))
+        await main.commit_queue.flush()
+        for i in range(args.asks):
+            message = fakes.FakeMessage("/ask нейросеть для презентаций", chat_id=i, user_id=i)
+            await main.ask_database_handler(message)
+            await tracker.finish(message, main.bot)
+        # Пишут разные люди: каждое обновление проверяет состояние своего пользователя
+        for user in range(args.users):
+            await storage.get_state(StorageKey(bot_id=1, chat_id=10 ** 6 + user, user_id=10 ** 6 + user))
+        await main.jobs.stop()
+        if watcher is not None:
+            watcher.cancel()
+        return handler_samples, post_samples
+
+    handler_samples, post_samples = asyncio.run(run())
+    from memory import rss_bytes, peak_rss_bytes
+    contents = main.site_store.caches[main.FILE_PATH]._contents
+    report = {
+        "peak_rss_mb": round(peak_rss_bytes() / 2 ** 20, 1),
+        "final_rss_mb": round(rss_bytes() / 2 ** 20, 1),
+        "handler_p50_ms": round(statistics.median(handler_samples) * 1000, 2),
+        "post_p50_s": round(statistics.median(post_samples), 3),
+        "fsm_records": len(storage.storage),
+        "content_file_body_kb": round(len(contents._rawData["content"]) / 1024) if contents is not None else None,
+    }
+    if args.variant == "sampling":
+        report["stages"] = main.memory.snapshot()["stages"]
+    if args.variant == "budget":
+        report["reliefs"] = main.memory.reliefs
+    print(json.dumps(report, ensure_ascii=False))
+
+
+def run_child(args, variant, workdir):
+    env = dict(os.environ)
+    env.update({
+        "TG_TOKEN": env.get("TG_TOKEN", "123456:bench"), "GITHUB_TOKEN": "bench", "HF_TOKEN": "bench",
+        "WARM_STATE_PATH": "",
+        "CLASS_CACHE_PATH": os.path.join(workdir, "class_cache.sqlite3"),
+        "MODEL_STATS_PATH": os.path.join(workdir, "model_stats.json"),
+        "JOBS_PATH": os.path.join(workdir, "jobs.sqlite3"),
+        "VECTORS_PATH": os.path.join(workdir, "vectors"),
+        "LINK_META_PATH": os.path.join(workdir, "link_meta.sqlite3"),
+        "MEMORY_SAMPLING": "1" if variant == "sampling" else "0",
+        "MEMORY_BUDGET_MB": str(args.budget_mb) if variant == "budget" else "0",
+    })
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", "--variant", variant,
+         "--factor", str(args.factor), "--posts", str(args.posts), "--asks", str(args.asks),
+         "--users", str(args.users), "--latency", str(args.latency)],
+        env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--child", action="store_true")
+    parser.add_argument("--variant", default="current")
+    parser.add_argument("--variants", default="legacy,current,sampling,budget")
+    parser.add_argument("--factor", type=int, default=10, help="во сколько раз сайт больше index.html")
+    parser.add_argument("--posts", type=int, default=60)
+    parser.add_argument("--asks", type=int, default=20)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка ответа модели, с")
+    parser.add_argument("--budget-mb", type=float, default=260)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        return
+
+    report = {}
+    for variant in args.variants.split(","):
+        # Свежий каталог на каждый прогон: кэш классификации и векторы не переносятся между вариантами
+        runs = [run_child(args, variant, tempfile.mkdtemp(prefix="bench_memory_")) for _ in range(args.runs)]
+        summary = {
+            key: round(statistics.median(run[key] for run in runs), 2)
+            for key in ("peak_rss_mb", "final_rss_mb", "handler_p50_ms", "post_p50_s")
+        }
+        summary["fsm_records"] = runs[-1]["fsm_records"]
+        summary["content_file_body_kb"] = runs[-1]["content_file_body_kb"]
+        for key in ("stages", "reliefs"):
+            if key in runs[-1]:
+                summary[key] = runs[-1][key]
+        report[variant] = summary
+    print(json.dumps(report, ensure_ascii=False, indent=1))
+
+
+if __name__ == "__main__":
+    main_cli()
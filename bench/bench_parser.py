@@ -0,0 +1,87 @@
+"""
+Сравнение старого regex-разбора (split по glass-card + re.search) и однопроходного CardParser.
+
+    python bench/bench_parser.py [path/to/index.html] [--repeat N]
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cards import parse_site
+
+
+def legacy_regex_parse(html_content):
+    # Копия прежнего fetch_db_context() без сетевой части
+    card_blocks = html_content.split('class="glass-card')[1:]
+    db_items = []
+    for block in card_blocks:
+        title_match = re.search(r'<h3[^>]*>(.*?)</h3>', block)
+        desc_match = re.search(r'<p[^>]*>(.*?)</p>', block, re.DOTALL)
+        xmp_match = re.search(r'<xmp>(.*?)</xmp>', block, re.DOTALL)
+        link_match = re.search(r'<a href="([^"]+)"', block)
+        if title_match:
+            title = re.sub(r'<[^>]+>', '', title_match.group(1).strip())
+            desc = re.sub(r'<[^>]+>', '', desc_match.group(1).strip()) if desc_match else ""
+            extra = ""
+            if xmp_match:
+                extra = f"\n  Текст промпта: {xmp_match.group(1).strip()}"
+            elif link_match:
+                extra = f"\n  Ссылка: {link_match.group(1)}"
+            db_items.append(f"Название: {title}\nОписание: {desc}{extra}\n---")
+    return db_items
+
+
+def measure(fn, arg, repeat):
+    timings = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn(arg)
+        timings.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    fn(arg)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    timings.sort()
+    return result, {
+        "median_ms": round(timings[len(timings) // 2] * 1000, 2),
+        "min_ms": round(timings[0] * 1000, 2),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def main():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", nargs="?", default=os.path.join(root, "index.html"))
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    with open(args.path, encoding="utf-8") as f:
+        html_content = f.read()
+
+    legacy_items, legacy = measure(legacy_regex_parse, html_content, args.repeat)
+    site, single_pass = measure(parse_site, html_content, args.repeat)
+    _, streamed = measure(lambda h: parse_site(h, chunk_size=16384), html_content, args.repeat)
+
+    legacy["cards"] = len(legacy_items)
+    single_pass["cards"] = len(site.cards)
+    single_pass["prompts_with_body"] = sum(1 for c in site.cards if c.prompt_body)
+    streamed["cards"] = single_pass["cards"]
+
+    print(json.dumps({
+        "file": os.path.basename(args.path),
+        "size_kb": round(len(html_content.encode("utf-8")) / 1024, 1),
+        "legacy_regex": legacy,
+        "card_parser": single_pass,
+        "card_parser_streamed_16k": streamed,
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+Офлайн-бенчмарки бота: микробенчмарки горячих функций, разбор/индексация сайта в масштабах 1x/10x/100x
+и сквозные прогоны main_content_handler и ask_database_handler на локальных заменителях HF, GitHub и Telegram.
+
+    python bench/bench_suite.py [--out results.json] [--compare old.json] [--quick]
+        [--latency 0.8] [--error-rate 0.05] [--malformed-rate 0.1] [--no-structured-output] [--scales 1,10,100]
+
+Результат — JSON; с --compare печатается отношение каждого показателя к прошлому прогону.
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SAMPLE_TEXTS = [
+    "🔥 Gamma — нейросеть для презентаций за минуту\n\nhttps://gamma.app/?utm_source=tg&ref=abc\nПодписывайся!",
+    "Act as a senior Python reviewer. <Role>You are strict</Role> Prompt: review the code below.",
+    "Полезный репозиторий: https://github.com/AUTOMATIC1111/stable-diffusion-webui (звезд 130k)",
+    "Смотрите пост t.me/some_channel/1234 и www.example.org/page).",
+    "Без ссылок, просто заметка про идеи для стартапа на выходные",
+]
+SAMPLE_JSON = [
+    '```json\n{"section": "ai", "name": "Gamma", "desc": "Slides", "url": "https://gamma.app", "confidence": 95}\n```',
+    'Here you go: {"section": "dev", "name": "Repo", "desc": "x", "url": "none",}',
+    "{'section': 'fun', 'name': 'Game', 'confidence': 70, 'alternative': 'ideas'}",
+    'Sure! {"section": "prompts", "name": "Reviewer", "prompt_body": "Act as \\"reviewer\\""',
+]
+SAMPLE_URLS = [
+    "https://gamma.app/?utm_source=tg&ref=abc",
+    "https://www.youtube.com/watch?v=dQw4w9WgXcQ&si=xyz&feature=share",
+    "https://github.com/user/repo/",
+    "https://example.org/page?b=2&a=1&fbclid=123",
+]
+SAMPLE_CARDS = [
+    {"section": "ai", "name": "Gamma", "desc": "Презентации за минуту", "url": "https://gamma.app/?utm_source=tg"},
+    {"section": "prompts", "name": "Reviewer", "desc": "Промпт ревьюера", "url": "#",
+     "prompt_body": "Act as a senior reviewer.\n<Role>strict</Role>\n" * 10},
+    {"section": "apk", "name": "AdBlock", "desc": "Без рута", "url": "https://example.org/app", "platform": "Android"},
+]
+# Первый символ итогового сообщения бота -> исход
+HANDLER_OUTCOMES = {"✅": "added", "⚠️": "duplicate", "🔁": "near_duplicate", "🤔": "doubt", "🧐": "need_link", "💬": "chat", "❌": "error"}
+ASK_QUERIES = ["нейросеть для презентаций", "промпт для ревью кода", "osint поиск по нику", "игры", "python библиотека"]
+
+
+def microbench(fn, inputs, min_time=0.2, repeat=5):
+    """
+    Лучшее из repeat прогонов; каждый прогон крутит fn по inputs не меньше min_time секунд.
+    Возвращает микросекунды на вызов.
+    """
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            for item in inputs:
+                fn(item)
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time / repeat:
+            break
+        loops *= 2
+    best = elapsed
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(loops):
+            for item in inputs:
+                fn(item)
+        best = min(best, time.perf_counter() - started)
+    return round(best / (loops * len(inputs)) * 1e6, 3)
+
+
+def timed(fn, repeat=3):
+    best = None
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best * 1000, 2), result
+
+
+def latency_summary(samples, elapsed):
+    ordered = sorted(samples)
+    return {
+        "requests": len(samples),
+        "throughput_per_s": round(len(samples) / elapsed, 2) if elapsed else None,
+        "p50_ms": round(statistics.median(ordered) * 1000, 1),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000, 1),
+        "max_ms": round(ordered[-1] * 1000, 1),
+    }
+
+
+def bench_micro(main):
+    from cards import parse_site
+    with open(os.path.join(ROOT, "index.html"), encoding="utf-8") as f:
+        html_content = f.read()
+    return {
+        "extract_url_from_text_us": microbench(main.extract_url_from_text, SAMPLE_TEXTS),
+        "clean_and_parse_json_us": microbench(main.clean_and_parse_json, SAMPLE_JSON),
+        "normalize_url_us": microbench(main.normalize_url, SAMPLE_URLS),
+        "generate_card_html_us": microbench(main.generate_card_html, SAMPLE_CARDS),
+        "parse_site_1x_us": microbench(parse_site, [html_content], min_time=1.0),
+    }
+
+
+def bench_scales(main, scales):
+    from cards import parse_site
+    from search import SearchIndex
+    from dedup import DedupIndex
+    from bench.synthetic import synthetic_index
+
+    with open(os.path.join(ROOT, "index.html"), encoding="utf-8") as f:
+        base = f.read()
+    results = {}
+    for factor in scales:
+        html_content = synthetic_index(base, factor, main.generate_card_html)
+        repeat = 3 if factor < 100 else 1
+        parse_ms, site = timed(lambda: parse_site(html_content), repeat)
+        search_build_ms, index = timed(lambda: SearchIndex.from_cards(site.cards), repeat)
+        dedup_build_ms, dedup = timed(lambda: DedupIndex.from_cards(site.cards), repeat)
+        query_us = microbench(lambda q: index.search(q, top_k=main.ASK_TOP_K), ASK_QUERIES, repeat=3)
+        find_us = microbench(lambda c: dedup.find(c["url"], c["name"]), SAMPLE_CARDS, repeat=3)
+        results[f"{factor}x"] = {
+            "bytes": len(html_content.encode("utf-8")),
+            "cards": len(site.cards),
+            "parse_ms": parse_ms,
+            "search_index_build_ms": search_build_ms,
+            "dedup_index_build_ms": dedup_build_ms,
+            "search_query_us": query_us,
+            "dedup_find_us": find_us,
+        }
+    return results
+
+
+async def bench_content_handler(main, fakes, tracker, requests, concurrency, tg_latency):
+    from aiogram.fsm.context import FSMContext
+    from aiogram.fsm.storage.base import StorageKey
+    from aiogram.fsm.storage.memory import MemoryStorage
+
+    storage = MemoryStorage()
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+    handler_samples = []
+    outcomes = {}
+
+    async def one(i):
+        text = f"Пост #{i}: https://bench{i}.example.dev/tool\n{SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]}"
+        message = fakes.FakeMessage(text, tg_latency=tg_latency, chat_id=i, user_id=i)
+        state = FSMContext(storage=storage, key=StorageKey(bot_id=1, chat_id=i, user_id=i))
+        async with semaphore:
+            started = time.perf_counter()
+            await main.main_content_handler(message, state)
+            handler_samples.append(time.perf_counter() - started)
+            final = await tracker.finish(message, main.bot)
+            samples.append(time.perf_counter() - started)
+        outcome = HANDLER_OUTCOMES.get(final.split()[0] if final else "", "other")
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    summary = latency_summary(samples, time.perf_counter() - started)
+    summary["outcomes"] = outcomes
+    # Сколько хендлер держит апдейт: только постановка задачи в очередь
+    summary["handler_p50_ms"] = round(statistics.median(handler_samples) * 1000, 1)
+    return summary
+
+
+async def bench_ask_handler(main, fakes, tracker, requests, concurrency, tg_latency):
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def one(i):
+        message = fakes.FakeMessage(f"/ask {ASK_QUERIES[i % len(ASK_QUERIES)]}", tg_latency=tg_latency)
+        async with semaphore:
+            started = time.perf_counter()
+            await main.ask_database_handler(message)
+            await tracker.finish(message, main.bot)
+            samples.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return latency_summary(samples, time.perf_counter() - started)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, timeout=10
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def flatten(data, prefix=""):
+    for key, value in data.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from flatten(value, name)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield name, value
+
+
+def compare(current, previous):
+    old = dict(flatten(previous.get("results", {})))
+    for name, value in flatten(current["results"]):
+        if name in old and old[name]:
+            print(f"{name:<60} {old[name]:>12} -> {value:>12}  x{value / old[name]:.2f}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--out", default=None, help="куда сохранить JSON (по умолчанию только stdout)")
+    parser.add_argument("--compare", default=None, help="прошлый JSON для сравнения")
+    parser.add_argument("--quick", action="store_true", help="меньше запросов и без 100x")
+    parser.add_argument("--scales", default="1,10,100")
+    parser.add_argument("--latency", type=float, default=0.8, help="задержка ответа модели, с")
+    parser.add_argument("--jitter", type=float, default=0.3)
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--malformed-rate", type=float, default=0.1)
+    parser.add_argument("--no-structured-output", action="store_true", help="модели отклоняют response_format")
+    parser.add_argument("--github-latency", type=float, default=0.05)
+    parser.add_argument("--conflict-rate", type=float, default=0.1)
+    parser.add_argument("--tg-latency", type=float, default=0.03)
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    scales = [int(s) for s in args.scales.split(",") if s]
+    if args.quick:
+        scales = [s for s in scales if s < 100]
+        args.requests = min(args.requests, 10)
+
+    workdir = tempfile.mkdtemp(prefix="bench_suite_")
+    for name, value in (("TG_TOKEN", "123456:bench"), ("GITHUB_TOKEN", "bench"), ("HF_TOKEN", "bench")):
+        os.environ.setdefault(name, value)
+    os.environ["CLASS_CACHE_PATH"] = os.path.join(workdir, "class_cache.sqlite3")
+    os.environ["MODEL_STATS_PATH"] = os.path.join(workdir, "model_stats.json")
+    os.environ["JOBS_PATH"] = os.path.join(workdir, "jobs.sqlite3")
+    os.environ["VECTORS_PATH"] = os.path.join(workdir, "vectors")
+    os.environ["LINK_META_PATH"] = os.path.join(workdir, "link_meta.sqlite3")
+    import logging
+    logging.disable(logging.ERROR)
+
+    import main
+    from bench import fakes
+
+    with open(os.path.join(ROOT, "index.html"), encoding="utf-8") as f:
+        repo = fakes.FakeRepo({main.FILE_PATH: f.read()}, latency=args.github_latency, conflict_rate=args.conflict_rate)
+    fake_hf = fakes.FakeInferenceClient(
+        latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+        malformed_rate=args.malformed_rate, max_concurrency=main.HF_MAX_CONCURRENCY,
+        structured_output=not args.no_structured_output
+    )
+    main.get_repo = lambda: repo
+    main.hf = fake_hf
+    main.link_meta = fakes.FakeLinkMetaFetcher(latency=args.latency / 2)
+    main.bot = fakes.FakeBot(args.tg_latency)
+
+    results = {"micro": bench_micro(main), "site": bench_scales(main, scales)}
+
+    tracker = fakes.JobTracker(main.jobs)
+
+    async def e2e():
+        main.jobs.start()
+        content = await bench_content_handler(main, fakes, tracker, args.requests, args.concurrency, args.tg_latency)
+        await main.commit_queue.flush()
+        ask = await bench_ask_handler(main, fakes, tracker, args.requests, args.concurrency, args.tg_latency)
+        await main.jobs.stop()
+        return content, ask
+
+    calls_before = fake_hf.calls
+    results["main_content_handler"], results["ask_database_handler"] = asyncio.run(e2e())
+    results["fakes"] = {"model_calls": fake_hf.calls - calls_before, "github_calls": len(repo.calls),
+                        "commits": len(repo.commits)}
+    json_results = {}
+    for (model, mode, result), count in main.MODEL_JSON_RESULTS.snapshot().items():
+        json_results.setdefault(mode, {}).setdefault(result, 0)
+        json_results[mode][result] += count
+    results["model_json"] = json_results
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "params": vars(args),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=1)
+    print(text)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,128 @@
+"""
+Поиск похожих карточек по эмбеддингам (vectors.VectorStore).
+Качество: каждая карточка index.html по очереди убирается из хранилища, и ищется ее "перепост" —
+другая ссылка, переформулированное название, урезанное описание. Считается, как часто оригинал
+находится выше порога (recall) и как часто выше порога оказывается чужая карточка (false positives).
+Масштаб: синтетические 1k/10k/50k карточек — время дозаписи, поиска и размер файла.
+
+    python bench/bench_vectors.py [--thresholds 0.4,0.5,0.6,0.7] [--scales 1000,10000,50000] [--embedder hashing]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from cards import Card, parse_site
+from vectors import VectorStore, make_embedder
+
+
+def repost(card, rnd):
+    """
+    Тот же ресурс, пересказанный заново: ссылка на репозиторий вместо лендинга, другое название, часть описания.
+    """
+    words = card.name.split()
+    if len(words) > 1 and rnd.random() < 0.5:
+        words.pop(rnd.randrange(len(words)))
+    name = " ".join(words) + rnd.choice(("", " app", " — обзор", " AI"))
+    sentences = [s for s in card.desc.replace("!", ".").split(".") if s.strip()]
+    rnd.shuffle(sentences)
+    desc = ". ".join(sentences[:max(1, len(sentences) * 2 // 3)])
+    slug = (words[0] if words else "tool").lower()
+    return Card(card.section, name=name, desc=desc, url=f"https://github.com/someone/{slug}",
+                prompt_body=card.prompt_body)
+
+
+def quality(cards, embedder, thresholds, workdir):
+    rnd = random.Random(0)
+    store = VectorStore(os.path.join(workdir, "quality"), embedder)
+    store.sync(cards)
+    hits = {t: 0 for t in thresholds}
+    false_positives = {t: 0 for t in thresholds}
+    for i, card in enumerate(cards):
+        others = cards[:i] + cards[i + 1:]
+        store.sync(others)
+        query = repost(card, rnd)
+        # Та же карточка без оригинала в хранилище: все, что выше порога, — ложное срабатывание
+        best_other = store.nearest(query, 1)
+        store.add(card)
+        best = store.nearest(query, 1)
+        for t in thresholds:
+            hits[t] += bool(best) and best[0][0] >= t and best[0][1]["name"] == card.name
+            false_positives[t] += bool(best_other) and best_other[0][0] >= t
+    return [
+        {"threshold": t, "recall": round(hits[t] / len(cards), 3),
+         "false_positive_rate": round(false_positives[t] / len(cards), 3)}
+        for t in thresholds
+    ]
+
+
+def synthetic(cards, count, rnd):
+    vocabulary = [word for card in cards for word in f"{card.name} {card.desc}".split()]
+    out = []
+    for i in range(count):
+        base = cards[i % len(cards)]
+        extra = " ".join(rnd.choice(vocabulary) for _ in range(8))
+        out.append(Card(base.section, name=f"{base.name} {i}", desc=f"{base.desc} {extra}",
+                        url=f"https://example{i}.com/", prompt_body=base.prompt_body))
+    return out
+
+
+def scale(cards, embedder, count, workdir):
+    rnd = random.Random(count)
+    pool = synthetic(cards, count, rnd)
+    store = VectorStore(os.path.join(workdir, f"scale_{count}"), embedder)
+    started = time.perf_counter()
+    store.sync(pool)
+    build = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for card in cards[:50]:
+        store.add(Card(card.section, name=f"{card.name} new", desc=card.desc, url=card.url))
+    add_ms = (time.perf_counter() - started) / 50 * 1000
+
+    queries = [repost(card, rnd) for card in cards[:100]]
+    started = time.perf_counter()
+    for query in queries:
+        store.nearest(query, 3)
+    search_ms = (time.perf_counter() - started) / len(queries) * 1000
+
+    started = time.perf_counter()
+    reopened = VectorStore(os.path.join(workdir, f"scale_{count}"), embedder)
+    open_ms = (time.perf_counter() - started) * 1000
+    return {
+        "cards": len(reopened),
+        "build_s": round(build, 2),
+        "add_ms": round(add_ms, 2),
+        "search_ms": round(search_ms, 2),
+        "open_ms": round(open_ms, 1),
+        "file_mb": round(os.path.getsize(os.path.join(workdir, f"scale_{count}.f32")) / 2 ** 20, 1),
+    }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--thresholds", default="0.4,0.5,0.6,0.7")
+    parser.add_argument("--scales", default="1000,10000,50000")
+    parser.add_argument("--embedder", default="hashing")
+    args = parser.parse_args()
+
+    with open(os.path.join(ROOT, "index.html"), encoding="utf-8") as f:
+        cards = parse_site(f.read()).cards
+    embedder = make_embedder(args.embedder)
+    workdir = tempfile.mkdtemp(prefix="bench_vectors_")
+    report = {
+        "embedder": embedder.name,
+        "quality": quality(cards, embedder, [float(t) for t in args.thresholds.split(",") if t], workdir),
+        "scale": [scale(cards, embedder, int(n), workdir) for n in args.scales.split(",") if n],
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=1))
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,40 @@
+"""
+Прогоняет корпус вариантов ссылок через dedup.canonical_url.
+
+    python bench/check_url_corpus.py
+
+Каждая группа "equivalent" должна схлопнуться в один ключ, пары "distinct" — остаться разными.
+"""
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup import canonical_url
+
+
+def main():
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "url_corpus.json"), encoding="utf-8") as f:
+        corpus = json.load(f)
+
+    failures = 0
+    for group in corpus["equivalent"]:
+        keys = {url: canonical_url(url) for url in group}
+        if len(set(keys.values())) != 1:
+            failures += 1
+            print("NOT MERGED:")
+            for url, key in keys.items():
+                print(f"    {url}  ->  {key}")
+    for first, second in corpus["distinct"]:
+        if canonical_url(first) == canonical_url(second):
+            failures += 1
+            print(f"FALSE MERGE: {first} == {second}  ->  {canonical_url(first)}")
+
+    total = len(corpus["equivalent"]) + len(corpus["distinct"])
+    print(f"{total - failures}/{total} cases OK")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+"""
+Локальные заменители HF и GitHub для бенчмарков: тот же интерфейс, что у AsyncInferenceClient
+и у объектов PyGithub, которые трогает бот, плюс управляемая задержка "сети".
+"""
+import re
+import json
+import base64
+import time
+import random
+import asyncio
+import hashlib
+
+from github import GithubException
+
+_URL_RE = re.compile(r'https?://[^\s<>")\]]+')
+
+# Ключевые слова -> раздел (грубая имитация того, что отвечают модели)
+_KEYWORDS = (
+    ("osint", ("osint", "exploit", "leak", "pentest")),
+    ("prompts", ("act as", "you are a", "prompt")),
+    ("apk", ("android", "apk", "ios")),
+    ("sys", ("windows", "linux", "driver")),
+    ("study", ("course", "tutorial", "lecture")),
+    ("dev", ("github.com", "library", "api")),
+    ("fun", ("game", "movie")),
+    ("chat", ("hello", "thanks", "привет")),
+)
+
+
+def git_sha(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def fake_classification(text):
+    lowered = text.lower()
+    section = next((name for name, words in _KEYWORDS if any(w in lowered for w in words)), "ai")
+    url = _URL_RE.search(text)
+    first_line = next((line.strip() for line in text.splitlines() if line.strip()), "Resource")
+    # Детерминированная "неуверенность" примерно у каждого десятого поста
+    doubtful = int(git_sha(text)[:2], 16) < 26
+    return {
+        "thought_process": "stand-in",
+        "section": section,
+        "alternative": "ideas" if doubtful else "none",
+        "confidence": 60 if doubtful else 95,
+        "name": first_line[:60],
+        "desc": text[:160],
+        "url": url.group(0) if url else "none",
+        "platform": "none",
+        "prompt_body": text if section == "prompts" else "none",
+        "reply_text": "ok",
+    }
+
+
+# Типичные поломки JSON от моделей без response_format
+CORRUPTIONS = ("truncated", "prose", "prose_braces", "unescaped_quotes", "python_repr", "trailing_comma")
+
+
+def corrupt_json(data, kind):
+    payload = json.dumps(data, ensure_ascii=False)
+    if kind == "truncated":
+        return "```json\n" + payload[:len(payload) // 2]
+    if kind == "prose":
+        return f"Sure! Here is the analysis:\n{payload}\nLet me know if you need anything else."
+    if kind == "prose_braces":
+        # Фигурные скобки в рассуждениях до и после блока ```json
+        return f"Sure! I think {{this is}} tricky.\n```json\n{payload}\n```\nDone {{ok}}"
+    if kind == "unescaped_quotes":
+        return payload.replace('ok"', 'ok, "quoted" text"', 1)
+    if kind == "python_repr":
+        return repr(data)
+    if kind == "trailing_comma":
+        return payload[:-1] + ",\n}"
+    raise ValueError(kind)
+
+
+class FakeInferenceClient:
+    """
+    Заменитель AsyncInferenceClient: отвечает JSON-ом по ключевым словам после latency секунд
+    (с разбросом jitter), с вероятностью error_rate падает, с вероятностью malformed_rate
+    отдает битый JSON (одна из CORRUPTIONS). С response_format отвечает чистым JSON,
+    а если structured_output=False — отклоняет его с 400, как провайдеры без поддержки схем.
+    """
+
+    def __init__(self, latency=0.8, jitter=0.4, error_rate=0.0, malformed_rate=0.0, max_concurrency=8, seed=0,
+                 structured_output=True):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.malformed_rate = malformed_rate
+        self.structured_output = structured_output
+        self.calls = 0
+        self._random = random.Random(seed)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def chat_completion(self, model, messages, max_tokens=1024, temperature=0.1, timeout=30.0, **extra):
+        from hf_client import InferenceError
+        self.calls += 1
+        if "response_format" in extra and not self.structured_output:
+            raise InferenceError(400, "response_format is not supported by this model")
+        async with self._semaphore:
+            await asyncio.sleep(max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter)))
+        if self._random.random() < self.error_rate:
+            raise InferenceError(503, "stand-in overloaded")
+        # Промпт классификации: "ANALYZE:\n<пост>\nURL: <ссылка>"
+        text = messages[-1]["content"].removeprefix("ANALYZE:\n").rsplit("\nURL:", 1)[0]
+        data = fake_classification(text)
+        if "response_format" in extra:
+            return json.dumps(data, ensure_ascii=False)
+        if self._random.random() < self.malformed_rate:
+            return corrupt_json(data, self._random.choice(CORRUPTIONS))
+        return "```json\n" + json.dumps(data, ensure_ascii=False) + "\n```"
+
+    async def stream_chat_completion(self, model, messages, max_tokens=1024, temperature=0.1, idle_timeout=20.0, **extra):
+        self.calls += 1
+        if self._random.random() < self.error_rate:
+            from hf_client import InferenceError
+            raise InferenceError(503, "stand-in overloaded")
+        answer = "🔹 <b>Stand-in</b> answer based on the provided database context, " * 4
+        for word in answer.split(" "):
+            await asyncio.sleep(self.latency / 20)
+            yield word + " "
+
+    async def close(self):
+        pass
+
+
+class FakeLinkMetaFetcher:
+    """
+    Заменитель LinkMetaFetcher без сети: после latency секунд отдает title и description из самой ссылки.
+    Для проверки настоящего загрузчика — bench/bench_link_meta.py с локальным HTTP-сервером.
+    """
+
+    def __init__(self, latency=0.3):
+        self.latency = latency
+        self.fetches = 0
+        self._inflight = {}
+
+    def prefetch(self, url):
+        if url not in self._inflight:
+            self._inflight[url] = asyncio.ensure_future(self._load(url))
+
+    async def fetch(self, url):
+        self.prefetch(url)
+        return await asyncio.shield(self._inflight[url])
+
+    async def _load(self, url):
+        self.fetches += 1
+        await asyncio.sleep(self.latency)
+        host = re.sub(r'^https?://', '', url).split('/')[0]
+        return {"url": url, "final_url": url, "title": host, "description": f"Stand-in page for {url}", "site_name": host}
+
+    async def close(self):
+        pass
+
+
+class _Obj:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class FakeRepo:
+    """
+    Заменитель github.Repository для Git Data API и условных запросов SiteCache/SiteStore.
+    files — {path: html}; latency — задержка каждого вызова; calls — журнал вызовов;
+    conflict_rate — доля обновлений ветки, отклоненных как "not a fast forward".
+    """
+
+    url = "https://api.github.test/repos/bench/site"
+
+    def __init__(self, files, latency=0.05, conflict_rate=0.0, seed=0):
+        self.files = dict(files)
+        self.latency = latency
+        self.conflict_rate = conflict_rate
+        self._random = random.Random(seed)
+        self.head = git_sha("initial")
+        self.calls = []
+        self.commits = []
+        self._blobs = {}
+        self._trees = {}
+
+    def _call(self, name):
+        self.calls.append(name)
+        if self.latency:
+            time.sleep(self.latency)
+
+    def get_contents(self, path, ref=None):
+        self._call("get_contents")
+        return _FakeContentFile(self, path)
+
+    def get_git_ref(self, ref):
+        self._call("get_git_ref")
+        return _FakeRef(self)
+
+    def get_git_commit(self, sha):
+        self._call("get_git_commit")
+        return _Obj(sha=sha, tree=_Obj(sha=f"tree-{sha}"))
+
+    def create_git_blob(self, content, encoding):
+        self._call("create_git_blob")
+        sha = git_sha(content)
+        self._blobs[sha] = content
+        return _Obj(sha=sha)
+
+    def create_git_tree(self, elements, base_tree=None):
+        self._call("create_git_tree")
+        entries = []
+        for element in elements:
+            identity = element._identity
+            if "content" in identity:     # файл передан прямо в дереве, без отдельного blob
+                self._blobs[git_sha(identity["content"])] = identity["content"]
+                entries.append((identity["path"], git_sha(identity["content"])))
+            else:
+                entries.append((identity["path"], identity["sha"]))
+        sha = git_sha(json.dumps(entries))
+        self._trees[sha] = entries
+        return _Obj(sha=sha)
+
+    def create_git_commit(self, message, tree, parents):
+        self._call("create_git_commit")
+        sha = git_sha(f"{message}{tree.sha}{time.time()}")
+        self.commits.append(_Obj(sha=sha, message=message, tree=tree.sha, parent=parents[0].sha))
+        return _Obj(sha=sha)
+
+    @property
+    def requester(self):
+        return _FakeRequester(self)
+
+
+class _FakeContentFile:
+    def __init__(self, repo, path):
+        self._repo = repo
+        self.path = path
+        self._load()
+
+    def _load(self):
+        content = self._repo.files[self.path]
+        self.sha = git_sha(content)
+        # Как у PyGithub: тело хранится в base64 внутри сырого ответа
+        self._rawData = {"content": base64.b64encode(content.encode("utf-8")).decode("ascii")}
+
+    @property
+    def decoded_content(self):
+        return base64.b64decode(self._rawData["content"])
+
+    def update(self):
+        self._repo._call("conditional_get")
+        if git_sha(self._repo.files[self.path]) == self.sha:
+            return False
+        self._load()
+        return True
+
+
+class _FakeRef:
+    def __init__(self, repo):
+        self._repo = repo
+        self.object = _Obj(sha=repo.head)
+
+    def edit(self, sha, force=False):
+        repo = self._repo
+        repo._call("edit_ref")
+        commit = next(c for c in repo.commits if c.sha == sha)
+        if not force and (commit.parent != repo.head or repo._random.random() < repo.conflict_rate):
+            raise GithubException(422, {"message": "Update is not a fast forward"}, None)
+        for path, blob_sha in repo._trees[commit.tree]:
+            repo.files[path] = repo._blobs[blob_sha]
+        repo.head = sha
+
+
+class _FakeRequester:
+    def __init__(self, repo):
+        self._repo = repo
+
+    def requestJson(self, verb, url, parameters=None, headers=None):
+        repo = self._repo
+        repo._call("list_directory")
+        directory = url.rsplit("/contents/", 1)[-1]
+        items = [{"path": p, "sha": git_sha(h)} for p, h in sorted(repo.files.items()) if p.startswith(f"{directory}/")]
+        etag = f'"{git_sha(json.dumps(items))}"'
+        if (headers or {}).get("If-None-Match") == etag:
+            return 304, {}, ""
+        return 200, {"ETag": etag}, json.dumps(items)
+
+
+class FakeMessage:
+    """
+    Заменитель aiogram Message для хендлеров: answer/reply создают новое "сообщение",
+    edit_text запоминает правки. tg_latency — задержка каждого вызова Bot API.
+    """
+
+    _next_id = 0
+
+    def __init__(self, text="", tg_latency=0.0, chat_id=1, user_id=1, media_group_id=None, forward_channel=None):
+        FakeMessage._next_id += 1
+        self.message_id = FakeMessage._next_id
+        self.text = text
+        self.caption = None
+        self.media_group_id = media_group_id
+        # Пересланное из канала: как MessageOriginChannel у aiogram
+        self.forward_origin = _Obj(chat=_Obj(id=forward_channel)) if forward_channel is not None else None
+        self.chat = _Obj(id=chat_id)
+        self.from_user = _Obj(id=user_id)
+        self.tg_latency = tg_latency
+        self.edits = []
+        self.replies = []
+
+    async def _api(self):
+        if self.tg_latency:
+            await asyncio.sleep(self.tg_latency)
+
+    async def answer(self, text, **kwargs):
+        await self._api()
+        reply = FakeMessage(text, self.tg_latency, self.chat.id, self.from_user.id)
+        self.replies.append(reply)
+        return reply
+
+    reply = answer
+
+    async def edit_text(self, text, **kwargs):
+        await self._api()
+        self.text = text
+        self.edits.append(text)
+        return self
+
+
+class FakeBot:
+    """
+    Заменитель Bot: messages — последний текст каждого сообщения, отредактированного
+    по chat_id/message_id (так статусы правят фоновые задачи).
+    """
+
+    id = 1
+
+    def __init__(self, tg_latency=0.0):
+        self.tg_latency = tg_latency
+        self.messages = {}
+
+    async def send_chat_action(self, chat_id, action, **kwargs):
+        if self.tg_latency:
+            await asyncio.sleep(self.tg_latency)
+        return True
+
+    async def edit_message_text(self, text, chat_id=None, message_id=None, **kwargs):
+        if self.tg_latency:
+            await asyncio.sleep(self.tg_latency)
+        self.messages[(chat_id, message_id)] = text
+        return True
+
+
+class JobTracker:
+    """
+    Запоминает задачи, которые ставят хендлеры, по id статусного сообщения:
+    бенчмарк дожидается своей задачи и читает итоговый текст статуса у FakeBot.
+    """
+
+    def __init__(self, jobs):
+        self.jobs = jobs
+        self.by_message = {}
+        enqueue = jobs.enqueue
+
+        def tracking_enqueue(*args, **kwargs):
+            job_id = enqueue(*args, **kwargs)
+            self.by_message[kwargs.get("message_id")] = job_id
+            return job_id
+
+        jobs.enqueue = tracking_enqueue
+
+    async def finish(self, message, bot):
+        """
+        Дожидается задачи, созданной хендлером на message; возвращает итоговый текст бота.
+        """
+        if not message.replies:
+            return ""
+        status = message.replies[-1]
+        job_id = self.by_message.get(status.message_id)
+        if job_id is not None:
+            await self.jobs.wait(job_id)
+        return bot.messages.get((status.chat.id, status.message_id), status.text)
@@ -0,0 +1,43 @@
+"""
+Синтетический index.html в N раз больше исходного: карточки каждого раздела размножаются
+с уникальными названиями и ссылками и вставляются перед маркером раздела.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cards import parse_site
+
+
+def synthetic_index(html_content, factor, render_card):
+    """
+    render_card(data) -> html карточки (обычно main.generate_card_html, чтобы разметка совпадала с боевой).
+    factor=1 возвращает исходный файл.
+    """
+    if factor <= 1:
+        return html_content
+    site = parse_site(html_content)
+    inserts = []
+    for section, pos in site.markers.items():
+        cards = [card for card in site.cards if card.section == section]
+        if not cards:
+            continue
+        block = []
+        for copy in range(1, factor):
+            for card in cards:
+                url = card.url if card.url in ("", "#") else f"{card.url.rstrip('/')}/copy-{copy}"
+                block.append(render_card({
+                    "section": section, "name": f"{card.name} #{copy}", "desc": card.desc,
+                    "url": url or "#", "platform": card.platform or None, "prompt_body": card.prompt_body or None,
+                }) + "\n")
+        inserts.append((pos, "".join(block)))
+    inserts.sort()
+    parts = []
+    prev = 0
+    for pos, block in inserts:
+        parts.append(html_content[prev:pos])
+        parts.append(block)
+        prev = pos
+    parts.append(html_content[prev:])
+    return "".join(parts)
@@ -0,0 +1,269 @@
+"""
+Пакетный импорт из экспорта Telegram Desktop (result.json) или JSONL с сообщениями.
+
+    python bulk_import.py result.json [--concurrency 4] [--batch 100] [--review review.jsonl]
+
+Конвейер: префильтр -> кэш классификации -> каскад моделей -> дедупликация при коммите.
+Карточки пишутся крупными пачками (один коммит на --batch карточек), спорные — в файл ревью,
+прогресс сохраняется в чекпоинт, повторный запуск продолжает с места остановки.
+"""
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+import argparse
+
+import main
+from main import analyze_content_full_cycle, missing_required_link, sync_push_to_github
+
+logger = logging.getLogger(__name__)
+
+REVIEW_CONFIDENCE = 80      # ниже — в ручное ревью (как кнопки "Сомнения" в боте)
+PROGRESS_INTERVAL = 5.0
+
+
+def message_text(message):
+    """
+    Текст сообщения из экспорта. Скрытые ссылки (text_link) дописываются явно,
+    иначе экстрактор ссылок их не увидит.
+    """
+    text = message.get("text", "")
+    if isinstance(text, str):
+        return text
+    parts = []
+    for part in text:
+        if isinstance(part, str):
+            parts.append(part)
+            continue
+        parts.append(part.get("text", ""))
+        href = part.get("href")
+        if href and href not in part.get("text", ""):
+            parts.append(f" ({href})")
+    return "".join(parts)
+
+
+def load_messages(path):
+    """
+    [(id, text), ...] из result.json Telegram Desktop или JSONL (по объекту сообщения на строку).
+    """
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            raw = [json.loads(line) for line in f if line.strip()]
+        else:
+            data = json.load(f)
+            raw = data.get("messages", []) if isinstance(data, dict) else data
+    messages = []
+    for i, message in enumerate(raw):
+        if message.get("type", "message") != "message":
+            continue
+        text = message_text(message)
+        if message.get("caption"):
+            text = f"{text}\n{message['caption']}".strip()
+        messages.append((str(message.get("id", i)), text))
+    return messages
+
+
+def prefilter(text, link_meta=True):
+    """
+    Те же отсечки, что и у бота: пустое и слишком короткое. "Голую" ссылку бот разбирает по метаданным
+    страницы, поэтому пропускаем ее, только когда метаданные выключены (link_meta=False).
+    Возвращает причину пропуска или None.
+    """
+    content = text.strip()
+    if len(content) < 5:
+        return "too_short"
+    if not link_meta and re.match(r'^https?://\S+$', content):
+        return "bare_link"
+    return None
+
+
+def confidence(data):
+    try:
+        return int(data.get('confidence', 100))
+    except (TypeError, ValueError):
+        return 100
+
+
+class Checkpoint:
+    """
+    Итоги по id сообщений. Классифицированные, но еще не закоммиченные карточки сюда не попадают:
+    после перезапуска они пройдут заново (и почти бесплатно — через кэш классификации).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.done = {}
+        if os.path.exists(path):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    self.done = json.load(f).get("done", {})
+            except (OSError, ValueError) as e:
+                logger.warning(f"Can't read checkpoint {path}: {e}")
+
+    def mark(self, msg_id, outcome):
+        self.done[msg_id] = outcome
+
+    def save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"done": self.done}, f)
+        os.replace(tmp_path, self.path)
+
+
+class BulkImporter:
+    def __init__(self, checkpoint, review_path, concurrency=4, batch_size=100):
+        self.checkpoint = checkpoint
+        self.review_path = review_path
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.counts = {}
+        self.processed = 0
+        self.total = 0
+        self._pending = []      # [(msg_id, text, data)] — ждут коммита
+        self._started = 0.0
+        self._reported_at = 0.0
+
+    async def run(self, messages):
+        todo = [(msg_id, text) for msg_id, text in messages if msg_id not in self.checkpoint.done]
+        self.total = len(todo)
+        self._started = self._reported_at = time.monotonic()
+        logger.info(f"📥 Import: {len(messages)} messages, {len(messages) - len(todo)} already done, {len(todo)} to go")
+
+        inbox = asyncio.Queue(maxsize=self.concurrency * 2)
+        outbox = asyncio.Queue(maxsize=self.concurrency * 2)
+        workers = [asyncio.create_task(self._worker(inbox, outbox)) for _ in range(self.concurrency)]
+        sink = asyncio.create_task(self._sink(outbox))
+        try:
+            for item in todo:
+                await inbox.put(item)
+            for _ in workers:
+                await inbox.put(None)
+            await asyncio.gather(*workers)
+            await outbox.put(None)
+            await sink
+        finally:
+            for task in (*workers, sink):
+                task.cancel()
+        await self._commit()
+        self._report(final=True)
+        return self.counts
+
+    def items_per_minute(self):
+        elapsed = time.monotonic() - self._started
+        return self.processed * 60 / elapsed if elapsed > 0 else 0.0
+
+    async def _worker(self, inbox, outbox):
+        while True:
+            item = await inbox.get()
+            if item is None:
+                return
+            msg_id, text = item
+            skip = prefilter(text, link_meta=main.link_meta is not None)
+            data = None
+            if skip is None:
+                try:
+                    data = await analyze_content_full_cycle(text, use_fallback=False)
+                except Exception as e:
+                    logger.error(f"Classification of {msg_id} failed: {e}")
+            await outbox.put((msg_id, text, skip, data))
+
+    async def _sink(self, outbox):
+        while True:
+            item = await outbox.get()
+            if item is None:
+                return
+            msg_id, text, skip, data = item
+            self.processed += 1
+            if skip:
+                self._finish(msg_id, skip)
+            elif not data:
+                self._review(msg_id, text, "unclassified", None)
+            elif str(data.get('section', 'ai')).lower() == 'chat':
+                self._finish(msg_id, "chat")
+            elif (confidence(data) < REVIEW_CONFIDENCE
+                  and data.get('alternative') and data.get('alternative') != data.get('section')):
+                self._review(msg_id, text, "low_confidence", data)
+            elif missing_required_link(data):
+                self._review(msg_id, text, "missing_link", data)
+            else:
+                self._pending.append((msg_id, text, data))
+                if len(self._pending) >= self.batch_size:
+                    await self._commit()
+            self._report()
+
+    async def _commit(self):
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        results = await asyncio.to_thread(sync_push_to_github, [(data, False) for _, _, data in pending])
+        for (msg_id, text, data), result in zip(pending, results):
+            if result == "OK":
+                self._finish(msg_id, "added")
+            elif result == "DUPLICATE":
+                self._finish(msg_id, "duplicate")
+            elif result == "MARKER_ERROR":
+                self._review(msg_id, text, "marker_error", data)
+            else:
+                # Сбой GitHub: не отмечаем, следующий запуск повторит
+                self.counts["git_error"] = self.counts.get("git_error", 0) + 1
+        self.checkpoint.save()
+
+    def _finish(self, msg_id, outcome):
+        self.counts[outcome] = self.counts.get(outcome, 0) + 1
+        self.checkpoint.mark(msg_id, outcome)
+
+    def _review(self, msg_id, text, reason, data):
+        with open(self.review_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"id": msg_id, "reason": reason, "text": text, "data": data}, ensure_ascii=False) + "\n")
+        self._finish(msg_id, f"review:{reason}")
+
+    def _report(self, final=False):
+        now = time.monotonic()
+        if not final and now - self._reported_at < PROGRESS_INTERVAL:
+            return
+        self._reported_at = now
+        self.checkpoint.save()
+        rate = self.items_per_minute()
+        left = self.total - self.processed
+        eta = f", ETA {left / rate:.1f} min" if rate and left else ""
+        summary = ", ".join(f"{k}={v}" for k, v in sorted(self.counts.items()))
+        logger.info(f"⏳ {self.processed}/{self.total} ({rate:.0f} items/min{eta}) {summary}")
+
+
+async def run_import(path, concurrency=4, batch_size=100, review_path=None, checkpoint_path=None):
+    checkpoint = Checkpoint(checkpoint_path or f"{path}.checkpoint.json")
+    importer = BulkImporter(
+        checkpoint, review_path or f"{path}.review.jsonl", concurrency=concurrency, batch_size=batch_size
+    )
+    try:
+        await importer.run(load_messages(path))
+    finally:
+        main.model_health.save()
+    return importer
+
+
+def cli():
+    parser = argparse.ArgumentParser(description="Bulk import of a Telegram export into the site")
+    parser.add_argument("path", help="result.json из Telegram Desktop или .jsonl")
+    parser.add_argument("--concurrency", type=int, default=4, help="одновременных классификаций")
+    parser.add_argument("--batch", type=int, default=100, help="карточек в одном коммите")
+    parser.add_argument("--review", default=None, help="куда писать спорные сообщения")
+    parser.add_argument("--checkpoint", default=None)
+    args = parser.parse_args()
+
+    async def go():
+        try:
+            await run_import(args.path, args.concurrency, args.batch, args.review, args.checkpoint)
+        finally:
+            await main.hf.close()
+            if main.link_meta is not None:
+                await main.link_meta.close()
+            await main.bot.session.close()
+
+    asyncio.run(go())
+
+
+if __name__ == "__main__":
+    cli()
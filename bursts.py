@@ -0,0 +1,179 @@
+import re
+import time
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+_BARE_LINK_RE = re.compile(r'^https?://\S+$')
+_URL_RE = re.compile(r'https?://\S+|www\.\S+')
+
+
+def message_text(message):
+    return (message.text or message.caption or "").strip()
+
+
+def is_bare_link(text):
+    return bool(_BARE_LINK_RE.match(text))
+
+
+def forward_source(message):
+    """
+    Откуда переслано: ("channel", id), ("chat", id), ("user", id) или ("hidden", имя); None — набрано самим.
+    """
+    origin = getattr(message, "forward_origin", None)
+    if origin is None:
+        return None
+    for kind, attr in (("channel", "chat"), ("chat", "sender_chat"), ("user", "sender_user")):
+        sender = getattr(origin, attr, None)
+        if sender is not None:
+            return kind, sender.id
+    return "hidden", getattr(origin, "sender_user_name", None)
+
+
+class _Burst:
+    __slots__ = ("messages", "group", "source", "has_link", "complete", "links_only", "started", "last", "timer")
+
+    def __init__(self, now):
+        self.messages = []
+        self.group = None
+        self.source = None
+        self.has_link = False
+        self.complete = False
+        self.links_only = True
+        self.started = now
+        self.last = now
+        self.timer = None
+
+
+class BurstAggregator:
+    """
+    Склеивает части одного поста, которые Telegram присылает отдельными сообщениями: подписи альбома
+    (общий media_group_id), пересланный пост, разбитый на текст и ссылку или продолжение (тот же источник
+    пересылки), голую ссылку до или после текста. deliver_fn(messages) вызывается один раз на пост
+    со всеми его сообщениями по порядку.
+    Набранное вручную сообщение со ссылкой или без уходит сразу. Часть ждет следующую, пока паузы
+    укладываются в окно чата: оно растет по паузам между склеенными частями и сжимается, когда
+    ожидание ничего не принесло, в пределах [min_window, max_window]. Два полных поста
+    (ссылка и min_text символов текста) из одного источника — пачка пересылок, их не склеиваем.
+    """
+
+    def __init__(self, deliver_fn, window=0.8, min_window=0.25, max_window=3.0, max_parts=10,
+                 min_text=40, max_chats=10000):
+        self.deliver_fn = deliver_fn
+        self.default_window = window
+        self.min_window = min_window
+        self.max_window = max_window
+        self.max_parts = max_parts
+        self.min_text = min_text
+        self.max_chats = max_chats
+        self._bursts = {}      # chat_id -> открытый _Burst
+        self._gaps = {}        # chat_id -> сглаженная пауза между частями, с
+        self._timers = set()
+
+    def window(self, chat_id):
+        gap = self._gaps.get(chat_id)
+        if gap is None:
+            return self.default_window
+        return min(self.max_window, max(self.min_window, gap * 3))
+
+    def pending(self):
+        return sum(len(burst.messages) for burst in self._bursts.values())
+
+    async def add(self, message):
+        text = message_text(message)
+        chat_id = message.chat.id
+        group = getattr(message, "media_group_id", None)
+        source = forward_source(message)
+        bare = is_bare_link(text)
+        now = time.monotonic()
+
+        # Состояние меняется до первого await: параллельный add того же чата увидит его целиком
+        burst = self._bursts.get(chat_id)
+        if burst is not None:
+            if self._accepts(burst, text, group, source, bare):
+                self._learn(chat_id, now - burst.last)
+                self._append(burst, message, text, group, source, bare, now)
+                if len(burst.messages) >= self.max_parts:
+                    await self._deliver(self._detach(chat_id).messages)
+                return
+            # Пришел другой пост: прежний уходит сразу, не дожидаясь окна
+            self._detach(chat_id)
+
+        if group is None and source is None and not bare:
+            if burst is not None:
+                await self._deliver(burst.messages)
+            await self._deliver([message])
+            return
+        opened = self._bursts[chat_id] = _Burst(now)
+        self._append(opened, message, text, group, source, bare, now)
+        opened.timer = asyncio.create_task(self._expire(chat_id, opened))
+        self._timers.add(opened.timer)
+        opened.timer.add_done_callback(self._timers.discard)
+        if burst is not None:
+            await self._deliver(burst.messages)
+
+    async def flush(self):
+        """
+        Отдает все недособранные посты сразу (например, перед остановкой).
+        """
+        for chat_id in list(self._bursts):
+            burst = self._detach(chat_id)
+            if burst is not None:
+                await self._deliver(burst.messages)
+        if self._timers:
+            await asyncio.gather(*self._timers, return_exceptions=True)
+
+    def _complete(self, text):
+        return bool(_URL_RE.search(text)) and len(_URL_RE.sub("", text).strip()) >= self.min_text
+
+    def _accepts(self, burst, text, group, source, bare):
+        if group is not None and group == burst.group:
+            return True
+        if bare:
+            return not burst.has_link
+        if burst.links_only:
+            return not _URL_RE.search(text)
+        return source is not None and source == burst.source and not (burst.complete and self._complete(text))
+
+    def _append(self, burst, message, text, group, source, bare, now):
+        burst.messages.append(message)
+        burst.group = burst.group or group
+        burst.source = burst.source or source
+        burst.has_link = burst.has_link or bool(_URL_RE.search(text))
+        burst.complete = burst.complete or self._complete(text)
+        burst.links_only = burst.links_only and bare
+        burst.last = now
+
+    def _learn(self, chat_id, gap):
+        previous = self._gaps.pop(chat_id, None)
+        self._gaps[chat_id] = gap if previous is None else previous * 0.7 + gap * 0.3
+        while len(self._gaps) > self.max_chats:
+            del self._gaps[next(iter(self._gaps))]
+
+    async def _expire(self, chat_id, burst):
+        while True:
+            deadline = min(burst.last + self.window(chat_id), burst.started + self.max_window)
+            delay = deadline - time.monotonic()
+            if delay <= 0:
+                break
+            # Окно пересчитывается после каждой пришедшей части, поэтому спим короткими шагами
+            await asyncio.sleep(min(delay, self.min_window))
+        if self._bursts.get(chat_id) is burst:
+            del self._bursts[chat_id]
+        if len(burst.messages) == 1:
+            # Ждали зря: в этом чате части, видимо, не приходят — следующий раз ждем меньше
+            self._learn(chat_id, self.window(chat_id) / 3 * 0.7)
+        await self._deliver(burst.messages)
+
+    def _detach(self, chat_id):
+        burst = self._bursts.pop(chat_id, None)
+        if burst is not None and burst.timer is not None:
+            burst.timer.cancel()
+        return burst
+
+    async def _deliver(self, messages):
+        try:
+            await self.deliver_fn(sorted(messages, key=lambda message: message.message_id))
+        except Exception as e:
+            logger.error(f"Burst delivery failed: {e}")
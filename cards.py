@@ -0,0 +1,234 @@
+import re
+from html.parser import HTMLParser
+
+SECTIONS = ('ai', 'prompts', 'study', 'prog', 'dev', 'apk', 'sys', 'osint', 'ideas', 'fun', 'shop')
+
+_MARKER_RE = re.compile(r'^\s*INSERT_([A-Z]+)_HERE\s*$')
+_SPACES_RE = re.compile(r'\s+')
+
+
+class Card:
+    """
+    Карточка сайта. start/end — смещения блока glass-card в исходном index.html.
+    """
+    __slots__ = ("section", "name", "desc", "url", "platform", "prompt_body", "start", "end")
+
+    def __init__(self, section="", name="", desc="", url="", platform="", prompt_body="", start=0, end=0):
+        self.section = section
+        self.name = name
+        self.desc = desc
+        self.url = url
+        self.platform = platform
+        self.prompt_body = prompt_body
+        self.start = start
+        self.end = end
+
+    def as_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __repr__(self):
+        return f"Card({self.section!r}, {self.name!r}, url={self.url!r})"
+
+
+class ParsedSite:
+    """
+    Результат разбора: карточки в порядке следования и позиции маркеров <!-- INSERT_X_HERE -->.
+    """
+    __slots__ = ("cards", "markers")
+
+    def __init__(self, cards, markers):
+        self.cards = cards
+        self.markers = markers
+
+    def marker_pos(self, section):
+        return self.markers.get(str(section).lower())
+
+    def insert(self, pos, card_html, section):
+        """
+        Учитывает вставку card_html в позицию pos без повторного разбора всей страницы.
+        Возвращает новую карточку (или None, если фрагмент не содержит карточки).
+        """
+        shift = len(card_html)
+        for card in self.cards:
+            if card.start >= pos:
+                card.start += shift
+                card.end += shift
+        for key, marker in self.markers.items():
+            if marker >= pos:
+                self.markers[key] = marker + shift
+
+        # Раздел передается парсеру: иначе он сочтет карточку не-apk и сбросит платформу
+        fragment = parse_site(card_html, section=section)
+        if not fragment.cards:
+            return None
+        new_card = fragment.cards[0]
+        new_card.start += pos
+        new_card.end += pos
+        idx = 0
+        while idx < len(self.cards) and self.cards[idx].start < new_card.start:
+            idx += 1
+        self.cards.insert(idx, new_card)
+        return new_card
+
+
+class CardParser(HTMLParser):
+    """
+    Однопроходный разбор index.html: карточки собираются по мере чтения тегов,
+    без split/regex по всей странице. Поддерживает потоковую подачу через feed().
+    """
+
+    def __init__(self, section=""):
+        super().__init__(convert_charrefs=True)
+        self.cards = []
+        self.markers = {}
+        self._line_starts = [0]
+        self._consumed = 0
+
+        self._section = section     # для шардов раздел известен заранее, <section> в них нет
+        self._card = None
+        self._div_depth = 0
+        self._field = None          # куда сейчас пишем текст: name / desc / platform / prompt_body
+        self._field_tag = None
+        self._field_depth = 0
+        self._buf = []
+        self._prompt_div_depth = 0  # >0 — мы внутри блока с текстом промпта
+        self._seen = set()
+
+    # --- смещения ---
+    def feed(self, data):
+        base = self._consumed
+        starts = self._line_starts
+        idx = data.find('\n')
+        while idx != -1:
+            starts.append(base + idx + 1)
+            idx = data.find('\n', idx + 1)
+        self._consumed += len(data)
+        super().feed(data)
+
+    def _offset(self):
+        line, col = self.getpos()
+        return self._line_starts[line - 1] + col
+
+    # --- события парсера ---
+    def handle_starttag(self, tag, attrs):
+        if tag == 'section':
+            for key, value in attrs:
+                if key == 'id' and value in SECTIONS:
+                    self._section = value
+            return
+
+        card = self._card
+        if tag == 'div':
+            attrs_d = dict(attrs)
+            if card is None:
+                if 'glass-card' in (attrs_d.get('class') or '').split():
+                    self._card = Card(section=self._section, start=self._offset())
+                    self._div_depth = 1
+                    self._seen = set()
+                return
+            self._div_depth += 1
+            if self._prompt_div_depth:
+                self._prompt_div_depth += 1
+            elif 'prompt_body' not in self._seen and (attrs_d.get('id') or '').endswith('-text'):
+                self._open_field('prompt_body', 'div')
+                self._prompt_div_depth = 1
+            return
+
+        if card is None:
+            return
+
+        if tag == 'xmp':
+            # Внутри <xmp> текст сырой: промпты часто содержат псевдотеги вроде <Role>
+            self.set_cdata_mode('xmp')
+            if self._field != 'prompt_body':
+                self._open_field('prompt_body', 'xmp')
+            return
+        if self._field:
+            if tag == self._field_tag:
+                self._field_depth += 1
+            return
+        if tag == 'h3' and 'name' not in self._seen:
+            self._open_field('name', 'h3')
+        elif tag == 'p' and 'desc' not in self._seen:
+            self._open_field('desc', 'p')
+        elif tag == 'span' and 'platform' not in self._seen:
+            self._open_field('platform', 'span')
+        elif tag == 'a' and not card.url:
+            card.url = dict(attrs).get('href') or ''
+
+    def handle_endtag(self, tag):
+        card = self._card
+        if card is None:
+            return
+        if tag == 'xmp':
+            if self._field == 'prompt_body' and self._field_tag == 'xmp':
+                self._close_field()
+            return
+        if tag == 'div':
+            if self._prompt_div_depth:
+                self._prompt_div_depth -= 1
+                if not self._prompt_div_depth and self._field == 'prompt_body':
+                    self._close_field()
+            self._div_depth -= 1
+            if self._div_depth == 0:
+                if self._field:
+                    self._close_field()
+                card.end = self._offset() + len('</div>')
+                self._finish_card(card)
+            return
+        if self._field and tag == self._field_tag and self._field != 'prompt_body':
+            self._field_depth -= 1
+            if self._field_depth <= 0:
+                self._close_field()
+
+    def handle_data(self, data):
+        if self._field:
+            self._buf.append(data)
+
+    def handle_comment(self, data):
+        match = _MARKER_RE.match(data)
+        if match:
+            self.markers[match.group(1).lower()] = self._offset()
+
+    # --- внутреннее ---
+    def _open_field(self, field, tag):
+        self._field = field
+        self._field_tag = tag
+        self._field_depth = 1
+        self._buf = []
+
+    def _close_field(self):
+        field = self._field
+        raw = "".join(self._buf)
+        if field == 'prompt_body':
+            value = raw.strip()
+        else:
+            value = _SPACES_RE.sub(' ', raw).strip()
+        setattr(self._card, field, value)
+        self._seen.add(field)
+        self._field = None
+        self._field_tag = None
+        self._buf = []
+
+    def _finish_card(self, card):
+        if card.section != 'apk':
+            card.platform = ""
+        if card.name:
+            self.cards.append(card)
+        self._card = None
+        self._prompt_div_depth = 0
+
+
+def parse_site(html_content, chunk_size=None, section=""):
+    parser = CardParser(section)
+    if chunk_size:
+        for i in range(0, len(html_content), chunk_size):
+            parser.feed(html_content[i:i + chunk_size])
+    else:
+        parser.feed(html_content)
+    parser.close()
+    return ParsedSite(parser.cards, parser.markers)
+
+
+def parse_cards(html_content):
+    return parse_site(html_content).cards
@@ -0,0 +1,48 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def hedged_cascade(models, attempt, hedge_delay=None, begin=None):
+    """
+    Запускает attempt(model) для первой модели; если за hedge_delay секунд валидного ответа нет,
+    параллельно стартует следующую и т.д. Упавшая попытка сразу уступает место следующей модели.
+    Возвращает (model, result) первого ответа, отличного от None, остальные попытки отменяются.
+    hedge_delay=None — обычный последовательный каскад.
+    begin(model) вызывается прямо перед стартом попытки; False — модель пропускается (например, ее пробу уже заняли).
+    """
+    queue = iter(models)
+    running = {}
+
+    def launch():
+        model = next(queue, None)
+        while model is not None and begin is not None and not begin(model):
+            model = next(queue, None)
+        if model is None:
+            return False
+        running[asyncio.ensure_future(attempt(model))] = model
+        return True
+
+    launch()
+    try:
+        while running:
+            done, _ = await asyncio.wait(running, timeout=hedge_delay, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                if launch():
+                    logger.info(f"⏱ Hedging: no answer in {hedge_delay}s, starting next model in parallel")
+                continue
+            for task in done:
+                model = running.pop(task)
+                try:
+                    result = task.result()
+                except Exception as e:
+                    logger.warning(f"Attempt with {model} failed: {e}")
+                    result = None
+                if result is not None:
+                    return model, result
+                launch()
+        return None, None
+    finally:
+        for task in running:
+            task.cancel()
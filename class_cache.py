@@ -0,0 +1,119 @@
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+from dedup import canonical_url
+
+logger = logging.getLogger(__name__)
+
+_URL_RE = re.compile(r'(https?://[^\s<>")\]]+|www\.[^\s<>")\]]+)')
+_NOISE_RE = re.compile(r'[^\w]+', re.UNICODE)
+
+# Для этих разделов ссылка не определяет содержимое (разные промпты с одной ссылкой на ChatGPT)
+URL_KEY_EXCLUDED_SECTIONS = ('prompts', 'chat', 'ideas')
+
+
+def text_fingerprint(text):
+    """
+    Хэш нормализованного текста: регистр, пунктуация, эмодзи и трекинг в ссылках не влияют.
+    """
+    text = _URL_RE.sub(lambda m: f" {canonical_url(m.group(0))} ", str(text))
+    text = _NOISE_RE.sub(' ', text.casefold()).strip()
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class ClassificationCache:
+    """
+    Дисковый кэш результатов классификации (SQLite). Ключи — каноничная ссылка и хэш текста.
+    Вытеснение: по TTL и по размеру (самые давно использованные записи).
+    """
+
+    def __init__(self, path, max_entries=5000, ttl=30 * 86400):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, data TEXT NOT NULL, created REAL NOT NULL, used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_used ON entries(used)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._db.commit()
+
+    @staticmethod
+    def keys_for(text, url=None):
+        keys = [f"text:{text_fingerprint(text)}"]
+        url_key = canonical_url(url) if url else ""
+        if url_key:
+            keys.append(f"url:{url_key}")
+        return keys
+
+    def get(self, text, url=None):
+        now = time.time()
+        with self._lock:
+            for key in self.keys_for(text, url):
+                row = self._db.execute("SELECT data, created FROM entries WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    continue
+                if now - row[1] > self.ttl:
+                    self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    continue
+                self._db.execute("UPDATE entries SET used = ? WHERE key = ?", (now, key))
+                self._bump("hits")
+                self._db.commit()
+                self.hits += 1
+                return json.loads(row[0])
+            self._bump("misses")
+            self._db.commit()
+            self.misses += 1
+            return None
+
+    def put(self, text, url, data):
+        now = time.time()
+        url = url if str(data.get('section', '')).lower() not in URL_KEY_EXCLUDED_SECTIONS else None
+        payload = json.dumps(data, ensure_ascii=False)
+        with self._lock:
+            for key in self.keys_for(text, url):
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries (key, data, created, used) VALUES (?, ?, ?, ?)",
+                    (key, payload, now, now)
+                )
+            self._evict(now)
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            totals = dict(self._db.execute("SELECT name, value FROM counters").fetchall())
+            size = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {
+            "entries": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "total_hits": totals.get("hits", 0),
+            "total_misses": totals.get("misses", 0),
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _bump(self, name):
+        self._db.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1) ON CONFLICT(name) DO UPDATE SET value = value + 1",
+            (name,)
+        )
+
+    def _evict(self, now):
+        self._db.execute("DELETE FROM entries WHERE created < ?", (now - self.ttl,))
+        overflow = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            self._db.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY used LIMIT ?)", (overflow,)
+            )
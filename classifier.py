@@ -0,0 +1,140 @@
+import re
+import zlib
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from search import tokenize
+
+_URL_RE = re.compile(r'(?:https?://|www\.)[^\s<>")\]]+')
+_PROMPT_CHARS = 2000     # длинные промпты не должны перевешивать все остальные признаки
+
+
+def _host(url):
+    host = urlsplit(url if "://" in url else f"http://{url}").netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def features(text, url=""):
+    """
+    Признаки текста: стеммированные слова, пары соседних слов и домены ссылок.
+    """
+    tokens = tokenize(text)
+    feats = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    urls = _URL_RE.findall(str(text))
+    if url and url not in ("#", "MISSING", "none"):
+        urls.append(url)
+    for link in urls:
+        host = _host(link)
+        if host:
+            feats.append(f"host:{host}")
+    return feats
+
+
+def card_text(card):
+    return f"{card.name}\n{card.desc}\n{(card.prompt_body or '')[:_PROMPT_CHARS]}"
+
+
+class SectionClassifier:
+    """
+    Мультиномиальный наивный Байес по хэшированным признакам, обучается на карточках сайта.
+    Дообучение — прибавить счетчики одной карточки (add), без прохода по всей базе;
+    оценка — одно матричное умножение по ненулевым признакам текста.
+    Уверенность — softmax по логарифмам правдоподобия, деленным на sqrt(числа признаков):
+    без этого у длинного поста любая разница превращается в 99.9%.
+    """
+
+    def __init__(self, sections, n_features=1 << 16, alpha=0.3):
+        self.sections = tuple(sections)
+        self.n_features = n_features
+        self.alpha = alpha
+        self.class_docs = np.zeros(len(self.sections), dtype=np.float64)
+        self.counts = np.zeros((len(self.sections), n_features), dtype=np.float32)
+        self._fitted = None
+
+    @classmethod
+    def from_cards(cls, cards, sections):
+        model = cls(sections)
+        for card in cards:
+            model.add(card)
+        return model
+
+    def __len__(self):
+        return int(self.class_docs.sum())
+
+    def _vector(self, feats):
+        idx = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in feats), dtype=np.int64, count=len(feats))
+        return np.unique(idx % self.n_features, return_counts=True)
+
+    def add(self, card):
+        if card.section not in self.sections:
+            return
+        self.learn(card_text(card), card.section, card.url)
+
+    def learn(self, text, section, url=""):
+        row = self.sections.index(section)
+        idx, cnt = self._vector(features(text, url))
+        self.counts[row, idx] += cnt
+        self.class_docs[row] += 1
+        self._fitted = None
+
+    def _fit(self):
+        smoothed = self.counts + self.alpha
+        log_prob = np.log(smoothed) - np.log(smoothed.sum(axis=1, keepdims=True))
+        # Пустые разделы получают почти нулевой приоритет, а не -inf
+        log_prior = np.log((self.class_docs + 0.1) / (self.class_docs.sum() + 0.1 * len(self.sections)))
+        self._fitted = (log_prob, log_prior)
+        return self._fitted
+
+    def predict_proba(self, text):
+        """
+        Вероятности разделов (в порядке self.sections) или None, если модели не на чем судить.
+        """
+        feats = features(text)
+        if not feats or not len(self):
+            return None
+        # Кортеж берется целиком: add() из потока коммита может сбросить его в любой момент
+        log_prob, log_prior = self._fitted or self._fit()
+        idx, cnt = self._vector(feats)
+        scores = (log_prob[:, idx] @ cnt) / np.sqrt(cnt.sum()) + log_prior
+        scores = np.exp(scores - scores.max())
+        return scores / scores.sum()
+
+    def predict(self, text):
+        """
+        (раздел, уверенность 0-100, второй по вероятности раздел) или None.
+        """
+        proba = self.predict_proba(text)
+        if proba is None:
+            return None
+        first, second = np.argsort(proba)[::-1][:2]
+        return self.sections[first], int(round(proba[first] * 100)), self.sections[second]
+
+
+def evaluate(cards, sections, threshold=80, folds=5):
+    """
+    Перекрестная проверка на карточках (их разделы когда-то выбрал LLM):
+    общая точность, доля постов, где локальной уверенности хватает, и точность на этой доле.
+    """
+    total = correct = confident = confident_correct = 0
+    for fold in range(folds):
+        train = [card for i, card in enumerate(cards) if i % folds != fold]
+        test = [card for i, card in enumerate(cards) if i % folds == fold]
+        model = SectionClassifier.from_cards(train, sections)
+        for card in test:
+            prediction = model.predict(card_text(card) + f"\n{card.url}")
+            if prediction is None:
+                continue
+            section, confidence, _ = prediction
+            total += 1
+            correct += section == card.section
+            if confidence >= threshold:
+                confident += 1
+                confident_correct += section == card.section
+    return {
+        "cards": total,
+        "accuracy": round(correct / total, 3) if total else None,
+        "threshold": threshold,
+        "llm_calls_avoided": round(confident / total, 3) if total else None,
+        "accuracy_when_confident": round(confident_correct / confident, 3) if confident else None,
+    }
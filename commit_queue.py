@@ -0,0 +1,60 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CommitQueue:
+    """
+    Копит карточки в течение короткого окна (или до max_batch штук) и отдает их
+    одной пачкой в commit_fn, который выполняется в отдельном потоке.
+    commit_fn([(data, force), ...]) -> ["OK" | "DUPLICATE" | ..., ...] в том же порядке.
+    """
+
+    def __init__(self, commit_fn, window=1.5, max_batch=20):
+        self.commit_fn = commit_fn
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = []
+        self._full = asyncio.Event()
+        self._worker = None
+
+    async def submit(self, data, force=False):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((data, force, future))
+        if len(self._pending) >= self.max_batch:
+            self._full.set()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        # shield: если хендлер отменят, карточка все равно будет закоммичена
+        return await asyncio.shield(future)
+
+    async def flush(self):
+        """
+        Дожидается записи всего, что уже стоит в очереди (например, перед остановкой).
+        """
+        self._full.set()
+        while self._worker is not None and not self._worker.done():
+            await asyncio.shield(self._worker)
+
+    async def _run(self):
+        while self._pending:
+            if len(self._pending) < self.max_batch:
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self.window)
+                except asyncio.TimeoutError:
+                    pass
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            if len(self._pending) < self.max_batch:
+                self._full.clear()
+
+            try:
+                results = await asyncio.to_thread(self.commit_fn, [(data, force) for data, force, _ in batch])
+            except Exception as e:
+                logger.error(f"Commit batch failed: {e}")
+                results = ["GIT_ERROR"] * len(batch)
+
+            for (_, _, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
@@ -0,0 +1,126 @@
+import re
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+# Параметры, которые не меняют ресурс, а только помечают источник перехода
+TRACKING_PARAMS = frozenset({
+    'fbclid', 'gclid', 'dclid', 'gbraid', 'wbraid', 'yclid', 'ysclid', 'msclkid', 'mc_cid', 'mc_eid',
+    'igshid', 'igsh', '_ga', '_gl',
+})
+TRACKING_PREFIXES = ('utm_', 'pk_', 'mtm_', 'hsa_')
+# Обычно тоже метки, но на части сайтов это настоящие параметры (?ref=<ветка> у репозиториев и CI):
+# снимаются только в ключе дедупликации, в сохраняемой ссылке остаются
+GENERIC_TRACKING_PARAMS = frozenset({'si', 'ref', 'ref_src', 'ref_url', 'referrer', 'feature', 'spm', 'trk'})
+
+# Домены-синонимы, ведущие на тот же ресурс (мобильные m./www. снимаются отдельно)
+HOST_ALIASES = {
+    'youtu.be': 'youtube.com',
+    'twitter.com': 'x.com',
+    'telegram.me': 't.me', 'telegram.dog': 't.me',
+    'old.reddit.com': 'reddit.com', 'np.reddit.com': 'reddit.com',
+}
+_MOBILE_LABELS = ('www', 'm', 'mobile')
+# Метки, специфичные для отдельных сайтов (у x.com ?s=20&t=... — это просто "поделиться")
+HOST_TRACKING_PARAMS = {
+    'x.com': {'s', 't'},
+    'youtube.com': {'pp', 'ab_channel'},
+    'instagram.com': {'hl'},
+}
+_EMPTY_URLS = ("", "#", "MISSING", "none", "None")
+
+_TITLE_STRIP_RE = re.compile(r'[^\w]+', re.UNICODE)
+
+
+def is_tracking_param(key):
+    key = key.lower()
+    return key in TRACKING_PARAMS or key.startswith(TRACKING_PREFIXES)
+
+
+def canonical_url(url):
+    """
+    Ключ для сравнения ссылок: без схемы, www./m., трекинг-параметров, фрагмента и слеша в конце.
+    Это не валидная ссылка для перехода, а именно ключ дедупликации.
+    """
+    url = str(url or "").strip()
+    if url in _EMPTY_URLS:
+        return ""
+    if '://' not in url:
+        url = 'http://' + url
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url.lower()
+
+    host = (parts.hostname or "").lower().rstrip('.')
+    labels = host.split('.')
+    if len(labels) > 2:
+        # www.example.com, m.example.com, en.m.wikipedia.org -> без мобильной метки
+        keep = [label for i, label in enumerate(labels[:-2]) if label not in _MOBILE_LABELS]
+        host = '.'.join(keep + labels[-2:])
+    host = HOST_ALIASES.get(host, host)
+    if parts.port and parts.port not in (80, 443):
+        host = f"{host}:{parts.port}"
+
+    path = re.sub(r'/{2,}', '/', parts.path or "").rstrip('/')
+    host_params = HOST_TRACKING_PARAMS.get(host, ())
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not is_tracking_param(k) and k.lower() not in GENERIC_TRACKING_PARAMS and k not in host_params
+    ]
+
+    if host == 't.me':
+        # t.me/s/channel/123 — веб-превью того же поста
+        if path.startswith('/s/'):
+            path = path[2:]
+        query = [(k, v) for k, v in query if k not in ('single', 'comment', 'thread')]
+        path = path.lower()
+    elif host == 'youtube.com' and parts.hostname and parts.hostname.lower().endswith('youtu.be'):
+        query = [('v', path.lstrip('/'))] + query
+        path = '/watch'
+    elif host in ('github.com', 'x.com'):
+        # Логины и имена репозиториев регистронезависимы
+        path = path.lower()
+
+    query.sort()
+    return urlunsplit(('', host, path, urlencode(query, doseq=True), '')).lstrip('/')
+
+
+def normalize_title(name):
+    """
+    Ключ для сравнения названий: регистр, ё/е, пунктуация и повторные пробелы не учитываются.
+    """
+    text = str(name or "").casefold().replace('ё', 'е')
+    return _TITLE_STRIP_RE.sub(' ', text).strip()
+
+
+class DedupIndex:
+    """
+    Хэш-индекс карточек по каноничной ссылке и нормализованному названию: проверка дубля за O(1).
+    """
+
+    def __init__(self):
+        self.by_url = {}
+        self.by_title = {}
+
+    @classmethod
+    def from_cards(cls, cards):
+        index = cls()
+        for card in cards:
+            index.add(card)
+        return index
+
+    def add(self, card):
+        url_key = canonical_url(card.url)
+        if url_key:
+            self.by_url.setdefault(url_key, card)
+        title_key = normalize_title(card.name)
+        if title_key:
+            self.by_title.setdefault(title_key, card)
+
+    def find(self, url, name):
+        url_key = canonical_url(url)
+        if url_key and url_key in self.by_url:
+            return self.by_url[url_key]
+        title_key = normalize_title(name)
+        if title_key:
+            return self.by_title.get(title_key)
+        return None
@@ -1,9 +1,243 @@
-
-document.addEventListener('DOMContentLoaded', () => {
-    const ALL_SECTIONS = ['ai', 'prompts', 'study', 'prog', 'dev', 'apk', 'sys', 'osint', 'ideas', 'fun', 'shop'];
+// Логика фильтров без DOM: фасеты по тексту карточки и поиск по search-index.json, который бот
+// публикует рядом с index.html. Правила фасетов продублированы в site_index.py — менять вместе.
+// В Node (бенчмарки) файл только экспортирует FilterEngine и не трогает document.
+const FilterEngine = (() => {
     const MAX_FACETS_PER_SECTION = 3;
     const MAX_OPTIONS_PER_FACET = 6;
 
+    const FACET_META = {
+        format: { label: 'Формат', icon: 'fa-layer-group', tooltip: 'Тип и формат ресурса' },
+        focus: { label: 'Направление', icon: 'fa-compass', tooltip: 'Сфера применения и задача' },
+        platform: { label: 'Платформа', icon: 'fa-mobile-screen-button', tooltip: 'ОС или среда использования' },
+        source: { label: 'Источник', icon: 'fa-globe', tooltip: 'Где размещен ресурс' },
+        model: { label: 'Модель', icon: 'fa-brain', tooltip: 'Модель или семейство ИИ' }
+    };
+
+    const FACET_DEFINITIONS = [
+        { key: 'format', detector: detectFormat },
+        { key: 'focus', detector: detectFocus },
+        { key: 'platform', detector: detectPlatform },
+        { key: 'source', detector: detectSource },
+        { key: 'model', detector: detectModel }
+    ];
+
+    function describeCard(title, desc, xmp, link, badge) {
+        const fullText = `${title} ${desc} ${xmp}`.toLowerCase();
+        const facets = {};
+        FACET_DEFINITIONS.forEach(def => {
+            const values = def.detector(fullText, link, badge);
+            facets[def.key] = Array.isArray(values) ? values : (values ? [values] : []);
+        });
+        return { fullText, facets };
+    }
+
+    function facetOptions(resources) {
+        const facetStats = FACET_DEFINITIONS.map(def => {
+            const counts = new Map();
+            let tagged = 0;
+            resources.forEach(res => {
+                const values = res.facets[def.key];
+                if (!values || values.length === 0) return;
+                tagged += 1;
+                values.forEach(val => {
+                    counts.set(val, (counts.get(val) || 0) + 1);
+                });
+            });
+            const distinct = counts.size;
+            return { def, counts, distinct, tagged };
+        });
+
+        return facetStats
+            .filter(f => f.distinct >= 2)
+            .sort((a, b) => {
+                if (b.distinct !== a.distinct) return b.distinct - a.distinct;
+                return b.tagged - a.tagged;
+            })
+            .slice(0, MAX_FACETS_PER_SECTION)
+            .map(f => {
+                const options = Array.from(f.counts.entries())
+                    .sort((a, b) => b[1] - a[1])
+                    .slice(0, MAX_OPTIONS_PER_FACET)
+                    .map(([val]) => val);
+                const meta = FACET_META[f.def.key] || { label: f.def.key, icon: 'fa-filter', tooltip: '' };
+                return { key: f.def.key, label: meta.label, icon: meta.icon, tooltip: meta.tooltip, options };
+            });
+    }
+
+    // Те же слова, что в site_index.py: строчные, ё -> е, латиница/кириллица/цифры
+    function tokenize(text) {
+        return text.toLowerCase().replace(/ё/g, 'е').match(/[a-zа-я0-9]+/g) || [];
+    }
+
+    // Поиск без индекса с тем же смыслом, что SearchIndex.match: каждое слово запроса — часть какого-то слова карточки
+    function matchWords(words, tokens) {
+        return tokens.every(token => words.some(word => word.includes(token)));
+    }
+
+    class SearchIndex {
+        constructor(data) {
+            this.facets = data.facets;
+            this.values = data.values;
+            this.cards = data.cards;
+            this.sections = data.sections;
+            this.terms = data.terms;
+            this.postings = data.postings;
+            this.termCache = new Map();
+        }
+
+        // Ресурсы раздела из индекса. null, если карточки на странице не совпадают с индексом
+        // (файл устарел или страницу правили руками) — тогда раздел читается из DOM.
+        resources(sectionId, elements) {
+            const ids = this.sections[sectionId] || [];
+            if (ids.length !== elements.length) return null;
+            const resources = [];
+            for (let i = 0; i < ids.length; i++) {
+                const [name, facetIds] = this.cards[ids[i]];
+                const title = (elements[i].querySelector('h3')?.textContent || '').replace(/\s+/g, ' ').trim();
+                if (title !== name) return null;
+                const facets = {};
+                this.facets.forEach((key, f) => {
+                    facets[key] = facetIds[f].map(v => this.values[v]);
+                });
+                resources.push({ element: elements[i], id: ids[i], visible: true, facets });
+            }
+            return resources;
+        }
+
+        // Маска по id карточек: 1 — в тексте карточки есть слова, содержащие каждое слово запроса.
+        // null — пустой запрос, подходит все.
+        match(query) {
+            const tokens = tokenize(query);
+            if (tokens.length === 0) return null;
+            let mask = null;
+            tokens.forEach(token => {
+                const hits = new Uint8Array(this.cards.length);
+                this.matchingTerms(token).forEach(t => {
+                    const posting = this.postings[t];
+                    for (let i = 0; i < posting.length; i++) hits[posting[i]] = 1;
+                });
+                if (mask) {
+                    for (let i = 0; i < mask.length; i++) mask[i] &= hits[i];
+                } else {
+                    mask = hits;
+                }
+            });
+            return mask;
+        }
+
+        // Номера слов словаря, содержащих token. Пока пользователь печатает, запрос только растет,
+        // поэтому ищем среди слов, подошедших к его началу, а не по всему словарю.
+        matchingTerms(token) {
+            const cached = this.termCache.get(token);
+            if (cached) return cached;
+            let pool = null;
+            for (let len = token.length - 1; len > 0 && !pool; len--) {
+                pool = this.termCache.get(token.slice(0, len)) || null;
+            }
+            const found = [];
+            if (pool) {
+                pool.forEach(t => {
+                    if (this.terms[t].includes(token)) found.push(t);
+                });
+            } else {
+                for (let t = 0; t < this.terms.length; t++) {
+                    if (this.terms[t].includes(token)) found.push(t);
+                }
+            }
+            if (this.termCache.size > 500) this.termCache.clear();
+            this.termCache.set(token, found);
+            return found;
+        }
+    }
+
+    function detectFormat(text, link, badge) {
+        const tags = [];
+        if (text.includes('prompt') || text.includes('промпт') || text.includes('prompting')) tags.push('Промпты');
+        if (text.includes('course') || text.includes('курс') || text.includes('обуч') || text.includes('tutorial')) tags.push('Курс');
+        if (text.includes('presentation') || text.includes('презентац') || text.includes('slides') || text.includes('ppt')) tags.push('Презентации');
+        if (text.includes('image') || text.includes('картин') || text.includes('photo') || text.includes('logo') || text.includes('upscale')) tags.push('Изображения');
+        if (text.includes('video') || text.includes('видео') || text.includes('movie') || text.includes('youtube')) tags.push('Видео');
+        if (text.includes('audio') || text.includes('музык') || text.includes('sound') || text.includes('voice') || text.includes('podcast')) tags.push('Аудио');
+        if (text.includes('pdf')) tags.push('PDF');
+        if (text.includes('extension') || text.includes('chrome') || text.includes('расширение')) tags.push('Расширение');
+        if (text.includes('bot') || text.includes('чат-бот') || text.includes('chatbot')) tags.push('Бот');
+        if (text.includes('app') || text.includes('apk') || text.includes('ios') || text.includes('android')) tags.push('Приложение');
+        if (link && link.includes('github.com')) tags.push('Репозиторий');
+        return unique(tags);
+    }
+
+    function detectFocus(text) {
+        const tags = [];
+        if (text.includes('osint') || text.includes('security') || text.includes('vpn') || text.includes('privacy') || text.includes('hack') || text.includes('взлом')) tags.push('Безопасность');
+        if (text.includes('design') || text.includes('ui') || text.includes('ux') || text.includes('logo')) tags.push('Дизайн');
+        if (text.includes('code') || text.includes('dev') || text.includes('library') || text.includes('api') || text.includes('github')) tags.push('Разработка');
+        if (text.includes('study') || text.includes('learn') || text.includes('курс') || text.includes('обуч') || text.includes('tutorial')) tags.push('Обучение');
+        if (text.includes('research') || text.includes('paper') || text.includes('citation') || text.includes('конспект')) tags.push('Исследования');
+        if (text.includes('automation') || text.includes('productivity') || text.includes('plan') || text.includes('notes')) tags.push('Продуктивность');
+        if (text.includes('video') || text.includes('audio') || text.includes('image')) tags.push('Медиа');
+        return unique(tags);
+    }
+
+    function detectPlatform(text, link, badge) {
+        const tags = [];
+        const badgeText = (badge || '').toLowerCase();
+        if (badgeText.includes('android') || text.includes('android')) tags.push('Android');
+        if (badgeText.includes('ios') || text.includes('ios')) tags.push('iOS');
+        if (text.includes('windows')) tags.push('Windows');
+        if (text.includes('linux')) tags.push('Linux');
+        if (text.includes('mac') || text.includes('macos')) tags.push('macOS');
+        if (link && link.includes('chromewebstore.google.com')) tags.push('Chrome');
+        if (tags.length === 0 && link && (link.startsWith('http://') || link.startsWith('https://'))) tags.push('Web');
+        return unique(tags);
+    }
+
+    function detectSource(text, link) {
+        if (!link || link === '#') return [];
+        const domain = extractDomain(link);
+        const tags = [];
+        if (domain.includes('github.com')) tags.push('GitHub');
+        if (domain.includes('t.me') || domain.includes('telegram.me')) tags.push('Telegram');
+        if (domain.includes('chromewebstore.google.com')) tags.push('Chrome Store');
+        if (domain.includes('huggingface.co')) tags.push('HuggingFace');
+        if (domain.includes('openai.com')) tags.push('OpenAI');
+        if (domain.includes('google')) tags.push('Google');
+        if (domain.includes('app') || domain.includes('cloud') || domain.includes('ai')) tags.push('Web App');
+        if (tags.length === 0) tags.push('Веб');
+        return unique(tags);
+    }
+
+    function detectModel(text) {
+        const tags = [];
+        if (text.includes('gpt') || text.includes('openai')) tags.push('GPT');
+        if (text.includes('claude')) tags.push('Claude');
+        if (text.includes('gemini')) tags.push('Gemini');
+        if (text.includes('llama')) tags.push('Llama');
+        if (text.includes('qwen')) tags.push('Qwen');
+        if (text.includes('mistral')) tags.push('Mistral');
+        return unique(tags);
+    }
+
+    function extractDomain(url) {
+        try {
+            const clean = url.replace(/^https?:\/\//, '').split('/')[0].toLowerCase();
+            return clean;
+        } catch {
+            return '';
+        }
+    }
+
+    function unique(arr) {
+        return Array.from(new Set(arr));
+    }
+
+    return { describeCard, facetOptions, tokenize, matchWords, SearchIndex };
+})();
+
+if (typeof module !== 'undefined' && module.exports) module.exports = FilterEngine;
+
+if (typeof document !== 'undefined') document.addEventListener('DOMContentLoaded', () => {
+    const ALL_SECTIONS = ['ai', 'prompts', 'study', 'prog', 'dev', 'apk', 'sys', 'osint', 'ideas', 'fun', 'shop'];
+
     const style = document.createElement('style');
     style.innerHTML = `
         .section-filter-bar {
@@ -177,28 +411,13 @@ document.addEventListener('DOMContentLoaded', () => {
     `;
     document.head.appendChild(style);
 
-    const FACET_META = {
-        format: { label: 'Формат', icon: 'fa-layer-group', tooltip: 'Тип и формат ресурса' },
-        focus: { label: 'Направление', icon: 'fa-compass', tooltip: 'Сфера применения и задача' },
-        platform: { label: 'Платформа', icon: 'fa-mobile-screen-button', tooltip: 'ОС или среда использования' },
-        source: { label: 'Источник', icon: 'fa-globe', tooltip: 'Где размещен ресурс' },
-        model: { label: 'Модель', icon: 'fa-brain', tooltip: 'Модель или семейство ИИ' }
-    };
-
-    const FACET_DEFINITIONS = [
-        { key: 'format', detector: detectFormat },
-        { key: 'focus', detector: detectFocus },
-        { key: 'platform', detector: detectPlatform },
-        { key: 'source', detector: detectSource },
-        { key: 'model', detector: detectModel }
-    ];
-
     class AdvancedSectionFilter {
-        constructor(sectionId) {
+        constructor(sectionId, index = null) {
             this.sectionId = sectionId;
             this.sectionElement = document.getElementById(sectionId);
             if (!this.sectionElement) return;
 
+            this.index = index;
             this.resources = [];
             this.activeFilters = {};
             this.searchTerm = '';
@@ -225,57 +444,26 @@ document.addEventListener('DOMContentLoaded', () => {
 
         extractResources() {
             const cards = this.sectionElement.querySelectorAll('.glass-card');
+            const fromIndex = this.index?.resources(this.sectionId, cards);
+            if (fromIndex) {
+                this.resources = fromIndex;
+                return;
+            }
+            // Индекса нет или он разошелся со страницей — читаем карточки из DOM, поиск по тексту
+            this.index = null;
             this.resources = Array.from(cards).map(card => {
                 const title = (card.querySelector('h3')?.innerText || '').trim();
                 const desc = (card.querySelector('p')?.innerText || '').trim();
                 const xmp = (card.querySelector('xmp')?.innerText || '').trim();
                 const link = card.querySelector('a')?.getAttribute('href') || '';
                 const badge = (card.querySelector('span')?.innerText || '').trim();
-                const fullText = `${title} ${desc} ${xmp}`.toLowerCase();
-
-                const facets = {};
-                FACET_DEFINITIONS.forEach(def => {
-                    const values = def.detector(fullText, link, badge);
-                    facets[def.key] = Array.isArray(values) ? values : (values ? [values] : []);
-                });
-
-                return { element: card, fullText, facets };
+                const described = FilterEngine.describeCard(title, desc, xmp, link, badge);
+                return { element: card, visible: true, words: [...new Set(FilterEngine.tokenize(described.fullText))], ...described };
             });
         }
 
         analyzeFacets() {
-            const facetStats = FACET_DEFINITIONS.map(def => {
-                const counts = new Map();
-                let tagged = 0;
-                this.resources.forEach(res => {
-                    const values = res.facets[def.key];
-                    if (!values || values.length === 0) return;
-                    tagged += 1;
-                    values.forEach(val => {
-                        counts.set(val, (counts.get(val) || 0) + 1);
-                    });
-                });
-                const distinct = counts.size;
-                return { def, counts, distinct, tagged };
-            });
-
-            const usable = facetStats
-                .filter(f => f.distinct >= 2)
-                .sort((a, b) => {
-                    if (b.distinct !== a.distinct) return b.distinct - a.distinct;
-                    return b.tagged - a.tagged;
-                })
-                .slice(0, MAX_FACETS_PER_SECTION)
-                .map(f => {
-                    const options = Array.from(f.counts.entries())
-                        .sort((a, b) => b[1] - a[1])
-                        .slice(0, MAX_OPTIONS_PER_FACET)
-                        .map(([val]) => val);
-                    const meta = FACET_META[f.def.key] || { label: f.def.key, icon: 'fa-filter', tooltip: '' };
-                    return { key: f.def.key, label: meta.label, icon: meta.icon, tooltip: meta.tooltip, options };
-                });
-
-            return usable;
+            return FilterEngine.facetOptions(this.resources);
         }
 
         createUI(availableFacets) {
@@ -411,8 +599,14 @@ document.addEventListener('DOMContentLoaded', () => {
 
         applyFilters() {
             let visibleCount = 0;
+            // С индексом поиск — по словарю индекса (маска по id карточек), без индекса — по словам карточки;
+            // смысл один: каждое слово запроса должно быть частью какого-то слова карточки
+            const mask = this.index ? this.index.match(this.searchTerm) : null;
+            const tokens = this.index ? null : FilterEngine.tokenize(this.searchTerm);
             this.resources.forEach(res => {
-                const matchesSearch = this.searchTerm === '' || res.fullText.includes(this.searchTerm);
+                const matchesSearch = this.index
+                    ? !mask || mask[res.id] === 1
+                    : FilterEngine.matchWords(res.words, tokens);
                 let matchesFacets = true;
                 for (const [facet, activeValue] of Object.entries(this.activeFilters)) {
                     const values = res.facets[facet] || [];
@@ -421,10 +615,14 @@ document.addEventListener('DOMContentLoaded', () => {
                         break;
                     }
                 }
-                if (matchesSearch && matchesFacets) {
+                const visible = matchesSearch && matchesFacets;
+                if (visible) visibleCount += 1;
+                // DOM трогаем только у карточек, чья видимость поменялась
+                if (visible === res.visible) return;
+                res.visible = visible;
+                if (visible) {
                     res.element.style.display = 'block';
                     requestAnimationFrame(() => res.element.classList.add('active'));
-                    visibleCount += 1;
                 } else {
                     res.element.style.display = 'none';
                     res.element.classList.remove('active');
@@ -443,6 +641,7 @@ document.addEventListener('DOMContentLoaded', () => {
             this.resources.forEach(res => {
                 const values = res.facets[groupKey] || [];
                 const label = values.length > 0 ? values[0] : 'Другое';
+                res.group = label;
                 if (!groups.has(label)) {
                     const groupEl = document.createElement('div');
                     groupEl.className = 'section-group';
@@ -465,10 +664,13 @@ document.addEventListener('DOMContentLoaded', () => {
 
         updateGroupVisibility() {
             if (!this.groupMap || this.groupMap.size === 0) return;
-            this.groupMap.forEach(groupEl => {
-                const cards = groupEl.querySelectorAll('.glass-card');
-                const anyVisible = Array.from(cards).some(card => card.style.display !== 'none');
-                groupEl.style.display = anyVisible ? 'block' : 'none';
+            const visibleGroups = new Set();
+            this.resources.forEach(res => {
+                if (res.visible) visibleGroups.add(res.group);
+            });
+            this.groupMap.forEach((groupEl, label) => {
+                const display = visibleGroups.has(label) ? 'block' : 'none';
+                if (groupEl.style.display !== display) groupEl.style.display = display;
             });
         }
 
@@ -504,85 +706,73 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
-    function detectFormat(text, link, badge) {
-        const tags = [];
-        if (text.includes('prompt') || text.includes('промпт') || text.includes('prompting')) tags.push('Промпты');
-        if (text.includes('course') || text.includes('курс') || text.includes('обуч') || text.includes('tutorial')) tags.push('Курс');
-        if (text.includes('presentation') || text.includes('презентац') || text.includes('slides') || text.includes('ppt')) tags.push('Презентации');
-        if (text.includes('image') || text.includes('картин') || text.includes('photo') || text.includes('logo') || text.includes('upscale')) tags.push('Изображения');
-        if (text.includes('video') || text.includes('видео') || text.includes('movie') || text.includes('youtube')) tags.push('Видео');
-        if (text.includes('audio') || text.includes('музык') || text.includes('sound') || text.includes('voice') || text.includes('podcast')) tags.push('Аудио');
-        if (text.includes('pdf')) tags.push('PDF');
-        if (text.includes('extension') || text.includes('chrome') || text.includes('расширение')) tags.push('Расширение');
-        if (text.includes('bot') || text.includes('чат-бот') || text.includes('chatbot')) tags.push('Бот');
-        if (text.includes('app') || text.includes('apk') || text.includes('ios') || text.includes('android')) tags.push('Приложение');
-        if (link && link.includes('github.com')) tags.push('Репозиторий');
-        return unique(tags);
-    }
-
-    function detectFocus(text) {
-        const tags = [];
-        if (text.includes('osint') || text.includes('security') || text.includes('vpn') || text.includes('privacy') || text.includes('hack') || text.includes('взлом')) tags.push('Безопасность');
-        if (text.includes('design') || text.includes('ui') || text.includes('ux') || text.includes('logo')) tags.push('Дизайн');
-        if (text.includes('code') || text.includes('dev') || text.includes('library') || text.includes('api') || text.includes('github')) tags.push('Разработка');
-        if (text.includes('study') || text.includes('learn') || text.includes('курс') || text.includes('обуч') || text.includes('tutorial')) tags.push('Обучение');
-        if (text.includes('research') || text.includes('paper') || text.includes('citation') || text.includes('конспект')) tags.push('Исследования');
-        if (text.includes('automation') || text.includes('productivity') || text.includes('plan') || text.includes('notes')) tags.push('Продуктивность');
-        if (text.includes('video') || text.includes('audio') || text.includes('image')) tags.push('Медиа');
-        return unique(tags);
-    }
-
-    function detectPlatform(text, link, badge) {
-        const tags = [];
-        const badgeText = (badge || '').toLowerCase();
-        if (badgeText.includes('android') || text.includes('android')) tags.push('Android');
-        if (badgeText.includes('ios') || text.includes('ios')) tags.push('iOS');
-        if (text.includes('windows')) tags.push('Windows');
-        if (text.includes('linux')) tags.push('Linux');
-        if (text.includes('mac') || text.includes('macos')) tags.push('macOS');
-        if (link && link.includes('chromewebstore.google.com')) tags.push('Chrome');
-        if (tags.length === 0 && link && (link.startsWith('http://') || link.startsWith('https://'))) tags.push('Web');
-        return unique(tags);
-    }
-
-    function detectSource(text, link) {
-        if (!link || link === '#') return [];
-        const domain = extractDomain(link);
-        const tags = [];
-        if (domain.includes('github.com')) tags.push('GitHub');
-        if (domain.includes('t.me') || domain.includes('telegram.me')) tags.push('Telegram');
-        if (domain.includes('chromewebstore.google.com')) tags.push('Chrome Store');
-        if (domain.includes('huggingface.co')) tags.push('HuggingFace');
-        if (domain.includes('openai.com')) tags.push('OpenAI');
-        if (domain.includes('google')) tags.push('Google');
-        if (domain.includes('app') || domain.includes('cloud') || domain.includes('ai')) tags.push('Web App');
-        if (tags.length === 0) tags.push('Веб');
-        return unique(tags);
+    // Индекс фильтров и поиска (search-index.json) бот обновляет в каждом коммите с карточками.
+    // Не загрузился (старый сайт, file://) — разделы читаются из DOM, как раньше.
+    const indexPromise = fetch('search-index.json', { cache: 'no-cache' })
+        .then(resp => (resp.ok ? resp.json() : null))
+        .then(data => (data && data.format === 1 ? new FilterEngine.SearchIndex(data) : null))
+        .catch(() => null);
+
+    // Шардированная раскладка: карточки раздела лежат в sections/<id>.html и подгружаются,
+    // когда раздел подходит к экрану. В монолитном index.html data-shard нет — фильтры строятся сразу.
+    function loadShard(grid) {
+        if (!grid.shardPromise) {
+            grid.shardPromise = fetch(grid.dataset.shard)
+                .then(resp => {
+                    if (!resp.ok) throw new Error(`HTTP ${resp.status}`);
+                    return resp.text();
+                })
+                .then(fragment => {
+                    grid.insertAdjacentHTML('afterbegin', fragment);
+                    grid.removeAttribute('data-shard');
+                })
+                .catch(err => {
+                    grid.shardPromise = null;
+                    console.warn(`Не удалось загрузить ${grid.dataset.shard}:`, err);
+                    throw err;
+                });
+        }
+        return grid.shardPromise;
     }
 
-    function detectModel(text) {
-        const tags = [];
-        if (text.includes('gpt') || text.includes('openai')) tags.push('GPT');
-        if (text.includes('claude')) tags.push('Claude');
-        if (text.includes('gemini')) tags.push('Gemini');
-        if (text.includes('llama')) tags.push('Llama');
-        if (text.includes('qwen')) tags.push('Qwen');
-        if (text.includes('mistral')) tags.push('Mistral');
-        return unique(tags);
+    const shardObserver = 'IntersectionObserver' in window
+        ? new IntersectionObserver(entries => {
+            entries.forEach(entry => {
+                if (entry.isIntersecting) initSection(entry.target.id);
+            });
+        }, { rootMargin: '600px 0px' })
+        : null;
+
+    function initSection(id) {
+        const section = document.getElementById(id);
+        if (!section || section.dataset.filtersReady) return;
+        const grid = section.querySelector('[data-shard]');
+        if (!grid) {
+            section.dataset.filtersReady = '1';
+            shardObserver?.unobserve(section);
+            indexPromise.then(index => new AdvancedSectionFilter(id, index));
+            return;
+        }
+        Promise.all([loadShard(grid), indexPromise]).then(([, index]) => {
+            if (section.dataset.filtersReady) return;
+            section.dataset.filtersReady = '1';
+            shardObserver?.unobserve(section);
+            new AdvancedSectionFilter(id, index);
+            window.updateResourceCount?.();
+        }, () => {});
     }
 
-    function extractDomain(url) {
-        try {
-            const clean = url.replace(/^https?:\/\//, '').split('/')[0].toLowerCase();
-            return clean;
-        } catch {
-            return '';
+    ALL_SECTIONS.forEach(id => {
+        const section = document.getElementById(id);
+        if (shardObserver && section?.querySelector('[data-shard]')) {
+            shardObserver.observe(section);
+        } else {
+            initSection(id);
         }
-    }
-
-    function unique(arr) {
-        return Array.from(new Set(arr));
-    }
+    });
 
-    ALL_SECTIONS.forEach(id => new AdvancedSectionFilter(id));
+    // Переход по якорю в сайдбаре — грузим раздел сразу, не дожидаясь прокрутки
+    document.querySelectorAll('a[href^="#"]').forEach(anchor => {
+        anchor.addEventListener('click', () => initSection(anchor.getAttribute('href').slice(1)));
+    });
 });
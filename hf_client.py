@@ -0,0 +1,111 @@
+import json
+import asyncio
+import logging
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+HF_ROUTER_URL = "https://router.huggingface.co/v1"
+
+
+class InferenceError(Exception):
+    def __init__(self, status, message):
+        super().__init__(f"HTTP {status}: {message[:300]}")
+        self.status = status
+
+
+class AsyncInferenceClient:
+    """
+    Нативно асинхронный клиент OpenAI-совместимого chat completions (HF router).
+    Одна долгоживущая сессия с keep-alive пулом соединений на каждый endpoint,
+    общий лимит одновременных запросов. Отмена корутины рвет HTTP-запрос — потоков нет.
+    """
+
+    def __init__(self, token, base_url=HF_ROUTER_URL, endpoints=None, max_concurrency=8, keepalive=75.0):
+        self.token = token
+        self.base_url = base_url.rstrip('/')
+        self.endpoints = endpoints or {}     # model -> свой base_url (например, dedicated endpoint)
+        self.keepalive = keepalive
+        self.max_concurrency = max_concurrency
+        self._sessions = {}
+        self._semaphore = None
+
+    def _base_for(self, model):
+        return self.endpoints.get(model, self.base_url).rstrip('/')
+
+    def _session(self, base_url):
+        session = self._sessions.get(base_url)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.max_concurrency, keepalive_timeout=self.keepalive, enable_cleanup_closed=True
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                headers={"Authorization": f"Bearer {self.token}"} if self.token else None,
+            )
+            self._sessions[base_url] = session
+        return session
+
+    def _limiter(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def chat_completion(self, model, messages, max_tokens=1024, temperature=0.1, timeout=30.0, **extra):
+        """
+        Возвращает текст ответа модели. Ошибки HTTP — InferenceError, таймаут — asyncio.TimeoutError.
+        """
+        base_url = self._base_for(model)
+        payload = {"model": model, "messages": messages, "max_tokens": max_tokens, "temperature": temperature, **extra}
+        async with self._limiter():
+            session = self._session(base_url)
+            async with session.post(
+                f"{base_url}/chat/completions", json=payload, timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as resp:
+                if resp.status >= 400:
+                    raise InferenceError(resp.status, await resp.text())
+                data = await resp.json(content_type=None)
+        try:
+            return data["choices"][0]["message"]["content"] or ""
+        except (KeyError, IndexError, TypeError):
+            raise InferenceError(200, f"Unexpected response shape: {str(data)[:200]}")
+
+    async def stream_chat_completion(self, model, messages, max_tokens=1024, temperature=0.1, idle_timeout=20.0, **extra):
+        """
+        Асинхронный генератор кусочков ответа (SSE stream=true). idle_timeout — сколько ждать
+        следующего куска; общий дедлайн задает вызывающий код.
+        """
+        base_url = self._base_for(model)
+        payload = {
+            "model": model, "messages": messages, "max_tokens": max_tokens,
+            "temperature": temperature, "stream": True, **extra
+        }
+        async with self._limiter():
+            session = self._session(base_url)
+            async with session.post(
+                f"{base_url}/chat/completions", json=payload,
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=idle_timeout, sock_read=idle_timeout)
+            ) as resp:
+                if resp.status >= 400:
+                    raise InferenceError(resp.status, await resp.text())
+                async for raw_line in resp.content:
+                    line = raw_line.decode("utf-8", "replace").strip()
+                    if not line.startswith("data:"):
+                        continue
+                    chunk = line[5:].strip()
+                    if chunk == "[DONE]":
+                        return
+                    try:
+                        event = json.loads(chunk)
+                        delta = event["choices"][0].get("delta", {}).get("content")
+                    except (ValueError, KeyError, IndexError, AttributeError):
+                        continue
+                    if delta:
+                        yield delta
+
+    async def close(self):
+        for session in self._sessions.values():
+            if not session.closed:
+                await session.close()
+        self._sessions.clear()
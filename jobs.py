@@ -0,0 +1,307 @@
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, WAITING, DONE, FAILED, CANCELLED = "queued", "running", "waiting", "done", "failed", "cancelled"
+FINAL_STATES = (DONE, FAILED, CANCELLED)
+
+# Результат стадии: задача ждет ответа пользователя (кнопка, ссылка) и продолжится через resume()
+WAIT = object()
+
+
+class Job:
+    __slots__ = ("id", "kind", "stage", "state", "priority", "payload", "attempts", "chat_id", "user_id", "message_id")
+
+    def __init__(self, id, kind, stage, state, priority, payload, attempts, chat_id, user_id, message_id):
+        self.id = id
+        self.kind = kind
+        self.stage = stage
+        self.state = state
+        self.priority = priority          # меньше — раньше
+        self.payload = payload            # dict, сохраняется после каждой стадии
+        self.attempts = attempts          # неудачных попыток текущей стадии
+        self.chat_id = chat_id
+        self.user_id = user_id
+        self.message_id = message_id      # статусное сообщение, которое правят стадии
+
+
+_COLUMNS = "id, kind, stage, state, priority, payload, attempts, chat_id, user_id, message_id"
+
+
+def _job(row):
+    return Job(*row[:5], json.loads(row[5]), *row[6:])
+
+
+class JobQueue:
+    """
+    Персистентная очередь задач (SQLite) с пулом воркеров.
+    Задача проходит стадии: обработчик стадии получает Job, может менять job.payload и возвращает
+    имя следующей стадии, None (готово) или WAIT (ждать пользователя). Упавшая стадия повторяется
+    с экспоненциальной паузой, после retries повторов задача считается проваленной.
+    Первыми берутся задачи с меньшим priority; interactive_workers воркеров берут только задачи
+    с priority <= interactive_priority, так что /ask не ждет, пока освободится пул сохранения постов.
+    Задачи, прерванные рестартом, продолжаются с той стадии, на которой остановились.
+    pause_background(True) — все воркеры берут только интерактивные задачи (например, при нехватке памяти).
+    instrument(name) — контекстный менеджер вокруг каждой стадии ("ingest/analyze"), для замеров.
+    """
+
+    def __init__(self, path, workers=3, interactive_workers=1, interactive_priority=1,
+                 retry_delay=5.0, keep_finished=7 * 86400, wait_ttl=2 * 86400, instrument=None):
+        self.workers = workers
+        self.interactive_workers = interactive_workers
+        self.interactive_priority = interactive_priority
+        self.retry_delay = retry_delay
+        self.keep_finished = keep_finished
+        self.wait_ttl = wait_ttl
+        self.instrument = instrument
+        self.background_paused = False
+        self._stages = {}
+        self._failure_handlers = {}
+        self._watchers = {}
+        self._tasks = []
+        self._wakeup = None
+        self._closing = False
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, stage TEXT NOT NULL, state TEXT NOT NULL, "
+            "priority INTEGER NOT NULL, payload TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+            "chat_id INTEGER, user_id INTEGER, message_id INTEGER, error TEXT, "
+            "run_at REAL NOT NULL, created REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_ready ON jobs(state, priority, run_at)")
+        self._db.commit()
+
+    # --- регистрация стадий ---
+
+    def stage(self, kind, name, retries=2):
+        def decorator(fn):
+            self._stages[(kind, name)] = (fn, retries)
+            return fn
+        return decorator
+
+    def on_failure(self, kind):
+        """
+        Обработчик окончательного провала задачи: fn(job, error). Например, сообщить об ошибке в чат.
+        """
+        def decorator(fn):
+            self._failure_handlers[kind] = fn
+            return fn
+        return decorator
+
+    # --- операции с задачами ---
+
+    def enqueue(self, kind, stage, payload, priority, chat_id=None, user_id=None, message_id=None):
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO jobs (kind, stage, state, priority, payload, chat_id, user_id, message_id, run_at, created, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (kind, stage, QUEUED, priority, json.dumps(payload, ensure_ascii=False),
+                 chat_id, user_id, message_id, now, now, now)
+            )
+            self._db.commit()
+        self._wake()
+        return cursor.lastrowid
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._db.execute(f"SELECT {_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job(row) if row else None
+
+    def resume(self, job, stage, priority=None):
+        """
+        Продолжает ждущую задачу со стадии stage (сохраняя job.payload и job.message_id).
+        False — задача уже не ждет (отменена, устарела или кнопку нажали дважды).
+        """
+        now = time.time()
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET stage = ?, state = ?, priority = ?, payload = ?, message_id = ?, attempts = 0, "
+                "run_at = ?, updated = ? WHERE id = ? AND state = ?",
+                (stage, QUEUED, job.priority if priority is None else priority,
+                 json.dumps(job.payload, ensure_ascii=False), job.message_id, now, now, job.id, WAITING)
+            )
+            self._db.commit()
+        if cursor.rowcount:
+            self._wake()
+        return bool(cursor.rowcount)
+
+    def cancel(self, job_id):
+        with self._lock:
+            cursor = self._db.execute(
+                "UPDATE jobs SET state = ?, updated = ? WHERE id = ? AND state IN (?, ?)",
+                (CANCELLED, time.time(), job_id, QUEUED, WAITING)
+            )
+            self._db.commit()
+        if cursor.rowcount:
+            self._notify(job_id, CANCELLED)
+        return bool(cursor.rowcount)
+
+    def waiting(self):
+        with self._lock:
+            rows = self._db.execute(f"SELECT {_COLUMNS} FROM jobs WHERE state = ? ORDER BY id", (WAITING,)).fetchall()
+        return [_job(row) for row in rows]
+
+    def counts(self):
+        with self._lock:
+            return dict(self._db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+
+    async def wait(self, job_id):
+        """
+        Ждет, пока задача не завершится или не остановится в ожидании пользователя. Возвращает состояние.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._watchers.setdefault(job_id, []).append(future)
+        job = self.get(job_id)
+        if job is not None and job.state in (*FINAL_STATES, WAITING):
+            self._notify(job_id, job.state)
+        return await future
+
+    # --- воркеры ---
+
+    def recover(self):
+        """
+        После рестарта: прерванные задачи — обратно в очередь, старые завершенные и
+        так и не дождавшиеся ответа — удалить. Возвращает число задач в очереди.
+        """
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM jobs WHERE (state IN (?, ?, ?) AND updated < ?) OR (state = ? AND updated < ?)",
+                (*FINAL_STATES, now - self.keep_finished, WAITING, now - self.wait_ttl)
+            )
+            self._db.execute("UPDATE jobs SET state = ?, run_at = ? WHERE state = ?", (QUEUED, now, RUNNING))
+            self._db.commit()
+            return self._db.execute("SELECT COUNT(*) FROM jobs WHERE state = ?", (QUEUED,)).fetchone()[0]
+
+    def start(self):
+        self._closing = False
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(f"w{i}", None)) for i in range(self.workers)]
+        self._tasks += [
+            asyncio.create_task(self._worker(f"i{i}", self.interactive_priority)) for i in range(self.interactive_workers)
+        ]
+
+    async def stop(self, timeout=30.0):
+        """
+        Дает текущим стадиям доработать (не дольше timeout). Недоделанное продолжится после рестарта.
+        """
+        self._closing = True
+        self._wake()
+        done, pending = await asyncio.wait(self._tasks, timeout=timeout) if self._tasks else ((), ())
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+
+    def pause_background(self, paused):
+        self.background_paused = paused
+        if not paused:
+            self._wake()
+
+    def _wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _claim(self, max_priority):
+        now = time.time()
+        if max_priority is None and self.background_paused:
+            max_priority = self.interactive_priority
+        limit = max_priority if max_priority is not None else 1 << 30
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {_COLUMNS} FROM jobs WHERE state = ? AND run_at <= ? AND priority <= ? "
+                "ORDER BY priority, id LIMIT 1",
+                (QUEUED, now, limit)
+            ).fetchone()
+            if row is None:
+                due = self._db.execute(
+                    "SELECT MIN(run_at) FROM jobs WHERE state = ? AND priority <= ?", (QUEUED, limit)
+                ).fetchone()[0]
+                return None, (due - now if due is not None else None)
+            self._db.execute("UPDATE jobs SET state = ?, updated = ? WHERE id = ?", (RUNNING, now, row[0]))
+            self._db.commit()
+        job = _job(row)
+        job.state = RUNNING
+        return job, None
+
+    def _save(self, job, state, error=None, delay=0.0):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET stage = ?, state = ?, payload = ?, attempts = ?, message_id = ?, error = ?, "
+                "run_at = ?, updated = ? WHERE id = ?",
+                (job.stage, state, json.dumps(job.payload, ensure_ascii=False), job.attempts, job.message_id,
+                 error, now + delay, now, job.id)
+            )
+            self._db.commit()
+        job.state = state
+        if state != QUEUED:
+            self._notify(job.id, state)
+
+    def _notify(self, job_id, state):
+        for future in self._watchers.pop(job_id, ()):
+            if not future.done():
+                future.set_result(state)
+
+    async def _worker(self, name, max_priority):
+        while not self._closing:
+            self._wakeup.clear()
+            job, due_in = self._claim(max_priority)
+            if job is None:
+                try:
+                    # asyncio.timeout, а не wait_for: в 3.11 wait_for может проглотить отмену воркера
+                    async with asyncio.timeout(min(due_in, 5.0) if due_in is not None else 5.0):
+                        await self._wakeup.wait()
+                except TimeoutError:
+                    pass
+                continue
+            await self._run(job, name)
+
+    async def _run(self, job, name):
+        handler = self._stages.get((job.kind, job.stage))
+        if handler is None:
+            logger.error(f"Job {job.id}: no handler for {job.kind}/{job.stage}")
+            self._save(job, FAILED, error="unknown stage")
+            return
+        fn, retries = handler
+        try:
+            if self.instrument is None:
+                result = await fn(job)
+            else:
+                with self.instrument(f"{job.kind}/{job.stage}"):
+                    result = await fn(job)
+        except Exception as e:
+            job.attempts += 1
+            if job.attempts <= retries:
+                delay = self.retry_delay * 2 ** (job.attempts - 1)
+                logger.warning(f"Job {job.id} {job.kind}/{job.stage} failed ({e}), retry {job.attempts}/{retries} in {delay:.0f}s")
+                self._save(job, QUEUED, error=str(e), delay=delay)
+                return
+            logger.error(f"Job {job.id} {job.kind}/{job.stage} failed after {job.attempts} attempt(s): {e}")
+            self._save(job, FAILED, error=str(e))
+            on_failure = self._failure_handlers.get(job.kind)
+            if on_failure is not None:
+                try:
+                    await on_failure(job, e)
+                except Exception as report_error:
+                    logger.error(f"Job {job.id}: failure handler error: {report_error}")
+            return
+
+        if result is WAIT:
+            self._save(job, WAITING)
+        elif result is None:
+            self._save(job, DONE)
+        else:
+            job.stage = result
+            job.attempts = 0
+            self._save(job, QUEUED)
+            self._wake()
@@ -0,0 +1,272 @@
+import re
+import json
+
+_ESCAPES = {'"': '"', "'": "'", '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+_LITERALS = {'true': True, 'false': False, 'null': None, 'none': None}
+_DELIMITERS = ',:}]'
+_BARE_KEY_RE = re.compile(r'[A-Za-z_]\w*')
+
+
+def _literal(token):
+    lowered = token.lower()
+    if lowered in _LITERALS:
+        return _LITERALS[lowered]
+    try:
+        return int(token)
+    except ValueError:
+        pass
+    try:
+        return float(token)
+    except ValueError:
+        return token
+
+
+class JsonRepairParser:
+    """
+    Терпимый потоковый разбор JSON-объекта из ответа модели. Текст подается кусками (feed),
+    каждый символ смотрится один раз. Переживает:
+    - рассуждения и ```json вокруг объекта (все до первой "{" и после ее закрытия игнорируется);
+    - неэкранированные кавычки внутри строк: кавычка закрывает строку, только если за ней
+      идет то, что может идти после строки (":" после ключа, "," и следующий ключ, "}" или "]");
+    - одинарные кавычки, ключи без кавычек, висячие запятые, True/False/None;
+    - обрыв на max_tokens: незакрытая строка дописывается как есть, объекты закрываются.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.done = False
+        self._stack = []          # [контейнер, ключ, ждем_ключ] — ключ для dict, куда ляжет значение
+        self._string = None       # буфер текущей строки
+        self._quote = None
+        self._escape = None       # None | "" (после \) | "u..." (внутри \uXXXX)
+        self._pending = None      # сырые символы после возможной закрывающей кавычки
+        self._bare = None         # буфер литерала/ключа без кавычек
+
+    # --- публичное API ---
+
+    def feed(self, chunk):
+        for char in chunk:
+            if self.done:
+                return self
+            self._char(char)
+        return self
+
+    def close(self):
+        """
+        Завершает разбор: дописывает оборванные строки и литералы, закрывает контейнеры.
+        Возвращает dict или None, если объект так и не начался.
+        """
+        if not self.done:
+            if self._pending is not None:
+                self._end_string()
+            self._finish_token()
+            self._stack.clear()
+            self.done = True
+        return self.root if isinstance(self.root, dict) else None
+
+    # --- конечный автомат ---
+
+    def _char(self, char):
+        if self._pending is not None:
+            self._pending_char(char)
+        elif self._string is not None:
+            self._string_char(char)
+        elif self.root is None:
+            if char == '{':
+                self.root = {}
+                self._stack.append([self.root, None, True])
+        else:
+            self._structure_char(char)
+
+    def _string_char(self, char):
+        if self._escape is not None:
+            self._escape_char(char)
+        elif char == '\\':
+            self._escape = ""
+        elif char == self._quote:
+            self._pending = char
+        else:
+            self._string.append(char)
+
+    def _escape_char(self, char):
+        if self._escape.startswith('u'):
+            self._escape += char
+            if len(self._escape) == 5:
+                try:
+                    self._string.append(chr(int(self._escape[1:], 16)))
+                except ValueError:
+                    self._string.append('\\' + self._escape)
+                self._escape = None
+            return
+        if char == 'u':
+            self._escape = 'u'
+            return
+        self._string.append(_ESCAPES.get(char, '\\' + char))
+        self._escape = None
+
+    def _pending_char(self, char):
+        """
+        Решаем, закрывала ли строку кавычка, по первым значимым символам после нее.
+        """
+        self._pending += char
+        significant = self._pending[1:].strip()
+        if not significant:
+            return
+        container, key, want_key = self._stack[-1]
+        in_key = isinstance(container, dict) and (want_key or key is None)
+        closer = '}' if isinstance(container, dict) else ']'
+        if in_key:
+            closes = significant[0] == ':'
+        elif significant[0] == closer:
+            closes = True
+        elif significant[0] == ',':
+            rest = significant[1:].lstrip()
+            if not rest:
+                return    # ждем, что после запятой: следующий ключ или продолжение текста
+            word = _BARE_KEY_RE.match(rest)
+            if word:
+                # Слово после запятой — ключ без кавычек, только если за ним ":"
+                after = rest[word.end():].lstrip()
+                if not after:
+                    return
+                closes = after[0] == ':'
+            else:
+                closes = rest[0] in '"\'}]' or isinstance(container, list)
+        else:
+            closes = False
+
+        raw = self._pending
+        self._pending = None
+        if closes:
+            self._end_string()
+            for ch in raw[1:]:
+                self._char(ch)
+        else:
+            # Кавычка была частью текста
+            self._string.append(raw[0])
+            for ch in raw[1:]:
+                self._string_char(ch)
+
+    def _structure_char(self, char):
+        if self._bare is not None:
+            if char.isspace() or char in _DELIMITERS or char in '{["\'':
+                self._finish_token()
+            else:
+                self._bare.append(char)
+                return
+        if char.isspace():
+            return
+        frame = self._stack[-1] if self._stack else None
+        if frame is None:
+            return
+        container, key, want_key = frame
+        if char in '"\'':
+            self._string, self._quote = [], char
+        elif char == '{' or char == '[':
+            if isinstance(container, dict) and want_key:
+                return    # контейнер вместо ключа — мусор
+            value = {} if char == '{' else []
+            self._put(value)
+            self._stack.append([value, None, isinstance(value, dict)])
+        elif char in '}]':
+            expected = dict if char == '}' else list
+            while self._stack and not isinstance(self._stack[-1][0], expected):
+                self._stack.pop()
+            if self._stack:
+                self._stack.pop()
+            if not self._stack:
+                self.done = True
+        elif char == ':':
+            if isinstance(container, dict) and key is not None:
+                frame[2] = False
+        elif char == ',':
+            if isinstance(container, dict):
+                frame[1], frame[2] = None, True
+        else:
+            self._bare = [char]
+
+    def _end_string(self):
+        value = "".join(self._string)
+        self._string = self._quote = self._escape = None
+        self._pending = None
+        self._accept(value)
+
+    def _finish_token(self):
+        if self._string is not None:
+            self._end_string()
+        if self._bare is None:
+            return
+        token = "".join(self._bare).strip()
+        self._bare = None
+        if not self._stack:
+            return
+        container, _, want_key = self._stack[-1]
+        self._accept(token if isinstance(container, dict) and want_key else _literal(token))
+
+    def _accept(self, value):
+        if not self._stack:
+            return
+        frame = self._stack[-1]
+        container, key, want_key = frame
+        if isinstance(container, dict) and (want_key or key is None):
+            # Ключ (в том числе после забытой запятой)
+            frame[1] = str(value)
+            frame[2] = False          # двоеточие могли и забыть
+        else:
+            self._put(value)
+
+    def _put(self, value):
+        frame = self._stack[-1]
+        container, key, _ = frame
+        if isinstance(container, list):
+            container.append(value)
+        elif key is not None:
+            container[key] = value
+            frame[1] = None
+
+
+_FENCE_RE = re.compile(r'```(?:json)?\s*(\{.*?\})\s*```', re.DOTALL)
+_DECODER = json.JSONDecoder()
+_MAX_STARTS = 32      # сколько "{" пробуем как начало объекта
+
+
+def _wanted(value, key):
+    return isinstance(value, dict) and (key is None or key in value)
+
+
+def parse_json(text, key=None):
+    """
+    (dict или None, понадобился ли ремонт). key — ключ, который обязан быть в объекте (например, "section").
+    Порядок: блок ```json; строгий разбор с каждой "{" по очереди; терпимый разбор с тех же позиций.
+    Модель рассуждает перед ответом, и в рассуждениях тоже бывают фигурные скобки, поэтому
+    первая "{" — не обязательно начало ответа.
+    """
+    fence = _FENCE_RE.search(text)
+    if fence:
+        try:
+            value = json.loads(fence.group(1))
+            if _wanted(value, key):
+                return value, False
+        except ValueError:
+            pass
+        value = JsonRepairParser().feed(fence.group(1)).close()
+        if _wanted(value, key):
+            return value, True
+
+    starts = []
+    start = text.find('{')
+    while start != -1 and len(starts) < _MAX_STARTS:
+        starts.append(start)
+        start = text.find('{', start + 1)
+    for start in starts:
+        try:
+            value, _ = _DECODER.raw_decode(text, start)
+        except ValueError:
+            continue
+        if _wanted(value, key):
+            return value, False
+    for start in starts:
+        value = JsonRepairParser().feed(text[start:]).close()
+        if _wanted(value, key):
+            return value, True
+    return None, True
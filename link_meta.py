@@ -0,0 +1,340 @@
+import re
+import json
+import time
+import codecs
+import errno
+import socket
+import sqlite3
+import asyncio
+import logging
+import threading
+import ipaddress
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+
+import aiohttp
+from aiohttp.resolver import ThreadedResolver
+
+from dedup import canonical_url
+
+logger = logging.getLogger(__name__)
+
+_REDIRECTS = (301, 302, 303, 307, 308)
+_GITHUB_REPO_RE = re.compile(r'^/([\w.-]+)/([\w.-]+?)(?:\.git)?(?:/|$)')
+# Первый сегмент пути github.com, который не является владельцем репозитория
+_GITHUB_NOT_OWNERS = frozenset({
+    'orgs', 'topics', 'features', 'marketplace', 'sponsors', 'settings', 'about', 'login', 'explore',
+    'collections', 'apps', 'search', 'trending', 'pricing', 'enterprise', 'notifications',
+})
+_FIELD_CHARS = 300
+
+
+def github_repo(url):
+    """
+    "owner/repo" для ссылки на репозиторий GitHub (в том числе на файл или ветку внутри), иначе None.
+    """
+    parts = urlsplit(url if "://" in url else f"http://{url}")
+    host = (parts.hostname or "").lower()
+    if host not in ("github.com", "www.github.com"):
+        return None
+    match = _GITHUB_REPO_RE.match(parts.path)
+    if not match or match.group(1).lower() in _GITHUB_NOT_OWNERS:
+        return None
+    return f"{match.group(1)}/{match.group(2)}"
+
+
+def _clip(value):
+    value = " ".join(str(value or "").split())
+    return value if len(value) <= _FIELD_CHARS else value[:_FIELD_CHARS - 3].rstrip() + "..."
+
+
+def describe(meta):
+    """
+    Метаданные ссылки строками для промпта; пусто, если рассказать нечего.
+    """
+    if not meta or meta.get("error"):
+        return ""
+    lines = []
+    if meta.get("final_url") and canonical_url(meta["final_url"]) != canonical_url(meta.get("url")):
+        lines.append(f"Final URL: {meta['final_url']}")
+    for label, key in (("Site", "site_name"), ("Title", "title"), ("Description", "description")):
+        if meta.get(key):
+            lines.append(f"{label}: {meta[key]}")
+    repo = meta.get("github")
+    if repo:
+        facts = [f"{repo['repo']}", f"{repo.get('stars', 0)}★"]
+        if repo.get("language"):
+            facts.append(repo["language"])
+        if repo.get("topics"):
+            facts.append("topics: " + ", ".join(repo["topics"][:8]))
+        lines.append("GitHub: " + "; ".join(facts))
+    return "\n".join(lines)
+
+
+class _HeadParser(HTMLParser):
+    """
+    <title> и <meta> из <head>. done — дошли до </head> или <body>: дальше читать незачем.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title_parts = []
+        self.meta = {}
+        self.done = False
+        self._in_title = False
+        self._title_seen = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "title" and not self._title_seen:
+            self._in_title = self._title_seen = True
+        elif tag == "meta":
+            attrs = dict(attrs)
+            key = (attrs.get("property") or attrs.get("name") or "").lower()
+            if key and attrs.get("content") and key not in self.meta:
+                self.meta[key] = attrs["content"]
+        elif tag == "body":
+            self.done = True
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+        elif tag == "head":
+            self.done = True
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title_parts.append(data)
+
+
+class LinkMetaCache:
+    """
+    Дисковый кэш метаданных ссылок (SQLite) по каноничной ссылке. Неудачи живут error_ttl:
+    упавший сайт не дергаем на каждый пост, но и не запоминаем надолго.
+    """
+
+    def __init__(self, path, ttl=7 * 86400, error_ttl=3600):
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS links (key TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS links_expires ON links(expires)")
+        self._db.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT data FROM links WHERE key = ? AND expires > ?", (key, time.time())).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, meta):
+        now = time.time()
+        expires = now + (self.error_ttl if meta.get("error") else self.ttl)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO links (key, data, expires) VALUES (?, ?, ?)",
+                (key, json.dumps(meta, ensure_ascii=False), expires)
+            )
+            self._db.execute("DELETE FROM links WHERE expires <= ?", (now,))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class _PublicResolver(ThreadedResolver):
+    """
+    Резолвер сессии, который отказывает именам с непубличными адресами. Проверяются ровно те адреса,
+    к которым aiohttp затем подключается, — подменить ответ DNS между проверкой и подключением нельзя.
+    """
+
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        results = await super().resolve(host, port, family)
+        for result in results:
+            if not ipaddress.ip_address(result["host"].split("%")[0]).is_global:
+                raise OSError(errno.EACCES, f"{host} resolves to a non-public address")
+        return results
+
+
+class LinkMetaFetcher:
+    """
+    Метаданные страницы по ссылке: конечный адрес после редиректов, title, og:/meta description,
+    название сайта, а для репозиториев GitHub — описание, звезды и темы из API.
+    Общая aiohttp-сессия; на ссылку — не больше timeout секунд и max_bytes прочитанного HTML
+    (читается только <head>). Одновременные запросы одной ссылки склеиваются в один.
+    Адреса во внутренней сети не запрашиваются (allow_private=True — только для локальных тестов).
+    """
+
+    def __init__(self, cache=None, timeout=4.0, max_bytes=256 * 1024, max_redirects=5, github_token=None,
+                 github_api="https://api.github.com", allow_private=False, max_connections=16):
+        self.cache = cache
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.max_redirects = max_redirects
+        self.github_token = github_token
+        self.github_api = github_api.rstrip("/")
+        self.allow_private = allow_private
+        self.max_connections = max_connections
+        self._session = None
+        self._inflight = {}
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.max_connections, ttl_dns_cache=300,
+                    resolver=None if self.allow_private else _PublicResolver()
+                ),
+                headers={"User-Agent": "Mozilla/5.0 (compatible; GalaxyBot/1.0; link preview)"},
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+    # --- публичное API ---
+
+    def prefetch(self, url):
+        """
+        Запускает загрузку в фоне и сразу возвращается; fetch() той же ссылки потом подхватит результат.
+        """
+        self._start(url)
+
+    async def fetch(self, url):
+        """
+        dict метаданных (при неудаче — с полем error) или None для пустой ссылки.
+        """
+        started = self._start(url)
+        if started is None or isinstance(started, dict):
+            return started
+        # shield: отмена ждущего не должна обрывать загрузку, которую ждут и другие
+        return await asyncio.shield(started)
+
+    def _start(self, url):
+        key = canonical_url(url)
+        if not key:
+            return None
+        task = self._inflight.get(key)
+        if task is not None:
+            return task
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+        task = asyncio.create_task(self._load(url, key))
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return task
+
+    # --- загрузка ---
+
+    async def _load(self, url, key):
+        started = time.monotonic()
+        try:
+            async with asyncio.timeout(self.timeout):
+                meta = await self._fetch(url)
+        except TimeoutError:
+            meta = {"url": url, "error": "timeout"}
+        except (aiohttp.ClientError, OSError, ValueError) as e:
+            meta = {"url": url, "error": f"{type(e).__name__}: {e}"[:200]}
+        except Exception as e:
+            # Задачу prefetch может никто не дождаться: исключение из нее только попало бы в лог asyncio
+            logger.warning(f"Link metadata for {url} failed unexpectedly: {type(e).__name__}: {e}")
+            meta = {"url": url, "error": f"{type(e).__name__}: {e}"[:200]}
+        meta["seconds"] = round(time.monotonic() - started, 3)
+        if self.cache is not None:
+            try:
+                await asyncio.to_thread(self.cache.put, key, meta)
+            except Exception as e:
+                logger.warning(f"Can't cache link metadata for {url}: {e}")
+        return meta
+
+    async def _fetch(self, url):
+        current = url if "://" in url else f"http://{url}"
+        session = self._get_session()
+        for _ in range(self.max_redirects + 1):
+            self._check_host(current)
+            repo = github_repo(current)
+            if repo:
+                info = await self._github(session, repo)
+                if info is not None:
+                    return {"url": url, "final_url": info.pop("html_url") or current, "title": repo,
+                            "description": info.get("description", ""), "site_name": "GitHub", "github": info}
+            async with session.get(current, allow_redirects=False, headers={"Accept": "text/html,*/*;q=0.5"}) as resp:
+                location = resp.headers.get("Location")
+                if resp.status in _REDIRECTS and location:
+                    current = urljoin(current, location)
+                    continue
+                meta = {"url": url, "final_url": current, "status": resp.status}
+                if resp.status >= 400:
+                    meta["error"] = f"HTTP {resp.status}"
+                elif "html" in (resp.content_type or ""):
+                    meta.update(await self._read_head(resp))
+                return meta
+        return {"url": url, "final_url": current, "error": "too many redirects"}
+
+    async def _read_head(self, resp):
+        try:
+            decoder = codecs.getincrementaldecoder(resp.charset or "utf-8")(errors="replace")
+        except LookupError:
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        parser = _HeadParser()
+        read = 0
+        while read < self.max_bytes and not parser.done:
+            chunk = await resp.content.read(min(16384, self.max_bytes - read))
+            if not chunk:
+                break
+            read += len(chunk)
+            parser.feed(decoder.decode(chunk))
+        meta = parser.meta
+        return {
+            "title": _clip(meta.get("og:title") or "".join(parser.title_parts)),
+            "description": _clip(meta.get("og:description") or meta.get("description") or meta.get("twitter:description")),
+            "site_name": _clip(meta.get("og:site_name")),
+            "bytes": read,
+        }
+
+    async def _github(self, session, repo):
+        headers = {"Accept": "application/vnd.github+json"}
+        if self.github_token:
+            headers["Authorization"] = f"Bearer {self.github_token}"
+        try:
+            async with session.get(f"{self.github_api}/repos/{repo}", headers=headers) as resp:
+                if resp.status != 200:
+                    return None    # лимит API или приватный репозиторий — читаем саму страницу
+                data = await resp.json(content_type=None)
+        except (aiohttp.ClientError, ValueError):
+            return None
+        return {
+            "repo": data.get("full_name") or repo,
+            "html_url": data.get("html_url"),
+            "description": _clip(data.get("description")),
+            "stars": data.get("stargazers_count", 0),
+            "language": data.get("language"),
+            "topics": data.get("topics") or [],
+            "homepage": data.get("homepage") or "",
+        }
+
+    def _check_host(self, url):
+        """
+        Схема и адрес-литерал; имена хостов проверяет _PublicResolver при подключении.
+        """
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"unsupported URL {url[:100]}")
+        if self.allow_private:
+            return
+        try:
+            address = ipaddress.ip_address(parts.hostname.split("%")[0])
+        except ValueError:
+            return
+        if not address.is_global:
+            raise ValueError(f"{parts.hostname} is a non-public address")
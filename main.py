@@ -1,5 +1,4 @@
 import os
-import json
 import uuid
 import sys
 import re
@@ -7,21 +6,41 @@ import asyncio
 import base64
 import html
 import time
-import ast
-import gc
 import logging
-from urllib.parse import urlparse, urlunparse, parse_qs, urlencode
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
 from aiohttp import web
-from github import Github, Auth
-from huggingface_hub import InferenceClient
 from aiogram import Bot, Dispatcher, types, F
 from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.enums import ParseMode
 from aiogram.exceptions import TelegramBadRequest
 from dotenv import load_dotenv
+from site_cache import SiteStore
+from cards import Card, SECTIONS, parse_site
+from shards import SHARD_DIR, shard_path, section_for_path
+from search import SearchIndex
+from site_index import SiteIndex
+from classifier import SectionClassifier
+from vectors import VectorStore, make_embedder
+from json_repair import parse_json
+from dedup import DedupIndex, canonical_url, is_tracking_param
+from commit_queue import CommitQueue
+from bursts import BurstAggregator, message_text
+from cascade import hedged_cascade
+from hf_client import AsyncInferenceClient, InferenceError
+from tg_stream import StreamingMessage, MessageRef
+from model_health import ModelHealth
+from class_cache import ClassificationCache
+from link_meta import LinkMetaCache, LinkMetaFetcher, describe as describe_link
+from jobs import JobQueue, WAIT, WAITING
+from memory import MemoryMonitor, BoundedMemoryStorage, rss_bytes
+from webhook import WebhookReceiver, derive_secret
+from metrics import (
+    Gauge, MODEL_ATTEMPT_SECONDS, DB_CONTEXT_SECONDS, GITHUB_PUSH_SECONDS, GITHUB_PUSH_RESULTS,
+    FALLBACK_HEURISTIC, LOCAL_CLASSIFIER, MODEL_JSON_RESULTS, NEAR_DUPLICATES, LINK_META_RESULTS,
+    LINK_META_WAIT_SECONDS, POST_PARTS, observe_prompt, render as render_metrics
+)
 
 # --- 1. НАСТРОЙКИ И ОКРУЖЕНИЕ ---
 load_dotenv()
@@ -38,6 +57,66 @@ HF_TOKEN = os.getenv("HF_TOKEN")
 ADMIN_ID = int(os.getenv("ADMIN_ID", 0)) 
 REPO_NAME = "YgalaxyY/BookMarkCore"
 FILE_PATH = "index.html"
+SITE_CACHE_TTL = float(os.getenv("SITE_CACHE_TTL", 15))
+SEARCH_INDEX_PATH = os.getenv("SEARCH_INDEX_PATH", "search-index.json")  # индекс фильтров для filters.js рядом с index.html ("" — не публиковать)
+SITE_LAYOUT = os.getenv("SITE_LAYOUT", "single")   # single — все карточки в index.html, sharded — sections/<раздел>.html
+ASK_TOP_K = int(os.getenv("ASK_TOP_K", 12))            # сколько карточек уходит в промпт /ask
+ASK_PROMPT_CHARS = int(os.getenv("ASK_PROMPT_CHARS", 1500))  # обрезка длинных промптов в контексте
+COMMIT_WINDOW = float(os.getenv("COMMIT_WINDOW", 1.5))  # сколько секунд копим карточки в один коммит
+COMMIT_BATCH_MAX = int(os.getenv("COMMIT_BATCH_MAX", 20))
+COMMIT_RETRIES = 5
+BURST_WINDOW = float(os.getenv("BURST_WINDOW", 0.8))          # сколько ждем следующую часть пересланного поста или альбома, пока чат не обучился
+BURST_MAX_WINDOW = float(os.getenv("BURST_MAX_WINDOW", 3))    # дольше этого части одного поста не копим
+MODEL_TIMEOUT = float(os.getenv("MODEL_TIMEOUT", 25))  # лимит на одну попытку классификации
+HEDGE_DELAY = float(os.getenv("HEDGE_DELAY", 6))       # через сколько секунд подключать следующую модель (0 — без хеджирования)
+HF_MAX_CONCURRENCY = int(os.getenv("HF_MAX_CONCURRENCY", 8))  # одновременных запросов к HF
+STRUCTURED_OUTPUT = os.getenv("STRUCTURED_OUTPUT", "1") == "1"  # просить JSON по схеме (response_format), где провайдер умеет
+ASK_STREAMING = os.getenv("ASK_STREAMING", "1") == "1"         # показывать ответ /ask по мере генерации
+ASK_TIMEOUT = float(os.getenv("ASK_TIMEOUT", 40))
+ASK_EDIT_INTERVAL = float(os.getenv("ASK_EDIT_INTERVAL", 1.2))  # не чаще одной правки сообщения за N секунд
+MODEL_STATS_PATH = os.getenv("MODEL_STATS_PATH", "model_stats.json")
+CLASS_CACHE_PATH = os.getenv("CLASS_CACHE_PATH", "class_cache.sqlite3")
+CLASS_CACHE_MAX = int(os.getenv("CLASS_CACHE_MAX", 5000))
+CLASS_CACHE_TTL_DAYS = float(os.getenv("CLASS_CACHE_TTL_DAYS", 30))
+LOCAL_CLASSIFIER_CONFIDENCE = int(os.getenv("LOCAL_CLASSIFIER_CONFIDENCE", 80))  # с какой уверенности обходимся без LLM (101 — никогда)
+LINK_META = os.getenv("LINK_META", "1") == "1"              # подтягивать title/description страницы по ссылке из поста
+LINK_META_PATH = os.getenv("LINK_META_PATH", "link_meta.sqlite3")
+LINK_META_TIMEOUT = float(os.getenv("LINK_META_TIMEOUT", 4))   # лимит на одну ссылку, включая редиректы
+LINK_META_MAX_KB = int(os.getenv("LINK_META_MAX_KB", 256))     # сколько HTML читаем в поисках <head>
+LINK_META_TTL_DAYS = float(os.getenv("LINK_META_TTL_DAYS", 7))
+LINK_META_WAIT = float(os.getenv("LINK_META_WAIT", 2.5))       # сколько классификация ждет метаданные сверх уже прошедшего
+VECTORS_PATH = os.getenv("VECTORS_PATH", "vectors")       # эмбеддинги карточек: vectors.f32 + vectors.sqlite3
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "hashing")  # hashing — локально без модели, иначе имя модели sentence-transformers
+NEAR_DUPLICATE_SIMILARITY = float(os.getenv("NEAR_DUPLICATE_SIMILARITY", 0.5))  # с какого косинуса спрашивать, не дубль ли это
+NEAR_DUPLICATE_TOP_K = 3
+LOCAL_CLASSIFIER_MIN_WORDS = 6      # короткие реплики ("привет", вопрос) — всегда к LLM: это может быть chat
+# Без ссылки, кода или таких слов пост может оказаться разговором (chat), а его знает только LLM
+RESOURCE_MARKER_RE = re.compile(
+    r'```|\bact as\b|\byou are an? \b|\bprompt|промпт|github|\bapk\b|скача|download|расширени|extension|\bрепозитор',
+    re.IGNORECASE
+)
+WARM_STATE_PATH = os.getenv("WARM_STATE_PATH", "warm_state.pickle")  # снапшот сайта и индексов для быстрого старта ("" — выкл.)
+WARM_STATE_INTERVAL = float(os.getenv("WARM_STATE_INTERVAL", 300))
+BOT_MODE = os.getenv("BOT_MODE", "polling")               # polling — локально, webhook — на хостинге
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")                 # публичный адрес сервиса, например https://bot.onrender.com
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/tg/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")           # пусто — выводится из TG_TOKEN
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", 4))     # сколько апдейтов обрабатываются одновременно
+WEBHOOK_QUEUE = int(os.getenv("WEBHOOK_QUEUE", 100))       # сверх этого Telegram получает 503 и повторяет позже
+DROP_PENDING_UPDATES = os.getenv("DROP_PENDING_UPDATES", "1") == "1"  # 0 — обработать то, что пришло, пока бот спал
+JOBS_PATH = os.getenv("JOBS_PATH", "jobs.sqlite3")         # очередь задач, переживает рестарт
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))            # сколько постов обрабатываются одновременно
+ASK_WORKERS = int(os.getenv("ASK_WORKERS", 4))            # отдельные воркеры для /ask и нажатых кнопок
+JOB_RETRIES = int(os.getenv("JOB_RETRIES", 3))            # повторов упавшей стадии (пауза растет вдвое)
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", 5))
+# Приоритеты задач: меньше — раньше
+MEMORY_SAMPLING = os.getenv("MEMORY_SAMPLING", "0") == "1"      # RSS до/после каждой стадии, отчет на /debug/memory
+MEMORY_TRACEMALLOC = int(os.getenv("MEMORY_TRACEMALLOC", 0))      # >0 — tracemalloc с такой глубиной стека (дорого, для отладки)
+MEMORY_BUDGET_MB = float(os.getenv("MEMORY_BUDGET_MB", 0))        # выше этого RSS — сборка мусора и пауза фоновых задач (0 — выкл.)
+FSM_MAX_KEYS = int(os.getenv("FSM_MAX_KEYS", 10000))              # сколько пользователей с незавершенным диалогом держим в памяти
+PRIORITY_ASK = 0
+PRIORITY_FOLLOWUP = 1    # пользователь нажал кнопку или прислал ссылку
+PRIORITY_INGEST = 5
 
 # Каскад моделей
 AI_MODELS_QUEUE = [
@@ -52,13 +131,51 @@ if not all([TG_TOKEN, GITHUB_TOKEN, HF_TOKEN]):
 
 class ToolForm(StatesGroup):
     wait_link = State()
-    confirm_duplicate = State()
-    select_category = State()
 
 bot = Bot(token=TG_TOKEN)
-dp = Dispatcher(storage=MemoryStorage())
-auth = Auth.Token(GITHUB_TOKEN)
-gh = Github(auth=auth)
+dp = Dispatcher(storage=BoundedMemoryStorage(max_keys=FSM_MAX_KEYS))
+memory = MemoryMonitor(sampling=MEMORY_SAMPLING, tracemalloc_frames=MEMORY_TRACEMALLOC, budget_mb=MEMORY_BUDGET_MB)
+Gauge("galaxy_process_rss_bytes", "Resident set size of the bot process", collect=lambda: {(): rss_bytes()})
+hf = AsyncInferenceClient(HF_TOKEN, max_concurrency=HF_MAX_CONCURRENCY)
+model_health = ModelHealth(MODEL_STATS_PATH, cooldown=float(os.getenv("MODEL_COOLDOWN", 120)))
+Gauge(
+    "galaxy_model_circuit_open", "1 if the model's circuit breaker is open", labels=("model",),
+    collect=lambda: {(model,): int(stats["state"] == "open") for model, stats in model_health.snapshot().items()}
+)
+class_cache = ClassificationCache(CLASS_CACHE_PATH, max_entries=CLASS_CACHE_MAX, ttl=CLASS_CACHE_TTL_DAYS * 86400)
+vector_store = VectorStore(VECTORS_PATH, make_embedder(EMBEDDING_MODEL))
+link_meta = LinkMetaFetcher(
+    LinkMetaCache(LINK_META_PATH, ttl=LINK_META_TTL_DAYS * 86400), timeout=LINK_META_TIMEOUT,
+    max_bytes=LINK_META_MAX_KB * 1024, github_token=GITHUB_TOKEN
+) if LINK_META else None
+jobs = JobQueue(
+    JOBS_PATH, workers=JOB_WORKERS, interactive_workers=ASK_WORKERS, interactive_priority=PRIORITY_FOLLOWUP,
+    retry_delay=JOB_RETRY_DELAY, instrument=memory.stage if memory.enabled else None
+)
+# Над бюджетом памяти новые посты ждут, /ask и нажатые кнопки обслуживаются как обычно
+memory.on_pressure(jobs.pause_background)
+Gauge("galaxy_jobs", "Jobs in the queue by state", labels=("state",), collect=lambda: {(state,): n for state, n in jobs.counts().items()})
+_repo = None
+
+def get_repo():
+    """
+    PyGithub импортируется и клиент создается при первом обращении к GitHub, а не на старте.
+    Объект репозитория переиспользуется, а не запрашивается (GET /repos/...) заново на каждый коммит.
+    """
+    global _repo
+    if _repo is None:
+        from github import Github, Auth
+        _repo = Github(auth=Auth.Token(GITHUB_TOKEN)).get_repo(REPO_NAME)
+    return _repo
+
+if SITE_LAYOUT == "sharded":
+    site_store = SiteStore(
+        lambda: get_repo(), [shard_path(section) for section in SECTIONS],
+        ref="main", revalidate_interval=SITE_CACHE_TTL, directory=SHARD_DIR
+    )
+else:
+    site_store = SiteStore(lambda: get_repo(), [FILE_PATH], ref="main", revalidate_interval=SITE_CACHE_TTL)
+WARM_STATE_META = {"repo": REPO_NAME, "layout": SITE_LAYOUT, "paths": sorted(site_store.caches)}
 
 # --- МИДЛВАРЬ: ПРОВЕРКА НА АДМИНА ---
 @dp.message.outer_middleware()
@@ -84,72 +201,167 @@ def extract_url_from_text(text):
         clean_urls.append(u)
     return clean_urls[0] if clean_urls else "MISSING"
 
-def clean_and_parse_json(raw_response):
-    text = raw_response.strip()
-    json_block = re.search(r'```json\s*(\{.*?\})\s*```', text, re.DOTALL)
-    if json_block:
-        text = json_block.group(1)
-    else:
-        start = text.find('{')
-        end = text.rfind('}')
-        if start != -1 and end != -1:
-            text = text[start:end+1]
+def prefetch_link(text):
+    """
+    Метаданные ссылки начинают грузиться, как только пришло сообщение, — пока пост ждет воркера.
+    """
+    url = extract_url_from_text(text)
+    if link_meta is not None and url != "MISSING":
+        link_meta.prefetch(url)
+
+async def await_link_meta(task):
+    """
+    Результат загрузки метаданных, но не дольше LINK_META_WAIT; не успела — классифицируем без них
+    (загрузка при этом доходит до конца и остается в кэше).
+    """
+    if task is None:
+        return None
+    started = time.monotonic()
+    try:
+        async with asyncio.timeout(LINK_META_WAIT):
+            meta = await asyncio.shield(task)
+    except TimeoutError:
+        LINK_META_RESULTS.inc(result="late")
+        return None
+    except Exception as e:
+        logger.warning(f"Link metadata failed: {e}")
+        LINK_META_RESULTS.inc(result="error")
+        return None
+    LINK_META_WAIT_SECONDS.observe(time.monotonic() - started)
+    LINK_META_RESULTS.inc(result="error" if meta.get("error") else "ok")
+    return meta
 
-    text = re.sub(r',\s*}', '}', text)
-    text = re.sub(r',\s*]', ']', text)
+def apply_link_meta(data, meta):
+    """
+    Конечный адрес после редиректов — в resolved_url: проверка дублей смотрит и на него.
+    """
+    final_url = (meta or {}).get("final_url")
+    if final_url and not meta.get("error") and canonical_url(final_url) != canonical_url(data.get('url')):
+        data['resolved_url'] = final_url
+    return data
 
-    try: return json.loads(text)
-    except json.JSONDecodeError: pass 
-    try: return ast.literal_eval(text)
-    except Exception: return None
+def clean_and_parse_json(raw_response):
+    """
+    dict из ответа модели: строгий JSON, а если не вышло — терпимый разбор (обрывы, кавычки, рассуждения вокруг).
+    """
+    return parse_json(raw_response)[0]
 
 def normalize_url(url):
+    """
+    Чистая ссылка для карточки: без utm_*/fbclid и прочих однозначных меток (ref, si и т.п. остаются —
+    на некоторых сайтах это часть адреса). Для сравнения дублей — dedup.canonical_url.
+    """
     if url in ["MISSING", "#", ""]: return url
     parsed = urlparse(url)
-    query = parse_qs(parsed.query)
-    clean_query = {k: v for k, v in query.items() if not k.startswith('utm_')}
+    clean_query = [(k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True) if not is_tracking_param(k)]
     parsed = parsed._replace(query=urlencode(clean_query, doseq=True))
     return urlunparse(parsed).rstrip('/')
 
-def fetch_db_context():
+def get_sites(max_age=None):
+    """
+    {path: разобранный файл} для текущих версий (каждый файл парсится один раз на версию).
+    """
+    site_store.get(max_age)
+    return {
+        path: cache.derived("site", lambda html_content, p=path: parse_site(html_content, section=section_for_path(p)))
+        for path, cache in site_store.caches.items()
+    }
+
+def get_all_cards():
+    return [card for site in get_sites().values() for card in site.cards]
+
+def get_search_index():
+    return site_store.derived("search", lambda: SearchIndex.from_cards(get_all_cards()))
+
+def get_dedup_index():
+    return site_store.derived("dedup", lambda: DedupIndex.from_cards(get_all_cards()))
+
+def get_section_model():
+    return site_store.derived("sections", lambda: SectionClassifier.from_cards(get_all_cards(), SECTIONS))
+
+def get_site_index():
+    return site_store.derived("site_index", lambda: SiteIndex.from_cards(get_all_cards()))
+
+def preview_site_index(inserts):
+    """
+    Индекс filters.js с карточками пачки — уходит в тот же коммит, что и html.
+    Кэшированный индекс не трогается, пока коммит не прошел.
+    """
+    index = get_site_index().clone()
+    for path_inserts in inserts.values():
+        for _, card_html, section in path_inserts:
+            fragment = parse_site(card_html, section=section)
+            if fragment.cards:
+                index.add(fragment.cards[0])
+    return index
+
+def get_vector_store():
     """
-    Скачивает сайт с GitHub и превращает его в текстовую базу знаний для ИИ.
+    Хранилище эмбеддингов, сверенное с текущей версией сайта: досчитываются только новые карточки.
+    Живет на диске, а не в производных site_store (и не попадает в снапшот теплого старта).
     """
+    site_store.get()
+    version = site_store.version()
+    if vector_store.version != version:
+        vector_store.sync(get_all_cards())
+        vector_store.version = version
+    return vector_store
+
+def build_db_context(cards):
+    db_items = []
+    for card in cards:
+        extra = ""
+        if card.prompt_body:
+            body = card.prompt_body
+            if len(body) > ASK_PROMPT_CHARS: body = body[:ASK_PROMPT_CHARS] + "..."
+            extra = f"\n  Текст промпта: {body}"
+        elif card.url:
+            extra = f"\n  Ссылка: {card.url}"
+        db_items.append(f"Название: {card.name}\nОписание: {card.desc}{extra}\n---")
+
+    return "\n".join(db_items) if db_items else "По этому запросу в базе ничего не нашлось."
+
+def fetch_db_context(query):
+    """
+    Берет сайт из кэша (сверка с GitHub по ETag) и отбирает BM25 только самые релевантные карточки,
+    чтобы размер промпта не зависел от размера index.html.
+    Возвращает (текст для ИИ, [(card, score)]).
+    """
+    started = time.perf_counter()
     try:
-        repo = gh.get_repo(REPO_NAME)
-        contents = repo.get_contents(FILE_PATH, ref="main")
-        html_content = contents.decoded_content.decode("utf-8")
-        
-        card_blocks = html_content.split('class="glass-card')[1:]
-        db_items = []
-        
-        for block in card_blocks:
-            title_match = re.search(r'<h3[^>]*>(.*?)</h3>', block)
-            desc_match = re.search(r'<p[^>]*>(.*?)</p>', block, re.DOTALL)
-            xmp_match = re.search(r'<xmp>(.*?)</xmp>', block, re.DOTALL)
-            link_match = re.search(r'<a href="([^"]+)"', block)
-            
-            if title_match:
-                title = re.sub(r'<[^>]+>', '', title_match.group(1).strip())
-                desc = re.sub(r'<[^>]+>', '', desc_match.group(1).strip()) if desc_match else ""
-                
-                extra = ""
-                if xmp_match:
-                    extra = f"\n  Текст промпта: {xmp_match.group(1).strip()}"
-                elif link_match:
-                    extra = f"\n  Ссылка: {link_match.group(1)}"
-                    
-                db_items.append(f"Название: {title}\nОписание: {desc}{extra}\n---")
-                
-        return "\n".join(db_items) if db_items else "База данных пока пуста."
+        hits = get_search_index().search(query, top_k=ASK_TOP_K)
+        context = build_db_context([card for card, _ in hits])
     except Exception as e:
         logger.error(f"Error fetching DB context: {e}")
-        return "Ошибка доступа к базе данных."
+        DB_CONTEXT_SECONDS.observe(time.perf_counter() - started, outcome="error")
+        return "Ошибка доступа к базе данных.", []
+    DB_CONTEXT_SECONDS.observe(time.perf_counter() - started, outcome="ok")
+    return context, hits
+
+def format_search_results(hits, limit=7):
+    """
+    Ответ без нейросети: просто ранжированный список найденных карточек.
+    """
+    lines = []
+    for card, _ in hits[:limit]:
+        name = html.escape(card.name)
+        desc = html.escape(card.desc[:160])
+        if card.url and card.url != "#":
+            lines.append(f"🔹 <a href=\"{html.escape(card.url)}\">{name}</a> — {desc}")
+        else:
+            lines.append(f"🔹 <b>{name}</b> — {desc}")
+    return "\n".join(lines)
 
 # --- 3. МОЗГИ БОТА (ЭВРИСТИКА + ИИ) ---
 
+def record_attempt(cascade, model_name, outcome, started):
+    latency = time.monotonic() - started
+    model_health.record(model_name, outcome, latency)
+    MODEL_ATTEMPT_SECONDS.observe(latency, cascade=cascade, model=model_name, outcome=outcome)
+
 def fallback_heuristic_analysis(text):
     logger.warning("🔧 AI Failed completely. Using Fallback logic.")
+    FALLBACK_HEURISTIC.inc()
     prompt_markers = [
         '<Role>', '<System>', '<Context>', '<Instructions>', '<Output_Format>',
         '<Роль>', '<Система>', '<Контекст>', '<Инструкции>', 
@@ -180,13 +392,125 @@ def fallback_heuristic_analysis(text):
 
     if "github.com" in url:
         return {"section": "dev", "name": title, "desc": "GitHub Repo", "url": url, "prompt_body": "", "confidence": 100, "alternative": None, "reply_text": "Репозиторий на GitHub! Добавляю в разработку 💻"}
-    
+
+    # Раздел подскажет локальная модель, обученная на карточках сайта; уверенность — ее собственная
+    try:
+        prediction = get_section_model().predict(text)
+    except Exception as e:
+        logger.warning(f"Local classifier unavailable: {e}")
+        prediction = None
+    if prediction is not None:
+        section, confidence, alternative = prediction
+        return {"section": section, "name": title, "desc": text[:100]+"...", "url": url if url != "MISSING" else "#", "prompt_body": text if section == "prompts" else "", "confidence": confidence, "alternative": alternative, "reply_text": f"Нейросети недоступны, раздел выбрал локальный классификатор ({confidence}%) 🧮"}
+
     return {"section": "ideas", "name": title, "desc": text[:100]+"...", "url": url if url != "MISSING" else "#", "prompt_body": "", "confidence": 50, "alternative": None, "reply_text": "Нейросети недоступны, сохраняю как идею 💡"}
 
-async def analyze_content_full_cycle(text, status_msg: types.Message):
+# Схема ответа классификатора для response_format (порядок полей тот же, что в промпте: сначала рассуждение)
+CLASSIFICATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "thought_process": {"type": "string"},
+        "section": {"type": "string", "enum": [*SECTIONS, "chat"]},
+        "alternative": {"type": "string", "enum": [*SECTIONS, "chat", "none"]},
+        "confidence": {"type": "integer", "minimum": 0, "maximum": 100},
+        "name": {"type": "string"},
+        "desc": {"type": "string"},
+        "url": {"type": "string"},
+        "platform": {"type": "string"},
+        "prompt_body": {"type": "string"},
+        "reply_text": {"type": "string"},
+    },
+    "required": [
+        "thought_process", "section", "alternative", "confidence", "name", "desc",
+        "url", "platform", "prompt_body", "reply_text"
+    ],
+    "additionalProperties": False,
+}
+CLASSIFICATION_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "classification", "schema": CLASSIFICATION_SCHEMA, "strict": True},
+}
+
+async def classification_request(model_name, messages):
+    """
+    Запрос классификации; где провайдер поддерживает response_format, ответ ограничен схемой.
+    Отказ провайдера (400/422 на response_format) запоминается для модели, запрос повторяется без схемы.
+    Возвращает (ответ, была ли схема).
+    """
+    constrained = STRUCTURED_OUTPUT and model_health.structured_output(model_name) is not False
+    if constrained:
+        try:
+            answer = await hf.chat_completion(
+                model_name, messages=messages, max_tokens=4000, temperature=0.1, timeout=MODEL_TIMEOUT,
+                response_format=CLASSIFICATION_FORMAT
+            )
+            model_health.set_structured_output(model_name, True)
+            return answer, True
+        except InferenceError as e:
+            if e.status not in (400, 422):
+                raise
+            logger.info(f"{model_name.split('/')[-1]} rejected response_format, falling back to the prompt-only JSON")
+            model_health.set_structured_output(model_name, False)
+    answer = await hf.chat_completion(
+        model_name, messages=messages, max_tokens=4000, temperature=0.1, timeout=MODEL_TIMEOUT
+    )
+    return answer, False
+
+def local_analysis(text, url):
+    """
+    Карточка без LLM, если локальная модель уверена в разделе, а название и описание
+    берутся из самого поста. Иначе None — решает каскад моделей.
+    Класса chat у локальной модели нет, поэтому берем ее ответ только для постов, похожих на ресурс:
+    со ссылкой, блоком кода или маркером вроде "промпт" и "скачать". Вопросы и болтовня уходят к LLM.
+    """
+    lines = [line.strip(" \t*_#>-•") for line in text.split('\n')]
+    lines = [line for line in lines if len(line) > 3 and not re.match(r'^(https?://|www\.|t\.me/)\S+$', line)]
+    if len(re.findall(r'\w+', text)) < LOCAL_CLASSIFIER_MIN_WORDS or not lines:
+        return None
+    if url in ("#", "MISSING", "") and not RESOURCE_MARKER_RE.search(text):
+        LOCAL_CLASSIFIER.inc(outcome="deferred")
+        return None
+    try:
+        prediction = get_section_model().predict(text)
+    except Exception as e:
+        logger.warning(f"Local classifier unavailable: {e}")
+        return None
+    if prediction is None or prediction[1] < LOCAL_CLASSIFIER_CONFIDENCE:
+        LOCAL_CLASSIFIER.inc(outcome="deferred")
+        return None
+    section, confidence, alternative = prediction
+    LOCAL_CLASSIFIER.inc(outcome="accepted")
+    name = lines[0] if len(lines[0]) <= 60 else lines[0][:57].rstrip() + "..."
+    desc = " ".join(lines[1:]) or lines[0]
+    return {
+        "section": section, "alternative": alternative, "confidence": confidence,
+        "name": name, "desc": desc if len(desc) <= 160 else desc[:157].rstrip() + "...",
+        "url": url, "platform": None, "prompt_body": text if section == "prompts" else None,
+        "reply_text": f"Узнал раздел сам ({confidence}%), без нейросети ⚡",
+    }
+
+async def analyze_content_full_cycle(text, status_msg: types.Message = None, use_fallback=True):
+    """
+    Кэш -> локальный классификатор -> каскад моделей -> эвристика. status_msg=None — без статусов в чате (пакетный импорт),
+    use_fallback=False — вернуть None, если ни одна модель не ответила.
+    """
     hard_found_url = extract_url_from_text(text)
     is_url_present = hard_found_url != "MISSING"
 
+    # Тот же пост (или та же ссылка) уже разбирался — каскад не нужен
+    cached = class_cache.get(text, hard_found_url if is_url_present else None)
+    if cached:
+        logger.info(f"🗃 Classification cache hit: {cached.get('name')}")
+        return cached
+
+    # Метаданные страницы грузятся параллельно с локальным классификатором (если их не начал грузить хендлер)
+    meta_task = asyncio.ensure_future(link_meta.fetch(hard_found_url)) if link_meta and is_url_present else None
+    local = await asyncio.to_thread(local_analysis, text, hard_found_url if is_url_present else "#")
+    meta = await await_link_meta(meta_task)
+    if local:
+        logger.info(f"🧮 Local classifier: {local['section']} ({local['confidence']}%), LLM skipped")
+        return apply_link_meta(local, meta)
+
     system_prompt = (
         "### ROLE: Galaxy Intelligence Core (Charismatic AI Assistant)\n\n"
         "### TASK: Analyze content and respond as a living assistant\n\n"
@@ -221,51 +545,78 @@ async def analyze_content_full_cycle(text, status_msg: types.Message):
     )
 
     user_prompt = f"ANALYZE:\n{text[:8000]}\nURL: {hard_found_url}"
-    
-    for model_name in AI_MODELS_QUEUE:
+    page = describe_link(meta)
+    if page:
+        user_prompt += f"\nPAGE (fetched from the URL):\n{page}"
+    messages = [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}]
+    observe_prompt("classify", messages)
+
+    async def attempt(model_name):
         short_model = model_name.split('/')[-1]
-        try:
-            await status_msg.edit_text(f"🧠 <i>Думаю через {short_model}...</i>", parse_mode=ParseMode.HTML)
-        except TelegramBadRequest: pass
+        if status_msg is not None:
+            try:
+                await status_msg.edit_text(f"🧠 <i>Думаю через {short_model}...</i>", parse_mode=ParseMode.HTML)
+            except TelegramBadRequest: pass
 
+        started = time.monotonic()
         try:
-            client = InferenceClient(model=model_name, token=HF_TOKEN)
-            response = await asyncio.wait_for(
-                asyncio.to_thread(
-                    client.chat_completion,
-                    messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}],
-                    max_tokens=4000, temperature=0.1
-                ), timeout=25.0
-            )
-            data = clean_and_parse_json(response.choices[0].message.content.strip())
-            
-            if data:
-                ai_url = data.get('url', '')
-                if str(ai_url).lower() in ["none", "missing", "", "#"]:
-                     data['url'] = hard_found_url if is_url_present else "#"
-                
-                for key in ['platform', 'prompt_body', 'alternative']:
-                    if data.get(key) in ['none', None]: data[key] = None
-                
-                if 'confidence' not in data: data['confidence'] = 100
-                return data
-            
+            answer, constrained = await classification_request(model_name, messages)
         except asyncio.TimeoutError:
-            try: await status_msg.edit_text(f"⚠️ <i>{short_model} завис. Переключаюсь...</i>", parse_mode=ParseMode.HTML)
-            except TelegramBadRequest: pass
-            continue
+            record_attempt("classify", model_name, "timeout", started)
+            if status_msg is not None:
+                try: await status_msg.edit_text(f"⚠️ <i>{short_model} завис. Переключаюсь...</i>", parse_mode=ParseMode.HTML)
+                except TelegramBadRequest: pass
+            return None
         except Exception:
-            await asyncio.sleep(1)
-            continue 
+            record_attempt("classify", model_name, "error", started)
+            raise
+
+        data, repaired = parse_json(answer, key="section")
+        if data is not None and not str(data.get('section') or '').strip():
+            data = None    # из обрывка не удалось достать даже раздел
+        MODEL_JSON_RESULTS.inc(
+            model=short_model, mode="schema" if constrained else "prompt",
+            result="failed" if data is None else "repaired" if repaired else "strict"
+        )
+        record_attempt("classify", model_name, "ok" if data else "parse_fail", started)
+        if not data:
+            return None
+        data['section'] = str(data['section']).strip().lower()
+
+        ai_url = data.get('url', '')
+        if str(ai_url).lower() in ["none", "missing", "", "#"]:
+             data['url'] = hard_found_url if is_url_present else "#"
+
+        for key in ['platform', 'prompt_body', 'alternative']:
+            if data.get(key) in ['none', None]: data[key] = None
+
+        if 'confidence' not in data: data['confidence'] = 100
+        return data
+
+    # Хеджирование: если первая модель тормозит, параллельно спрашиваем следующую
+    _, data = await hedged_cascade(
+        model_health.order(AI_MODELS_QUEUE), attempt, hedge_delay=HEDGE_DELAY or None, begin=model_health.begin_probe
+    )
+    if data:
+        apply_link_meta(data, meta)
+        class_cache.put(text, hard_found_url if is_url_present else None, data)
+        return data
 
-    return fallback_heuristic_analysis(text)
+    if not use_fallback:
+        return None
+    data = fallback_heuristic_analysis(text)
+    if meta and meta.get("title") and data['section'] != 'prompts':
+        # Название и описание со страницы лучше первой строки поста
+        data['name'] = meta['title'][:60]
+        data['desc'] = meta.get('description') or data['desc']
+    return apply_link_meta(data, meta)
 
 
 # --- 4. ГЕНЕРАЦИЯ HTML ---
 def generate_card_html(data):
     s = str(data.get('section', 'ai')).lower()
     name = html.escape(str(data.get('name', 'Resource')))
-    url = str(data.get('url', '#'))
+    url = normalize_url(str(data.get('url', '#')))
     desc = html.escape(str(data.get('desc', 'No description.')))
     p_body = str(data.get('prompt_body', '')).replace('</xmp>', '')
     platform = html.escape(str(data.get('platform', 'App')))
@@ -342,32 +693,177 @@ def generate_card_html(data):
 
 # --- 5. ЗАПИСЬ НА GITHUB ---
 
-def sync_push_to_github(data, force=False):
-    try:
-        repo = gh.get_repo(REPO_NAME)
-        branch = "main" 
-        contents = repo.get_contents(FILE_PATH, ref=branch)
-        html_content = contents.decoded_content.decode("utf-8")
+def missing_required_link(data):
+    """
+    Раздел требует прямую ссылку, а ее нет (или ИИ подставил ссылку на сам сайт).
+    """
+    section = str(data.get('section', 'ai')).lower()
+    url = str(data.get('url', ''))
+    is_no_link = section in ['prompts', 'ideas', 'shop', 'fun']
+    is_bad = (url in ["MISSING", "", "#", "None"] or "ygalaxyy" in url)
+    return not is_no_link and is_bad
 
-        target_url = data.get('url', '')
-        clean_target = normalize_url(target_url)
-        
-        if not force and clean_target and clean_target not in ["#", "MISSING", ""]:
-            if clean_target in html_content: return "DUPLICATE"
-            name = html.escape(str(data.get('name', '')))
-            if name and name in html_content: return "DUPLICATE"
+def find_duplicate(index, data):
+    for url in (data.get('url', ''), data.get('resolved_url', '')):
+        if str(url) in ["#", "MISSING", "", "None"]:
+            continue
+        found = index.find(url, data.get('name', ''))
+        if found:
+            return found
+    return None
 
-        sec_key = str(data.get('section', 'ai')).upper()
-        target_marker = f"<!-- INSERT_{sec_key}_HERE -->"
-        if target_marker not in html_content: return "MARKER_ERROR"
+def find_similar(data):
+    """
+    Самые похожие карточки базы [(косинус, {"section", "name", "url"}), ...] — не ниже NEAR_DUPLICATE_SIMILARITY.
+    """
+    prompt_body = str(data.get('prompt_body') or '')
+    card = Card(
+        str(data.get('section', 'ai')).lower(), name=str(data.get('name', '')), desc=str(data.get('desc', '')),
+        url=str(data.get('url', '')), prompt_body="" if prompt_body in ("none", "None") else prompt_body
+    )
+    return get_vector_store().nearest(card, NEAR_DUPLICATE_TOP_K, min_score=NEAR_DUPLICATE_SIMILARITY)
 
-        new_card = generate_card_html(data)
-        new_html = html_content.replace(target_marker, f"{new_card}\n{target_marker}")
+def plan_batch(docs, sites, batch):
+    """
+    Раскладывает пачку карточек по маркерам (маркер ищется во всех файлах: index.html или шард раздела).
+    Новый HTML каждого файла собирается за один проход (без цепочки str.replace).
+    Возвращает (результаты, {path: новый html}, {path: вставки}).
+    """
+    results = []
+    inserts = {}      # path -> [(pos, card_html, section)]
+    marker_paths = {}
+    for path, site in sites.items():
+        for section in site.markers:
+            marker_paths.setdefault(section, path)
+    dedup_index = get_dedup_index()
+    accepted = DedupIndex()  # карточки этой же пачки тоже участвуют в проверке дублей
+    for data, force in batch:
+        if not force and (find_duplicate(dedup_index, data) or find_duplicate(accepted, data)):
+            results.append("DUPLICATE")
+            continue
+        section = str(data.get('section', 'ai')).lower()
+        path = marker_paths.get(section)
+        if path is None:
+            results.append("MARKER_ERROR")
+            continue
+        pos = sites[path].marker_pos(section)
+        inserts.setdefault(path, []).append((pos, generate_card_html(data) + "\n", section))
+        accepted.add(Card(section, name=str(data.get('name', '')), url=str(data.get('url', ''))))
+        if data.get('resolved_url'):
+            accepted.add(Card(section, url=str(data['resolved_url'])))
+        results.append("OK")
 
-        repo.update_file(contents.path, f"Add: {data.get('name')} [{sec_key}] via GalaxyBot", new_html, contents.sha, branch)
-        return "OK"
-    except Exception as e:
-        return "GIT_ERROR"
+    new_docs = {}
+    for path, path_inserts in inserts.items():
+        html_content = docs[path]
+        path_inserts.sort(key=lambda item: item[0])
+        parts = []
+        prev = 0
+        for pos, card_html, _ in path_inserts:
+            parts.append(html_content[prev:pos])
+            parts.append(card_html)
+            prev = pos
+        parts.append(html_content[prev:])
+        new_docs[path] = "".join(parts)
+    return results, new_docs, inserts
+
+def batch_commit_message(batch, results):
+    added = [data for (data, _), res in zip(batch, results) if res == "OK"]
+    if len(added) == 1:
+        data = added[0]
+        return f"Add: {data.get('name')} [{str(data.get('section', 'ai')).upper()}] via GalaxyBot"
+    lines = [f"- {data.get('name')} [{str(data.get('section', 'ai')).upper()}]" for data in added]
+    return f"Add {len(added)} cards via GalaxyBot\n\n" + "\n".join(lines)
+
+def sync_push_to_github(batch):
+    started = time.perf_counter()
+    with memory.stage("github/push"):
+        results = _sync_push_to_github(batch)
+    GITHUB_PUSH_SECONDS.observe(time.perf_counter() - started)
+    for result in results:
+        GITHUB_PUSH_RESULTS.inc(result=result)
+    return results
+
+def _sync_push_to_github(batch):
+    """
+    Записывает пачку [(data, force), ...] одним коммитом через Git Data API
+    (blob -> tree -> commit -> ref). В шардированной раскладке в одном коммите меняются
+    только затронутые файлы разделов. Если ветку успели сдвинуть, перечитывает файлы,
+    заново раскладывает карточки и повторяет (оптимистичная блокировка).
+    """
+    from github import GithubException, InputGitTreeElement
+
+    branch = "main"
+    for attempt in range(COMMIT_RETRIES):
+        try:
+            repo = get_repo()
+            ref = repo.get_git_ref(f"heads/{branch}")
+            head_sha = ref.object.sha
+            # Перед записью обязательно сверяемся с GitHub (304 не тратит лимит)
+            docs = {path: html_content for path, (html_content, _) in site_store.get(max_age=0).items()}
+            sites = get_sites()
+
+            results, new_docs, inserts = plan_batch(docs, sites, batch)
+            if not new_docs:
+                return results
+
+            site_index = preview_site_index(inserts) if SEARCH_INDEX_PATH else None
+            head_commit = repo.get_git_commit(head_sha)
+            blobs = {path: repo.create_git_blob(new_html, "utf-8") for path, new_html in new_docs.items()}
+            elements = [InputGitTreeElement(path, "100644", "blob", sha=blob.sha) for path, blob in blobs.items()]
+            if site_index is not None:
+                # Индекс небольшой — передаем содержимым прямо в дереве, без лишнего вызова create_git_blob
+                elements.append(InputGitTreeElement(SEARCH_INDEX_PATH, "100644", "blob", content=site_index.to_json()))
+            tree = repo.create_git_tree(elements, base_tree=head_commit.tree)
+            commit = repo.create_git_commit(batch_commit_message(batch, results), tree, [head_commit])
+            ref.edit(commit.sha, force=False)
+        except GithubException as e:
+            if e.status in (409, 422):
+                # Ветку обновили между чтением и записью — перечитываем и накатываем заново
+                logger.warning(f"Commit conflict (attempt {attempt + 1}/{COMMIT_RETRIES}), rebasing batch")
+                site_store.invalidate()
+                time.sleep(0.5 * (attempt + 1))
+                continue
+            logger.error(f"GitHub push error: {e}")
+            site_store.invalidate()
+            return ["GIT_ERROR"] * len(batch)
+        except Exception as e:
+            logger.error(f"GitHub push error: {e}")
+            site_store.invalidate()
+            return ["GIT_ERROR"] * len(batch)
+
+        # Коммит прошел: обновляем кэш на месте (с конца, чтобы не сбить смещения)
+        with site_store.locked():
+            indexes = {key: site_store.peek(key) for key in ("search", "dedup", "sections")}
+            indexes = {key: index for key, index in indexes.items() if index is not None}
+            vectors_synced = vector_store.version == site_store.version()
+            # Хранилище векторов дописывается на месте, только если оно было сверено с этой же версией
+            targets = list(indexes.values()) + ([vector_store] if vectors_synced else [])
+            updates = {}
+            for path, path_inserts in inserts.items():
+                site = sites[path]
+                for pos, card_html, section in reversed(path_inserts):
+                    inserted = site.insert(pos, card_html, section)
+                    if inserted is not None:
+                        for index in targets:
+                            index.add(inserted)
+                updates[path] = (new_docs[path], blobs[path].sha, {"site": site})
+            if site_index is not None:
+                indexes["site_index"] = site_index    # карточки в него уже добавлены в порядке страницы
+            site_store.apply_local_update(updates, derived=indexes)
+            if vectors_synced:
+                vector_store.version = site_store.version()
+        added = sum(len(path_inserts) for path_inserts in inserts.values())
+        logger.info(f"📤 Committed {added} card(s) to {len(updates)} file(s) in {commit.sha[:7]}")
+        return results
+
+    logger.error("GitHub push error: too many commit conflicts")
+    return ["GIT_ERROR"] * len(batch)
+
+commit_queue = CommitQueue(sync_push_to_github, window=COMMIT_WINDOW, max_batch=COMMIT_BATCH_MAX)
+
+async def push_to_github(data, force=False):
+    return await commit_queue.submit(data, force)
 
 
 # --- 6. TELEGRAM HANDLERS ---
@@ -382,15 +878,25 @@ async def ask_database_handler(message: types.Message):
 
     await bot.send_chat_action(chat_id=message.chat.id, action="typing")
     status_msg = await message.answer("🔍 <i>Инициализация поиска по базе...</i>", parse_mode=ParseMode.HTML)
-    
-    # 1. Достаем базу знаний с сайта
-    db_context = await asyncio.to_thread(fetch_db_context)
+    jobs.enqueue("ask", "answer", {"query": query}, PRIORITY_ASK, chat_id=message.chat.id, message_id=status_msg.message_id)
+
+@jobs.stage("ask", "answer", retries=0)
+async def ask_job(job):
+    await answer_query(job.payload["query"], status_of(job))
+
+@jobs.on_failure("ask")
+async def ask_failed(job, error):
+    await status_of(job).edit_text("❌ Не получилось ответить. Попробуй переформулировать вопрос.")
+
+async def answer_query(query, status_msg):
+    # 1. Достаем из базы только релевантные карточки (BM25)
+    db_context, hits = await asyncio.to_thread(fetch_db_context, query)
     
     # 2. НОВЫЙ "ЖИВОЙ" ПРОМПТ ДЛЯ ПОИСКА (Строгий запрет Markdown, только HTML)
     system_prompt = (
         "Ты — Galaxy OS Assistant, живой, эрудированный и невероятно харизматичный ИИ-напарник.\n"
         "Твоя задача — помочь создателю, найдя ВСЕ подходящие инструменты или промпты в его личной базе знаний.\n\n"
-        "БАЗА ЗНАНИЙ СОЗДАТЕЛЯ:\n"
+        "БАЗА ЗНАНИЙ СОЗДАТЕЛЯ (самые релевантные записи, отобранные поиском):\n"
         f"{db_context}\n\n"
         "ПРАВИЛА ОТВЕТА (КРИТИЧЕСКИ ВАЖНО):\n"
         "1. Найди ВСЕ релевантные записи. Не ограничивайся одной!\n"
@@ -403,210 +909,486 @@ async def ask_database_handler(message: types.Message):
     )
     
     success = False
+    messages = [{"role": "system", "content": system_prompt}, {"role": "user", "content": query}]
+    observe_prompt("ask", messages)
     
     # 3. КАСКАД МОДЕЛЕЙ (Чтобы бот не падал, если HF перегружен)
-    for model_name in AI_MODELS_QUEUE:
+    for model_name in model_health.order(AI_MODELS_QUEUE):
+        if not model_health.begin_probe(model_name):
+            continue    # пробу этой модели уже занял другой запрос
         short_model = model_name.split('/')[-1]
         try:
             await status_msg.edit_text(f"🔍 <i>Сканирую базу через {short_model}...</i>", parse_mode=ParseMode.HTML)
         except TelegramBadRequest:
             pass # Игнорируем, если текст не изменился
             
+        started = time.monotonic()
+        stream = StreamingMessage(status_msg, min_interval=ASK_EDIT_INTERVAL)
         try:
-            client = InferenceClient(model=model_name, token=HF_TOKEN)
-            response = await asyncio.wait_for(
-                asyncio.to_thread(
-                    client.chat_completion,
-                    messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": query}],
-                    max_tokens=3000, 
-                    temperature=0.3
-                ), timeout=40.0 # Увеличил время ожидания до 40 сек
-            )
-            answer = response.choices[0].message.content.strip()
-            
-            # Отправляем ответ в HTML (самый безопасный вариант для Telegram)
-            try:
-                await status_msg.edit_text(answer, parse_mode=ParseMode.HTML, disable_web_page_preview=True)
-            except TelegramBadRequest as e:
-                # Если ИИ все же накосячил с HTML, отправляем голый текст без форматирования, чтобы не потерять ответ
-                logger.error(f"HTML Parse error: {e}")
-                await status_msg.edit_text(answer, disable_web_page_preview=True)
-            
-            success = True
-            break # Успешно ответили, выходим из цикла
-            
+            async with asyncio.timeout(ASK_TIMEOUT):
+                if ASK_STREAMING:
+                    async for delta in hf.stream_chat_completion(model_name, messages, max_tokens=3000, temperature=0.3):
+                        stream.feed(delta)
+                else:
+                    stream.feed(await hf.chat_completion(model_name, messages, max_tokens=3000, temperature=0.3, timeout=ASK_TIMEOUT))
         except asyncio.TimeoutError:
+            record_attempt("ask", model_name, "timeout", started)
             logger.warning(f"Timeout with {model_name} in /ask")
+            if stream.text.strip():
+                # Половина ответа лучше, чем начинать заново с другой моделью
+                await stream.finish("\n\n<i>⏳ Ответ оборван по таймауту.</i>")
+                success = True
+                break
             continue
         except Exception as e:
+            record_attempt("ask", model_name, "error", started)
             logger.error(f"Error with {model_name} in /ask: {e}")
+            if stream.text.strip():
+                await stream.finish("\n\n<i>⚠️ Ответ оборвался.</i>")
+                success = True
+                break
             continue
-            
+
+        if not stream.text.strip():
+            record_attempt("ask", model_name, "parse_fail", started)
+            continue
+        record_attempt("ask", model_name, "ok", started)
+        await stream.finish()
+        success = True
+        break # Успешно ответили, выходим из цикла
+
     if not success:
-        await status_msg.edit_text("❌ Все нейросети сейчас перегружены (Hugging Face не отвечает). База слишком большая, попробуй спросить через минуту.")
-
-# ... (Остальные хендлеры: process_category_selection, process_duplicate_decision, manual_link_handler остаются как были) ...
-@dp.callback_query(F.data.startswith("cat_"), ToolForm.select_category)
-async def process_category_selection(callback: types.CallbackQuery, state: FSMContext):
-    selected_cat = callback.data.split("_")[1]
-    state_data = await state.get_data()
-    tool_data = state_data.get('tool_data')
-    if not tool_data:
+        if hits:
+            # Нейросети лежат, но локальный поиск работает — отдаем ранжированную выдачу
+            await status_msg.edit_text(
+                f"🔎 <i>Нейросети сейчас недоступны, вот что нашлось в базе:</i>\n\n{format_search_results(hits)}",
+                parse_mode=ParseMode.HTML, disable_web_page_preview=True
+            )
+        else:
+            await status_msg.edit_text("❌ Все нейросети сейчас перегружены (Hugging Face не отвечает), а локальный поиск ничего не нашел. Попробуй переформулировать вопрос.")
+
+@dp.message(F.text == '/stats')
+async def stats_handler(message: types.Message):
+    cache = class_cache.stats()
+    lines = [
+        "📊 <b>Кэш классификации</b>",
+        f"Записей: {cache['entries']}",
+        f"Попаданий: {cache['hits']} / промахов: {cache['misses']} (с момента запуска)",
+        f"Всего сэкономлено вызовов HF: {cache['total_hits']}",
+    ]
+    if link_meta is not None:
+        lines.append(f"Метаданные ссылок: из кэша {link_meta.cache.hits}, загружено {link_meta.cache.misses}")
+    lines += [
+        "",
+        "🧠 <b>Модели</b>",
+    ]
+    for model, stats in model_health.snapshot().items():
+        lines.append(
+            f"{model.split('/')[-1]}: {stats['state']}, ~{stats['latency']:.1f}s, "
+            f"ошибки {stats['error_rate']:.0%}, битый JSON {stats['parse_fail_rate']:.0%}"
+        )
+    lines += ["", f"🧬 <b>Векторы</b>: {len(vector_store)} карточек ({vector_store.embedder.name})"]
+    queue = jobs.counts()
+    lines += ["", f"📥 <b>Очередь</b>: ждут {queue.get('queued', 0)}, в работе {queue.get('running', 0)}, "
+                  f"ждут ответа {queue.get('waiting', 0)}, провалено {queue.get('failed', 0)}"]
+    budget = f" из {MEMORY_BUDGET_MB:.0f}" if MEMORY_BUDGET_MB else ""
+    paused = ", фоновые задачи на паузе" if jobs.background_paused else ""
+    lines.append(f"💾 <b>Память</b>: {rss_bytes() / 2 ** 20:.0f}{budget} MB{paused}")
+    await message.answer("\n".join(lines), parse_mode=ParseMode.HTML)
+
+# --- 7. ФОНОВЫЕ ЗАДАЧИ: СОХРАНЕНИЕ ПОСТА ---
+# Хендлеры только ставят задачу в очередь; стадии ниже выполняются воркерами jobs
+# и сообщают о ходе дела, редактируя статусное сообщение.
+
+def status_of(job):
+    return MessageRef(bot, job.chat_id, job.message_id)
+
+def job_keyboard(job, buttons):
+    """
+    buttons — строки кнопок [(текст, действие), ...]; id задачи зашит в callback_data,
+    поэтому кнопка продолжает нужную задачу даже после рестарта.
+    """
+    return types.InlineKeyboardMarkup(inline_keyboard=[
+        [types.InlineKeyboardButton(text=text, callback_data=f"{action}:{job.id}") for text, action in row]
+        for row in buttons
+    ])
+
+def duplicate_keyboard(job):
+    return job_keyboard(job, [[("✅ Добавить", "dup_yes")], [("❌ Отмена", "dup_no")]])
+
+def duplicate_prompt(similar, exact=False):
+    lines = ["⚠️ Ссылка или название уже есть в базе." if exact else "🔁 <b>Похоже, это уже есть в базе:</b>"]
+    for score, match in similar:
+        name = html.escape(match['name'] or 'Без названия')
+        url = match['url'] or ''
+        if url.startswith(('http://', 'https://')):
+            name = f'<a href="{html.escape(url)}">{name}</a>'
+        lines.append(f"• {name} [{(match['section'] or '').upper()}] — {score:.0%}")
+    lines.append("Дублировать?")
+    return "\n".join(lines)
+
+async def similar_cards(data):
+    """
+    find_similar в потоке; проверка совета ради, поэтому сбой (GitHub недоступен) не валит задачу.
+    """
+    try:
+        return await asyncio.to_thread(find_similar, data)
+    except Exception as e:
+        logger.warning(f"Near-duplicate search failed: {e}")
+        return []
+
+@jobs.stage("ingest", "analyze", retries=JOB_RETRIES)
+async def ingest_analyze(job):
+    status_msg = status_of(job)
+    try:
+        await status_msg.edit_text("🌌 <i>Инициализация сканирования...</i>", parse_mode=ParseMode.HTML)
+    except TelegramBadRequest:
+        pass
+    data = await analyze_content_full_cycle(job.payload["content"], status_msg)
+    if not data:
+        raise RuntimeError("analysis returned nothing")
+    job.payload["data"] = data
+    return "route"
+
+@jobs.stage("ingest", "route")
+async def ingest_route(job):
+    data = job.payload["data"]
+    status_msg = status_of(job)
+    section = str(data.get('section', 'ai')).lower()
+    bot_reply = data.get('reply_text', f"🚀 Готовлю деплой {data.get('name', 'Unknown')}...")
+
+    # --- НОВАЯ ФИЧА: ОБЫЧНЫЙ ЧАТ ---
+    # Если ИИ понял, что это просто разговор или вопрос без тега /ask
+    if section == 'chat':
+        await status_msg.edit_text(f"💬 {bot_reply}\n\n<i>💡 P.S. Если хочешь найти что-то в сохраненной базе, используй команду <b>/ask [твой вопрос]</b> или начни сообщение с вопроса (?).</i>", parse_mode=ParseMode.HTML)
+        return None
+
+    confidence = data.get('confidence', 100)
+    alt_section = data.get('alternative')
+    name = data.get('name', 'Unknown')
+
+    if confidence < 80 and alt_section and alt_section != section:
+        keyboard = job_keyboard(job, [
+            [(f"📂 {section.upper()}", f"cat_{section}"), (f"📂 {alt_section.upper()}", f"cat_{alt_section}")],
+            [("❌ Отмена", "dup_no")]
+        ])
+        await status_msg.edit_text(f"🤔 <b>Сомнения</b> ({confidence}%)\nОбъект: <b>{name}</b>\n{bot_reply}", reply_markup=keyboard, parse_mode=ParseMode.HTML)
+        return WAIT
+
+    if missing_required_link(data):
+        job.payload["waiting_for"] = "link"
+        await wait_for_link(job)
+        await status_msg.edit_text(f"🧐 <b>{name}</b> [{section.upper()}]\n💬 {bot_reply}\n⚠️ Пришли прямую ссылку на ресурс.", parse_mode=ParseMode.HTML)
+        return WAIT
+
+    return "similar"
+
+@jobs.stage("ingest", "similar")
+async def ingest_similar(job):
+    """
+    Та же вещь могла прийти с другой ссылкой или другим названием: точная проверка в plan_batch
+    ее не поймает, поэтому перед пушем ищем близкие карточки по эмбеддингам.
+    """
+    data = job.payload["data"]
+    status_msg = status_of(job)
+    similar = await similar_cards(data) if not job.payload.get("force") else []
+    NEAR_DUPLICATES.inc(outcome="prompted" if similar else "clear")
+    if similar:
+        await status_msg.edit_text(duplicate_prompt(similar), reply_markup=duplicate_keyboard(job), parse_mode=ParseMode.HTML)
+        return WAIT
+    bot_reply = data.get('reply_text', f"🚀 Готовлю деплой {data.get('name', 'Unknown')}...")
+    await status_msg.edit_text(f"💬 {bot_reply}\n⚙️ <i>Пушу на GitHub...</i>", parse_mode=ParseMode.HTML)
+    return "push"
+
+@jobs.stage("ingest", "push", retries=JOB_RETRIES)
+async def ingest_push(job):
+    data = job.payload["data"]
+    status_msg = status_of(job)
+    name = data.get('name', 'Unknown')
+    bot_reply = data.get('reply_text', '')
+    result = await push_to_github(data, force=job.payload.get("force", False))
+
+    if result == "OK":
+        await status_msg.edit_text(f"✅ <b>{name}</b>\n\n💬 {bot_reply}\n<i>Успешно загружено в базу!</i>", parse_mode=ParseMode.HTML)
+        return None
+    if result == "DUPLICATE":
+        similar = await similar_cards(data)
+        await status_msg.edit_text(duplicate_prompt(similar, exact=True), reply_markup=duplicate_keyboard(job), parse_mode=ParseMode.HTML)
+        return WAIT
+    if result == "MARKER_ERROR":
+        await status_msg.edit_text(f"❌ Нет метки HTML для раздела {str(data.get('section', '')).upper()}.")
+        return None
+    # GIT_ERROR: GitHub недоступен — стадия повторится с паузой
+    try:
+        await status_msg.edit_text(f"⏳ <i>GitHub не отвечает, повторю попытку...</i>", parse_mode=ParseMode.HTML)
+    except TelegramBadRequest:
+        pass
+    raise RuntimeError(f"push failed: {result}")
+
+@jobs.on_failure("ingest")
+async def ingest_failed(job, error):
+    text = "❌ Ошибка API GitHub." if job.stage == "push" else "❌ Критическая ошибка анализа."
+    await status_of(job).edit_text(text)
+
+async def wait_for_link(job):
+    """
+    Переводит пользователя в ToolForm.wait_link для этой задачи. Если он уже ждал ссылку
+    для другой задачи (пачка пересланных постов), та отменяется: ответ ушел бы не туда.
+    """
+    state = dp.fsm.get_context(bot=bot, chat_id=job.chat_id, user_id=job.user_id)
+    previous = (await state.get_data()).get("job_id")
+    if previous and previous != job.id and jobs.cancel(previous):
+        stale = jobs.get(previous)
+        try:
+            await status_of(stale).edit_text("❌ Данные устарели: ссылку жду для следующего поста.")
+        except TelegramBadRequest:
+            pass
+    await state.set_state(ToolForm.wait_link)
+    await state.set_data({"job_id": job.id})
+
+async def restore_followups():
+    """
+    FSM живет в памяти: после рестарта заново ставим wait_link тем, чья задача ждет ссылку.
+    Кнопкам восстановление не нужно — id задачи у них в callback_data.
+    """
+    for job in jobs.waiting():
+        if job.payload.get("waiting_for") == "link" and job.user_id:
+            await wait_for_link(job)
+
+def waiting_job(callback_data):
+    """
+    "cat_ai:17" -> ("cat_ai", Job 17), если задача все еще ждет ответа; иначе (действие, None).
+    """
+    action, _, job_id = callback_data.partition(":")
+    job = jobs.get(int(job_id)) if job_id.isdigit() else None
+    return action, job if job is not None and job.state == WAITING else None
+
+
+# --- 8. FSM: ОТВЕТЫ ПОЛЬЗОВАТЕЛЯ ПРОДОЛЖАЮТ ЗАДАЧУ ---
+@dp.callback_query(F.data.startswith("cat_"))
+async def process_category_selection(callback: types.CallbackQuery):
+    action, job = waiting_job(callback.data)
+    if job is None:
+        await callback.message.edit_text("❌ Данные устарели.")
+        return
+    selected_cat = action.split("_", 1)[1]
+    job.payload["data"]['section'] = selected_cat
+    job.message_id = callback.message.message_id
+    # Сначала resume: между чтением задачи и ответом ее могли отменить или уже продолжить
+    if not jobs.resume(job, "similar", priority=PRIORITY_FOLLOWUP):
         await callback.message.edit_text("❌ Данные устарели.")
-        await state.clear()
         return
-    tool_data['section'] = selected_cat
     await callback.message.edit_text(f"👌 Выбрано: **{selected_cat.upper()}**. Деплою...")
-    result = await asyncio.to_thread(sync_push_to_github, tool_data)
-    if result == "OK": await callback.message.edit_text(f"✅ Добавлено в `{selected_cat.upper()}`!")
-    else: await callback.message.edit_text(f"❌ Ошибка (код: {result}).")
-    await state.clear()
 
-@dp.callback_query(F.data.in_({"dup_yes", "dup_no"}), ToolForm.confirm_duplicate)
-async def process_duplicate_decision(callback: types.CallbackQuery, state: FSMContext):
-    state_data = await state.get_data()
-    tool_data = state_data.get('tool_data')
-    if not tool_data:
+@dp.callback_query(F.data.startswith("dup_"))
+async def process_duplicate_decision(callback: types.CallbackQuery):
+    action, job = waiting_job(callback.data)
+    if job is None:
         await callback.message.edit_text("❌ Данные устарели.")
-        await state.clear()
         return
-    if callback.data == "dup_no":
+    if action == "dup_no":
+        if not jobs.cancel(job.id):
+            await callback.message.edit_text("❌ Данные устарели.")
+            return
         await callback.message.edit_text("🙅‍♂️ Отмена.")
-        await state.clear()
     else:
+        job.payload["force"] = True
+        job.message_id = callback.message.message_id
+        if not jobs.resume(job, "push", priority=PRIORITY_FOLLOWUP):
+            await callback.message.edit_text("❌ Данные устарели.")
+            return
         await callback.message.edit_text("🚀 Force Push...")
-        result = await asyncio.to_thread(sync_push_to_github, tool_data, force=True)
-        if result == "OK": await callback.message.edit_text(f"✅ Добавлено (Force)!")
-        else: await callback.message.edit_text(f"❌ Ошибка.")
-        await state.clear()
 
 @dp.message(ToolForm.wait_link)
 async def manual_link_handler(message: types.Message, state: FSMContext):
-    state_data = await state.get_data()
-    if 'tool_data' not in state_data:
+    job_id = (await state.get_data()).get("job_id")
+    job = jobs.get(job_id) if job_id else None
+    await state.clear()
+    if job is None or job.state != WAITING:
         await message.answer("❌ Данные потеряны (Бот перезагрузился).")
-        await state.clear()
         return
     user_link = message.text.strip()
-    tool_data = state_data['tool_data']
+    tool_data = job.payload["data"]
     tool_data['url'] = "#" if user_link == "#" else user_link
+    job.payload.pop("waiting_for", None)
+    # Статусное сообщение нужно до resume: задача продолжит писать в него
     status = await message.answer(f"🔗 Ссылка принята. Деплою **{tool_data['name']}**...")
-    result = await asyncio.to_thread(sync_push_to_github, tool_data)
-    if result == "OK":
-        await status.edit_text(f"✅ **{tool_data['name']}** успешно добавлен!")
-        await state.clear()
-    elif result == "DUPLICATE":
-        keyboard = types.InlineKeyboardMarkup(inline_keyboard=[
-            [types.InlineKeyboardButton(text="✅ Добавить", callback_data="dup_yes")],
-            [types.InlineKeyboardButton(text="❌ Отмена", callback_data="dup_no")]
-        ])
-        await state.update_data(tool_data=tool_data)
-        await state.set_state(ToolForm.confirm_duplicate)
-        await status.edit_text(f"⚠️ Дубликат! Добавить?", reply_markup=keyboard)
-    else:
-        await status.edit_text(f"❌ Ошибка.")
-        await state.clear()
-
-@dp.message(StateFilter(None), F.text | F.caption)
-async def main_content_handler(message: types.Message, state: FSMContext):
-    try:
-        content = message.text or message.caption or ""
-        
-        if re.match(r'^https?://\S+$', content.strip()):
-            await message.reply("⚠️ Это просто ссылка. Если это дополнение к посту, то я потерял контекст. Пожалуйста, отправь пост целиком.")
-            return
-
-        if len(content.strip()) < 5: return
-
-        await bot.send_chat_action(chat_id=message.chat.id, action="typing")
-        status_msg = await message.answer("🌌 <i>Инициализация сканирования...</i>", parse_mode=ParseMode.HTML)
-        
-        data = await analyze_content_full_cycle(content, status_msg)
-
-        if not data:
-            await status_msg.edit_text("❌ Критическая ошибка анализа.")
-            return
+    job.message_id = status.message_id
+    if not jobs.resume(job, "similar", priority=PRIORITY_FOLLOWUP):
+        await status.edit_text("❌ Данные устарели.")
 
-        section = str(data.get('section', 'ai')).lower()
-        bot_reply = data.get('reply_text', f"🚀 Готовлю деплой {data.get('name', 'Unknown')}...")
-        
-        # --- НОВАЯ ФИЧА: ОБЫЧНЫЙ ЧАТ ---
-        # Если ИИ понял, что это просто разговор или вопрос без тега /ask
-        if section == 'chat':
-            await status_msg.edit_text(f"💬 {bot_reply}\n\n<i>💡 P.S. Если хочешь найти что-то в сохраненной базе, используй команду <b>/ask [твой вопрос]</b> или начни сообщение с вопроса (?).</i>", parse_mode=ParseMode.HTML)
-            return
+async def ingest_post(messages):
+    """
+    Пост целиком — одно сообщение или склеенные части (альбом, пересылка, текст и ссылка следом) —
+    одна задача ingest и один разбор.
+    """
+    content = "\n\n".join(dict.fromkeys(text for text in map(message_text, messages) if text))
+    POST_PARTS.inc(len(messages), outcome="merged" if len(messages) > 1 else "single")
+    if len(content) < 5: return
 
-        confidence = data.get('confidence', 100)
-        alt_section = data.get('alternative')
-        name = data.get('name', 'Unknown')
-        url = str(data.get('url', ''))
-        
-        if confidence < 80 and alt_section and alt_section != section:
-            keyboard = types.InlineKeyboardMarkup(inline_keyboard=[
-                [
-                    types.InlineKeyboardButton(text=f"📂 {section.upper()}", callback_data=f"cat_{section}"),
-                    types.InlineKeyboardButton(text=f"📂 {alt_section.upper()}", callback_data=f"cat_{alt_section}")
-                ],
-                [types.InlineKeyboardButton(text="❌ Отмена", callback_data="dup_no")]
-            ])
-            await state.update_data(tool_data=data)
-            await state.set_state(ToolForm.select_category)
-            await status_msg.edit_text(f"🤔 <b>Сомнения</b> ({confidence}%)\nОбъект: <b>{name}</b>\n{bot_reply}", reply_markup=keyboard, parse_mode=ParseMode.HTML)
-            return
+    first = messages[0]
+    await bot.send_chat_action(chat_id=first.chat.id, action="typing")
+    status_msg = await first.answer("🌌 <i>В очереди на сканирование...</i>", parse_mode=ParseMode.HTML)
+    jobs.enqueue(
+        "ingest", "analyze", {"content": content}, PRIORITY_INGEST,
+        chat_id=first.chat.id, user_id=first.from_user.id, message_id=status_msg.message_id
+    )
 
-        is_no_link = section in ['prompts', 'ideas', 'shop', 'fun']
-        is_bad = (url in ["MISSING", "", "#", "None"] or "ygalaxyy" in url)
+post_bursts = BurstAggregator(ingest_post, window=BURST_WINDOW, max_window=BURST_MAX_WINDOW)
 
-        if not is_no_link and is_bad:
-            await state.update_data(tool_data=data)
-            await state.set_state(ToolForm.wait_link)
-            await status_msg.edit_text(f"🧐 <b>{name}</b> [{section.upper()}]\n💬 {bot_reply}\n⚠️ Пришли прямую ссылку на ресурс.", parse_mode=ParseMode.HTML)
-        else:
-            await status_msg.edit_text(f"💬 {bot_reply}\n⚙️ <i>Пушу на GitHub...</i>", parse_mode=ParseMode.HTML)
-            result = await asyncio.to_thread(sync_push_to_github, data)
-            
-            if result == "OK": 
-                await status_msg.edit_text(f"✅ <b>{name}</b>\n\n💬 {bot_reply}\n<i>Успешно загружено в базу!</i>", parse_mode=ParseMode.HTML)
-            elif result == "DUPLICATE":
-                keyboard = types.InlineKeyboardMarkup(inline_keyboard=[
-                    [types.InlineKeyboardButton(text="✅ Добавить", callback_data="dup_yes")],
-                    [types.InlineKeyboardButton(text="❌ Отмена", callback_data="dup_no")]
-                ])
-                await state.update_data(tool_data=data)
-                await state.set_state(ToolForm.confirm_duplicate)
-                await status_msg.edit_text(f"⚠️ Ссылка или название уже есть в базе. Дублировать?", reply_markup=keyboard)
-            elif result == "MARKER_ERROR": 
-                await status_msg.edit_text(f"❌ Нет метки HTML для раздела {section.upper()}.")
-            else: 
-                await status_msg.edit_text("❌ Ошибка API GitHub.")
+@dp.message(StateFilter(None), F.text | F.caption)
+async def main_content_handler(message: types.Message, state: FSMContext):
+    try:
+        # Метаданные ссылки грузятся уже сейчас, пока собираются остальные части поста и пост ждет воркера
+        prefetch_link(message.text or message.caption or "")
+        await post_bursts.add(message)
 
     except Exception as e:
         logger.error(f"CRITICAL HANDLER ERROR: {e}")
-    finally:
-        gc.collect()
 
 # --- WEB SERVER ---
 async def health_check(request):
     return web.Response(text="Galaxy Bot is Alive!")
 
-async def start_web_server():
+async def metrics_handler(request):
+    return web.Response(
+        body=render_metrics().encode("utf-8"), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+    )
+
+async def memory_handler(request):
+    """
+    Замеры памяти по стадиям и топ аллокаций tracemalloc. Только при MEMORY_SAMPLING/MEMORY_BUDGET_MB.
+    """
+    if not memory.enabled:
+        raise web.HTTPNotFound()
+    top = int(request.query["top"]) if request.query.get("top", "").isdigit() else 15
+    return web.json_response(await asyncio.to_thread(memory.snapshot, top))
+
+async def healthz_handler(request):
+    """
+    degraded — все автоматы моделей разомкнуты: бот жив, но отвечает только эвристикой и поиском.
+    Код 200 в обоих случаях, чтобы хостинг не перезапускал процесс из-за сбоя на стороне HF.
+    """
+    models = {model: stats["state"] for model, stats in model_health.snapshot().items()}
+    degraded = model_health.all_open(AI_MODELS_QUEUE)
+    return web.json_response({
+        "status": "degraded" if degraded else "ok",
+        "models": models,
+        "fallback_heuristic_total": FALLBACK_HEURISTIC.value(),
+    })
+
+async def start_web_server(webhook=None):
     port = int(os.environ.get("PORT", 8080))
     app = web.Application()
     app.router.add_get('/', health_check)
+    app.router.add_get('/healthz', healthz_handler)
+    app.router.add_get('/metrics', metrics_handler)
+    app.router.add_get('/debug/memory', memory_handler)
+    if webhook is not None:
+        app.router.add_post(WEBHOOK_PATH, webhook.handle)
     runner = web.AppRunner(app)
     await runner.setup()
     site = web.TCPSite(runner, '0.0.0.0', port)
     await site.start()
     logger.info(f"🌍 Web server started on port {port}")
+    return runner
+
+async def run_webhook():
+    """
+    Апдейты приходят на тот же aiohttp-сервер. Вебхук при остановке не снимается:
+    пока процесс спит, Telegram копит апдейты и будит сервис первым же запросом.
+    """
+    if not WEBHOOK_URL:
+        raise RuntimeError("BOT_MODE=webhook requires WEBHOOK_URL")
+    webhook = WebhookReceiver(
+        dp, bot, WEBHOOK_SECRET or derive_secret(TG_TOKEN), workers=WEBHOOK_WORKERS, queue_size=WEBHOOK_QUEUE
+    )
+    Gauge("galaxy_webhook_queue_depth", "Updates accepted but not yet handled", collect=lambda: {(): webhook.queue.qsize()})
+    webhook.start()
+    runner = await start_web_server(webhook)
+    try:
+        await bot.set_webhook(
+            f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+            secret_token=webhook.secret,
+            drop_pending_updates=DROP_PENDING_UPDATES,
+            allowed_updates=dp.resolve_used_update_types(),
+            max_connections=max(WEBHOOK_WORKERS, 1) * 2,
+        )
+        logger.info(f"🪝 Webhook set, {WEBHOOK_WORKERS} worker(s), pending updates {'dropped' if DROP_PENDING_UPDATES else 'replayed'}")
+        await asyncio.Event().wait()
+    finally:
+        await webhook.stop()
+        await runner.cleanup()
+        await bot.session.close()
+
+def restore_warm_state():
+    """
+    Поднимает сайт и индексы из локального снапшота: первый /ask после рестарта не ждет GitHub.
+    """
+    if not WARM_STATE_PATH:
+        return False
+    return site_store.load_snapshot(WARM_STATE_PATH, meta=WARM_STATE_META)
+
+def save_warm_state():
+    if WARM_STATE_PATH and site_store.snapshot_is_stale():
+        if site_store.save_snapshot(WARM_STATE_PATH, meta=WARM_STATE_META):
+            logger.info("💾 Warm state saved")
+
+def warm_up():
+    """
+    Фоновая сверка с GitHub и сборка индексов (после снапшота — почти всегда один 304/листинг).
+    """
+    try:
+        with memory.stage("warm_up"):
+            site_store.refresh()
+            get_search_index()
+            get_dedup_index()
+            get_section_model()
+            get_site_index()
+            get_vector_store()
+            save_warm_state()
+    except Exception as e:
+        logger.warning(f"Warm-up failed, will load on demand: {e}")
+
+async def warm_state_saver():
+    while True:
+        await asyncio.sleep(WARM_STATE_INTERVAL)
+        await asyncio.to_thread(save_warm_state)
 
 async def main():
     logger.info("🚀 GALAXY INTELLIGENCE BOT ONLINE")
-    await start_web_server()
-    await bot.delete_webhook(drop_pending_updates=True)
+    memory.start()
+    restore_warm_state()
+    pending = jobs.recover()
+    if pending:
+        logger.info(f"📥 Resuming {pending} queued job(s)")
+    await restore_followups()
+    jobs.start()
+    background = [asyncio.create_task(asyncio.to_thread(warm_up))]
+    if MEMORY_BUDGET_MB:
+        background.append(asyncio.create_task(memory.watch()))
+    if WARM_STATE_PATH:
+        background.append(asyncio.create_task(warm_state_saver()))
     try:
-        await dp.start_polling(bot)
+        if BOT_MODE == "webhook":
+            await run_webhook()
+        else:
+            await start_web_server()
+            await bot.delete_webhook(drop_pending_updates=DROP_PENDING_UPDATES)
+            await dp.start_polling(bot)
     except Exception as e:
-        logger.error(f"Polling error: {e}")
+        logger.error(f"{BOT_MODE.capitalize()} error: {e}")
+    finally:
+        for task in background:
+            task.cancel()
+        await post_bursts.flush()
+        await jobs.stop()
+        await commit_queue.flush()
+        model_health.save()
+        save_warm_state()
+        await hf.close()
+        if link_meta is not None:
+            await link_meta.close()
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,245 @@
+import gc
+import os
+import asyncio
+import time
+import ctypes
+import logging
+import resource
+import threading
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+from copy import copy
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.memory import MemoryStorage, MemoryStorageRecord
+
+logger = logging.getLogger(__name__)
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_bytes():
+    """
+    Текущий RSS процесса (Linux: /proc/self/statm); где его нет — пиковый.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+
+def _malloc_trim():
+    """
+    Отдает ОС свободные страницы кучи glibc: после gc.collect RSS сам по себе почти не падает.
+    """
+    try:
+        return bool(ctypes.CDLL("libc.so.6").malloc_trim(0))
+    except (OSError, AttributeError):
+        return False
+
+
+class StageStats:
+    __slots__ = ("count", "seconds", "rss_max", "rss_growth_max", "traced_peak_max")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.rss_max = 0
+        self.rss_growth_max = 0
+        self.traced_peak_max = 0
+
+    def as_dict(self):
+        report = {
+            "count": self.count,
+            "avg_ms": round(self.seconds / self.count * 1000, 1) if self.count else 0.0,
+            "rss_max_mb": round(self.rss_max / 2 ** 20, 1),
+            "rss_growth_max_mb": round(self.rss_growth_max / 2 ** 20, 2),
+        }
+        if self.traced_peak_max:
+            report["traced_peak_max_mb"] = round(self.traced_peak_max / 2 ** 20, 2)
+        return report
+
+
+class MemoryMonitor:
+    """
+    Замеры памяти по стадиям конвейера и бюджет RSS.
+    sampling — RSS до и после каждой стадии (stage()); tracemalloc_frames > 0 — еще и пик
+    питоновских аллокаций за стадию и топ мест аллокаций в snapshot(). Стадии идут параллельно,
+    поэтому цифры стадии — верхняя оценка: в них попадает и то, что выделили соседи.
+    budget_mb > 0 — после стадии, вышедшей за бюджет, одна сборка мусора и malloc_trim
+    (не чаще relief_interval), затем on_pressure(True/False) — например, придержать фоновые задачи.
+    Пока фоновые задачи стоят, стадий мало, поэтому бюджет дополнительно проверяет watch().
+    Без sampling и бюджета stage() ничего не делает.
+    """
+
+    def __init__(self, sampling=False, tracemalloc_frames=0, budget_mb=0, relief_interval=10.0):
+        self.sampling = sampling
+        self.tracemalloc_frames = tracemalloc_frames
+        self.budget = int(budget_mb * 2 ** 20)
+        self.relief_interval = relief_interval
+        self.over_budget = False
+        self.reliefs = 0
+        self.stages = {}
+        self._pressure_hooks = []
+        self._active = 0
+        self._relieved_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.sampling or self.budget > 0
+
+    def start(self):
+        if self.tracemalloc_frames and not tracemalloc.is_tracing():
+            tracemalloc.start(self.tracemalloc_frames)
+
+    def on_pressure(self, fn):
+        self._pressure_hooks.append(fn)
+        return fn
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        tracing = tracemalloc.is_tracing()
+        with self._lock:
+            if tracing and not self._active:
+                tracemalloc.reset_peak()
+            self._active += 1
+        before = rss_bytes()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            after = rss_bytes()
+            with self._lock:
+                self._active -= 1
+                stats = self.stages.get(name)
+                if stats is None:
+                    stats = self.stages[name] = StageStats()
+                stats.count += 1
+                stats.seconds += elapsed
+                stats.rss_max = max(stats.rss_max, after)
+                stats.rss_growth_max = max(stats.rss_growth_max, after - before)
+                if tracing:
+                    stats.traced_peak_max = max(stats.traced_peak_max, tracemalloc.get_traced_memory()[1])
+            self.check_budget(after)
+
+    def check_budget(self, rss=None):
+        if not self.budget:
+            return
+        rss = rss_bytes() if rss is None else rss
+        if rss <= self.budget:
+            if self.over_budget:
+                self._set_pressure(False)
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._relieved_at < self.relief_interval:
+                return
+            self._relieved_at = now
+            self.reliefs += 1
+        gc.collect()
+        _malloc_trim()
+        after = rss_bytes()
+        logger.warning(
+            f"🧠 Memory budget exceeded: {rss / 2 ** 20:.0f} MB > {self.budget / 2 ** 20:.0f} MB, "
+            f"after GC {after / 2 ** 20:.0f} MB"
+        )
+        self._set_pressure(after > self.budget)
+
+    async def watch(self, interval=10.0):
+        while True:
+            await asyncio.sleep(interval)
+            self.check_budget()
+
+    def _set_pressure(self, over):
+        if over == self.over_budget:
+            return
+        self.over_budget = over
+        for hook in self._pressure_hooks:
+            try:
+                hook(over)
+            except Exception as e:
+                logger.error(f"Memory pressure hook failed: {e}")
+
+    def snapshot(self, top=15):
+        with self._lock:
+            stages = {name: stats.as_dict() for name, stats in sorted(self.stages.items())}
+        report = {
+            "rss_mb": round(rss_bytes() / 2 ** 20, 1),
+            "peak_rss_mb": round(peak_rss_bytes() / 2 ** 20, 1),
+            "budget_mb": round(self.budget / 2 ** 20) if self.budget else None,
+            "over_budget": self.over_budget,
+            "reliefs": self.reliefs,
+            "gc_counts": gc.get_count(),
+            "stages": stages,
+        }
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            report["traced_mb"] = round(current / 2 ** 20, 2)
+            report["traced_peak_mb"] = round(peak / 2 ** 20, 2)
+            report["top_allocations"] = [
+                {"where": str(stat.traceback[0]), "kb": round(stat.size / 1024, 1), "blocks": stat.count}
+                for stat in tracemalloc.take_snapshot().statistics("lineno")[:top]
+            ]
+        return report
+
+
+class BoundedMemoryStorage(MemoryStorage):
+    """
+    MemoryStorage, который не растет с каждым написавшим: чтение состояния не создает запись,
+    пустые записи (нет состояния и данных) удаляются, сверх max_keys вытесняются самые старые.
+    """
+
+    def __init__(self, max_keys=10000):
+        super().__init__()
+        self.max_keys = max_keys
+        self.storage = OrderedDict()
+
+    def _record(self, key):
+        record = self.storage.get(key)
+        if record is None:
+            record = self.storage[key] = MemoryStorageRecord()
+            while len(self.storage) > self.max_keys:
+                self.storage.popitem(last=False)
+        else:
+            self.storage.move_to_end(key)
+        return record
+
+    def _drop_if_empty(self, key):
+        record = self.storage.get(key)
+        if record is not None and record.state is None and not record.data:
+            del self.storage[key]
+
+    async def set_state(self, key, state=None):
+        self._record(key).state = state.state if isinstance(state, State) else state
+        self._drop_if_empty(key)
+
+    async def get_state(self, key):
+        record = self.storage.get(key)
+        return record.state if record is not None else None
+
+    async def set_data(self, key, data):
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(f"Data must be a dict or dict-like object, got {type(data).__name__}")
+        self._record(key).data = data.copy()
+        self._drop_if_empty(key)
+
+    async def get_data(self, key):
+        record = self.storage.get(key)
+        return record.data.copy() if record is not None else {}
+
+    async def get_value(self, storage_key, dict_key, default=None):
+        record = self.storage.get(storage_key)
+        return copy(record.data.get(dict_key, default)) if record is not None else default
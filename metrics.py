@@ -0,0 +1,193 @@
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+# Границы бакетов по умолчанию (секунды): от быстрых кэшей до зависших моделей
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 60.0)
+SIZE_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in (*zip(names, values), *extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
+
+
+class Gauge(_Metric):
+    """
+    Значение считается в момент выдачи: collect() возвращает {(значения меток): число}.
+    """
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labels=(), collect=None):
+        super().__init__(name, help_text, labels)
+        self.collect = collect
+
+    def _samples(self):
+        if self.collect is not None:
+            with self._lock:
+                self._values = dict(self.collect())
+        return super()._samples()
+
+
+class Histogram(_Metric):
+    """
+    Гистограмма в формате Prometheus (кумулятивные бакеты, _sum, _count).
+    observe() — бинарный поиск и пара сложений под локом, без аллокаций.
+    """
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][idx] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def count(self, **labels):
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state[2] if state else 0
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, (list(state[0]), state[1], state[2])) for key, state in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, (("le", _format_value(bound)),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def render():
+    """
+    Все зарегистрированные метрики в текстовом формате экспозиции Prometheus 0.0.4.
+    """
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# --- Метрики бота ---
+
+MODEL_ATTEMPT_SECONDS = Histogram(
+    "galaxy_model_attempt_seconds", "Duration of a single model attempt",
+    labels=("cascade", "model", "outcome")
+)
+PROMPT_CHARS = Histogram(
+    "galaxy_prompt_chars", "Prompt size sent to a model, characters", labels=("cascade",), buckets=SIZE_BUCKETS
+)
+PROMPT_TOKENS = Histogram(
+    "galaxy_prompt_tokens_estimated", "Prompt size sent to a model, tokens (chars / 4 estimate)",
+    labels=("cascade",), buckets=tuple(b // 4 for b in SIZE_BUCKETS)
+)
+DB_CONTEXT_SECONDS = Histogram("galaxy_db_context_seconds", "fetch_db_context duration", labels=("outcome",))
+GITHUB_PUSH_SECONDS = Histogram("galaxy_github_push_seconds", "sync_push_to_github duration per batch")
+GITHUB_PUSH_RESULTS = Counter("galaxy_github_push_results_total", "Cards by push result", labels=("result",))
+FALLBACK_HEURISTIC = Counter("galaxy_fallback_heuristic_total", "Classifications answered by the heuristic fallback")
+MODEL_JSON_RESULTS = Counter(
+    "galaxy_model_json_total", "Classification answers by parse result (strict, repaired, failed)",
+    labels=("model", "mode", "result")
+)
+LINK_META_RESULTS = Counter(
+    "galaxy_link_meta_total", "Link metadata seen by classification: ok, error or late (not ready in LINK_META_WAIT)",
+    labels=("result",)
+)
+LINK_META_WAIT_SECONDS = Histogram(
+    "galaxy_link_meta_wait_seconds", "How long classification waited for link metadata after the local classifier"
+)
+NEAR_DUPLICATES = Counter(
+    "galaxy_near_duplicate_total", "Embedding search before a push: prompted (similar cards found) or clear",
+    labels=("outcome",)
+)
+LOCAL_CLASSIFIER = Counter(
+    "galaxy_local_classifier_total", "Local classifier decisions: accepted (LLM skipped) or deferred to the LLM",
+    labels=("outcome",)
+)
+POST_PARTS = Counter(
+    "galaxy_post_parts_total", "Incoming messages by how they reached analysis: single or merged (part of a split post)",
+    labels=("outcome",)
+)
+
+
+def observe_prompt(cascade, messages):
+    chars = sum(len(message["content"]) for message in messages)
+    PROMPT_CHARS.observe(chars, cascade=cascade)
+    PROMPT_TOKENS.observe(chars / 4, cascade=cascade)
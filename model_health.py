@@ -0,0 +1,186 @@
+import os
+import json
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+OUTCOMES = ("ok", "timeout", "error", "parse_fail")
+
+
+class ModelStats:
+    __slots__ = (
+        "latency", "error_rate", "parse_fail_rate", "calls", "failures_in_row", "state", "opened_at", "probe_at",
+        "structured_output"
+    )
+
+    def __init__(self, latency=10.0, error_rate=0.0, parse_fail_rate=0.0, calls=0,
+                 failures_in_row=0, state=CLOSED, opened_at=0.0, probe_at=0.0, structured_output=None):
+        self.latency = latency                  # EWMA, секунды
+        self.error_rate = error_rate            # EWMA доли таймаутов/ошибок
+        self.parse_fail_rate = parse_fail_rate  # EWMA доли ответов, не разобранных как JSON
+        self.calls = calls
+        self.failures_in_row = failures_in_row
+        self.state = state
+        self.opened_at = opened_at
+        self.probe_at = probe_at
+        self.structured_output = structured_output  # None — не проверяли, True/False — принимает ли response_format
+
+    def success_per_second(self):
+        p_success = (1 - self.error_rate) * (1 - self.parse_fail_rate)
+        return p_success / max(self.latency, 0.1)
+
+    def as_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+class ModelHealth:
+    """
+    Общая для обоих каскадов статистика моделей: EWMA задержки, доли ошибок и битого JSON,
+    плюс circuit breaker. Модель, упавшая failure_threshold раз подряд, пропускается cooldown секунд,
+    затем получает одну пробную попытку (half-open). Состояние переживает рестарты через JSON-файл.
+    """
+
+    def __init__(self, path=None, alpha=0.3, failure_threshold=3, cooldown=120.0, save_interval=30.0):
+        self.path = path
+        self.alpha = alpha
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.save_interval = save_interval
+        self.stats = {}
+        self._lock = threading.Lock()
+        self._saved_at = 0.0
+        self._dirty = False
+        if path:
+            self.load()
+
+    def _get(self, model):
+        stats = self.stats.get(model)
+        if stats is None:
+            stats = self.stats[model] = ModelStats()
+        return stats
+
+    def order(self, models):
+        """
+        Порядок опроса: доступные модели по убыванию ожидаемых успехов в секунду.
+        Модели с открытым автоматом пропускаются, кроме тех, чей cooldown истек и чья проба свободна;
+        если закрыты все — возвращаем исходный порядок. Состояние не меняет: пробу занимает begin_probe.
+        """
+        now = time.time()
+        ranked = []
+        with self._lock:
+            for idx, model in enumerate(models):
+                stats = self._get(model)
+                if stats.state != CLOSED and not self._probe_free(stats, now):
+                    continue
+                ranked.append((-stats.success_per_second(), idx, model))
+        if not ranked:
+            logger.warning("All model circuits are open, trying the static order")
+            return list(models)
+        ranked.sort()
+        return [model for _, _, model in ranked]
+
+    def begin_probe(self, model):
+        """
+        Вызывается прямо перед запросом к модели. Для модели с открытым автоматом после cooldown
+        занимает единственную пробную попытку (half-open); False — пробу уже занял другой запрос, модель пропускаем.
+        Модели, до которых каскад не дошел, пробу не тратят.
+        """
+        now = time.time()
+        with self._lock:
+            stats = self._get(model)
+            if stats.state == CLOSED:
+                return True
+            if not self._probe_free(stats, now):
+                # Все автоматы открыты и order() отдал исходный порядок — пробуем как есть
+                return stats.state == OPEN and now - stats.opened_at < self.cooldown
+            stats.state = HALF_OPEN
+            stats.probe_at = now
+            self._dirty = True
+            return True
+
+    def _probe_free(self, stats, now):
+        """
+        Одна пробная попытка на период cooldown, и только после cooldown с открытия автомата.
+        """
+        if stats.state == OPEN and now - stats.opened_at < self.cooldown:
+            return False
+        return now - stats.probe_at >= self.cooldown
+
+    def record(self, model, outcome, latency):
+        alpha = self.alpha
+        with self._lock:
+            stats = self._get(model)
+            stats.calls += 1
+            stats.latency += alpha * (latency - stats.latency)
+            failed = outcome in ("timeout", "error")
+            stats.error_rate += alpha * ((1.0 if failed else 0.0) - stats.error_rate)
+            if not failed:
+                stats.parse_fail_rate += alpha * ((1.0 if outcome == "parse_fail" else 0.0) - stats.parse_fail_rate)
+
+            if outcome == "ok":
+                if stats.state != CLOSED:
+                    logger.info(f"✅ Circuit for {model} closed again")
+                stats.state = CLOSED
+                stats.failures_in_row = 0
+            else:
+                stats.failures_in_row += 1
+                if stats.state == HALF_OPEN or stats.failures_in_row >= self.failure_threshold:
+                    if stats.state != OPEN:
+                        logger.warning(f"🔌 Circuit for {model} opened after {stats.failures_in_row} failures")
+                    stats.state = OPEN
+                    stats.opened_at = time.time()
+            self._dirty = True
+        self._maybe_save()
+
+    def structured_output(self, model):
+        with self._lock:
+            return self._get(model).structured_output
+
+    def set_structured_output(self, model, supported):
+        with self._lock:
+            stats = self._get(model)
+            if stats.structured_output is supported:
+                return
+            stats.structured_output = supported
+            self._dirty = True
+        self._maybe_save()
+
+    def all_open(self, models):
+        with self._lock:
+            return all(self._get(model).state == OPEN for model in models)
+
+    def snapshot(self):
+        with self._lock:
+            return {model: stats.as_dict() for model, stats in self.stats.items()}
+
+    # --- персистентность ---
+    def load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                raw = json.load(f)
+            self.stats = {model: ModelStats(**values) for model, values in raw.items()}
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Model stats file is unreadable, starting fresh: {e}")
+
+    def save(self):
+        if not self.path:
+            return
+        data = self.snapshot()
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=1)
+            os.replace(tmp_path, self.path)
+            self._saved_at = time.monotonic()
+            self._dirty = False
+        except OSError as e:
+            logger.warning(f"Can't save model stats: {e}")
+
+    def _maybe_save(self):
+        if self._dirty and time.monotonic() - self._saved_at >= self.save_interval:
+            self.save()
@@ -0,0 +1,99 @@
+import re
+import math
+from collections import Counter, defaultdict
+
+_TOKEN_RE = re.compile(r'[a-zа-я0-9]+')
+
+_STOPWORDS = frozenset("""
+a an and are as at be by for from how i in is it of on or the to with what which you your
+и в во на с со по для что как это не но а или к ко от до из у о об же ли бы то так мне
+меня мой моя нужен нужна нужно найди найти есть какой какая какие где для чтобы
+""".split())
+
+# Грубый стеммер: отрезаем самые частые окончания, чтобы "нейросети" и "нейросеть" совпадали
+_RU_SUFFIXES = sorted("""
+иями ями ами ией ей ий ый ой ая яя ое ее ие ые ого его ому ему ыми ими ую юю ом ем ах ях ов ев
+ия ья ию ью ии ей ам ям ть ти ся сь ла ло ли на ны ет ит ут ют ат ят ешь ишь а я о е и ы у ю ь
+""".split(), key=len, reverse=True)
+_EN_SUFFIXES = ("ing", "ers", "ies", "ed", "er", "es", "s")
+
+
+def _stem(token):
+    if len(token) <= 3 or token.isdigit():
+        return token
+    if 'а' <= token[0] <= 'я':
+        for suffix in _RU_SUFFIXES:
+            if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+                return token[:-len(suffix)]
+        return token
+    for suffix in _EN_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text):
+    text = str(text).lower().replace('ё', 'е')
+    return [_stem(tok) for tok in _TOKEN_RE.findall(text) if tok not in _STOPWORDS]
+
+
+class SearchIndex:
+    """
+    Инвертированный индекс по карточкам с ранжированием BM25.
+    Название весит больше описания, описание — больше текста промпта.
+    """
+
+    FIELD_WEIGHTS = (("name", 3), ("desc", 2), ("prompt_body", 1))
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.cards = []
+        self.doc_len = []
+        self.postings = defaultdict(list)   # term -> [(doc_id, tf)]
+        self.total_len = 0
+
+    @classmethod
+    def from_cards(cls, cards):
+        index = cls()
+        for card in cards:
+            index.add(card)
+        return index
+
+    def add(self, card):
+        doc_id = len(self.cards)
+        counts = Counter()
+        for field, weight in self.FIELD_WEIGHTS:
+            for term in tokenize(getattr(card, field, "") or ""):
+                counts[term] += weight
+        length = sum(counts.values())
+        self.cards.append(card)
+        self.doc_len.append(length)
+        self.total_len += length
+        for term, tf in counts.items():
+            self.postings[term].append((doc_id, tf))
+        return doc_id
+
+    def search(self, query, top_k=10):
+        """
+        Возвращает [(card, score)] по убыванию релевантности; пустой список, если совпадений нет.
+        """
+        n_docs = len(self.cards)
+        if not n_docs:
+            return []
+        avg_len = self.total_len / n_docs or 1.0
+        k1, b = self.k1, self.b
+        scores = defaultdict(float)
+
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            for doc_id, tf in postings:
+                norm = k1 * (1 - b + b * self.doc_len[doc_id] / avg_len)
+                scores[doc_id] += idf * tf * (k1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [(self.cards[doc_id], score) for doc_id, score in ranked]
@@ -0,0 +1,53 @@
+import re
+
+from cards import SECTIONS
+
+SHARD_DIR = "sections"
+
+_GRID_RE = re.compile(r'<div\s+class="grid[^"]*"[^>]*>')
+
+
+def shard_path(section):
+    return f"{SHARD_DIR}/{section}.html"
+
+
+def section_for_path(path):
+    """
+    Раздел шарда по его пути ("" для index.html, где разделы размечены тегами <section>).
+    """
+    if path.startswith(f"{SHARD_DIR}/") and path.endswith(".html"):
+        section = path[len(SHARD_DIR) + 1:-len(".html")]
+        if section in SECTIONS:
+            return section
+    return ""
+
+
+def split_index(html_content):
+    """
+    Разрезает монолитный index.html на оболочку и фрагменты разделов.
+    Содержимое каждой сетки карточек (вместе с маркером INSERT_*_HERE) уезжает в sections/<раздел>.html,
+    а в оболочке остается пустая сетка с data-shard, которую filters.js подгрузит при открытии раздела.
+    Возвращает (shell_html, {section: fragment_html}).
+    """
+    shards = {}
+    pieces = []
+    prev = 0
+    for section in SECTIONS:
+        start = html_content.find(f'<section id="{section}"')
+        if start == -1:
+            continue
+        grid = _GRID_RE.search(html_content, start)
+        marker = f"<!-- INSERT_{section.upper()}_HERE -->"
+        marker_pos = html_content.find(marker, start)
+        if grid is None or marker_pos == -1:
+            continue
+        body_start = grid.end()
+        body_end = marker_pos + len(marker)
+        shards[section] = html_content[body_start:body_end].strip("\n") + "\n"
+
+        open_tag = grid.group(0)[:-1] + f' data-shard="{shard_path(section)}">'
+        pieces.append(html_content[prev:grid.start()])
+        pieces.append(open_tag)
+        prev = body_end
+    pieces.append(html_content[prev:])
+    return "".join(pieces), shards
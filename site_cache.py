@@ -0,0 +1,368 @@
+import os
+import json
+import time
+import pickle
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+
+
+def _release_body(contents):
+    """
+    ContentFile держит тело файла в base64 (в _rawData и в атрибуте content) до следующего запроса.
+    Для условных запросов нужны только etag/last_modified, так что после декодирования тело
+    отпускается: в памяти остается одна копия сайта — строка html.
+    """
+    raw = getattr(contents, "_rawData", None)
+    if isinstance(raw, dict) and "content" in raw:
+        raw["content"] = ""
+    if hasattr(contents, "_content") and hasattr(contents, "_makeStringAttribute"):
+        contents._content = contents._makeStringAttribute("")
+
+
+def _take_text(contents):
+    text = contents.decoded_content.decode("utf-8")
+    _release_body(contents)
+    return text
+
+
+class SiteCache:
+    """
+    Держит index.html в памяти процесса и перепроверяет его условным запросом (ETag).
+    Ответ 304 от GitHub не тратит rate limit, поэтому частые /ask почти бесплатны.
+    После собственных пушей копия обновляется на месте, полная перезагрузка —
+    только если файл поменял кто-то другой.
+    """
+
+    def __init__(self, repo_getter, path, ref="main", revalidate_interval=15.0):
+        self._repo_getter = repo_getter
+        self.path = path
+        self.ref = ref
+        self.revalidate_interval = revalidate_interval
+
+        self._lock = threading.RLock()
+        self._contents = None   # ContentFile: хранит etag/last_modified для условных запросов
+        self._checked_at = 0.0
+        self._derived = {}
+
+        self.html = None
+        self.sha = None
+        self.version = 0
+
+    def get(self, max_age=None):
+        """
+        Возвращает (html, sha). max_age=0 — обязательно сверить с GitHub (перед записью),
+        None — сверять не чаще revalidate_interval секунд (для чтения).
+        """
+        interval = self.revalidate_interval if max_age is None else max_age
+        with self._lock:
+            if self._contents is None:
+                # Копия из снапшота: отдаем, пока свежа, а полную загрузку сделает фоновая проверка.
+                # Сброшенную invalidate() копию (_checked_at == 0) перечитываем всегда, даже при max_age=inf
+                if self.html is not None and self._checked_at and time.monotonic() - self._checked_at < interval:
+                    return self.html, self.sha
+                self._full_load()
+            elif time.monotonic() - self._checked_at >= interval:
+                self._revalidate()
+            return self.html, self.sha
+
+    def derived(self, key, builder, max_age=None):
+        """
+        Мемоизирует производные от html данные (контекст для ИИ и т.п.) до смены версии файла.
+        """
+        with self._lock:
+            html_content, _ = self.get(max_age)
+            cached = self._derived.get(key)
+            if cached is not None and cached[0] == self.version:
+                return cached[1]
+            value = builder(html_content)
+            self._derived[key] = (self.version, value)
+            return value
+
+    def peek(self, key):
+        """
+        Производное значение для текущей версии без сетевых запросов и пересчета (или None).
+        """
+        with self._lock:
+            cached = self._derived.get(key)
+            if cached is not None and cached[0] == self.version:
+                return cached[1]
+            return None
+
+    def apply_local_update(self, new_html, new_sha, derived=None):
+        """
+        Вызывается после нашего собственного коммита: скачивать файл заново не нужно.
+        derived — уже пересчитанные на месте производные данные (например, разобранные карточки).
+        """
+        with self._lock:
+            self._install(new_html, new_sha)
+            for key, value in (derived or {}).items():
+                self._derived[key] = (self.version, value)
+
+    def touch(self):
+        """
+        Отмечает копию как только что сверенную (свежесть подтверждена другим запросом).
+        Сброшенную invalidate() копию не трогает: 304 на листинг не делает ее снова актуальной.
+        """
+        with self._lock:
+            if self.html is not None and (self._contents is not None or self._checked_at):
+                self._checked_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._contents = None
+            self._checked_at = 0.0
+
+    def refresh(self):
+        """
+        Фоновая сверка. Копию из снапшота докачивает без удержания блокировки,
+        чтобы читатели тем временем получали восстановленную копию, а не ждали GitHub.
+        """
+        if self._contents is not None or self.html is None:
+            self.get(max_age=0)
+            return
+        contents = self._repo_getter().get_contents(self.path, ref=self.ref)
+        with self._lock:
+            if self._contents is not None:
+                return
+            self._contents = contents
+            self._checked_at = time.monotonic()
+            if contents.sha != self.sha:
+                logger.info(f"♻️ {self.path} changed since snapshot ({contents.sha[:7]}), reloading")
+                self._install(_take_text(contents), contents.sha)
+            else:
+                _release_body(contents)
+
+    def snapshot(self):
+        with self._lock:
+            derived = {key: value for key, (version, value) in self._derived.items() if version == self.version}
+            return {"html": self.html, "sha": self.sha, "derived": derived}
+
+    def restore(self, state):
+        """
+        Поднимает копию из снапшота без сети; считается только что сверенной,
+        чтобы первый запрос после рестарта не ждал GitHub.
+        """
+        with self._lock:
+            self._install(state["html"], state["sha"])
+            for key, value in state["derived"].items():
+                self._derived[key] = (self.version, value)
+            self._checked_at = time.monotonic()
+
+    def _install(self, html_content, sha):
+        self.html = html_content
+        self.sha = sha
+        self.version += 1
+        self._derived.clear()
+
+    def _full_load(self):
+        repo = self._repo_getter()
+        contents = repo.get_contents(self.path, ref=self.ref)
+        self._contents = contents
+        self._checked_at = time.monotonic()
+        if contents.sha != self.sha:
+            self._install(_take_text(contents), contents.sha)
+        else:
+            _release_body(contents)
+        logger.info(f"📦 Site cache loaded: {self.path}@{contents.sha[:7]}")
+
+    def _revalidate(self):
+        try:
+            changed = self._contents.update()
+        except Exception as e:
+            # GitHub недоступен — работаем на последней известной копии
+            logger.warning(f"Site cache revalidation failed, serving stale copy: {e}")
+            return
+        self._checked_at = time.monotonic()
+        if not changed:
+            return
+        if self._contents.sha == self.sha:
+            _release_body(self._contents)
+            # ETag сменился из-за нашего же пуша, содержимое уже актуально
+            return
+        logger.info(f"♻️ {self.path} changed upstream ({self._contents.sha[:7]}), reloading")
+        self._install(_take_text(self._contents), self._contents.sha)
+
+
+class SiteStore:
+    """
+    Все файлы, в которые бот пишет карточки: один index.html или шарды по разделам.
+    Для шардов свежесть проверяется одним условным запросом к листингу каталога,
+    а скачиваются заново только изменившиеся файлы.
+    """
+
+    def __init__(self, repo_getter, paths, ref="main", revalidate_interval=15.0, directory=None):
+        self._repo_getter = repo_getter
+        self.ref = ref
+        self.revalidate_interval = revalidate_interval
+        self.directory = directory
+        self.caches = {path: SiteCache(repo_getter, path, ref, revalidate_interval) for path in paths}
+
+        self._lock = threading.RLock()
+        self._derived = {}
+        self._dir_etag = None
+        self._dir_checked_at = 0.0
+        self._snapshot_version = None
+
+    def get(self, max_age=None):
+        """
+        Возвращает {path: (html, sha)}; max_age как у SiteCache.get.
+        """
+        interval = self.revalidate_interval if max_age is None else max_age
+        with self._lock:
+            if self.directory and time.monotonic() - self._dir_checked_at >= interval:
+                if self._check_directory():
+                    # Листинг уже подтвердил свежесть (или сбросил изменившиеся файлы)
+                    max_age = float("inf")
+            return {path: cache.get(max_age) for path, cache in self.caches.items()}
+
+    def version(self):
+        return tuple(cache.version for cache in self.caches.values())
+
+    def derived(self, key, builder, max_age=None):
+        """
+        Как SiteCache.derived, но для данных, собранных по всем файлам сразу (индексы поиска, дублей).
+        """
+        with self._lock:
+            self.get(max_age)
+            version = self.version()
+            cached = self._derived.get(key)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            value = builder()
+            self._derived[key] = (version, value)
+            return value
+
+    def peek(self, key):
+        with self._lock:
+            cached = self._derived.get(key)
+            if cached is not None and cached[0] == self.version():
+                return cached[1]
+            return None
+
+    def locked(self):
+        """
+        Блокировка хранилища: держать, пока разобранные карточки и индексы правятся на месте.
+        """
+        return self._lock
+
+    def apply_local_update(self, updates, derived=None):
+        """
+        updates: {path: (new_html, new_sha, {производные этого файла})}; derived — общие для всех файлов.
+        """
+        with self._lock:
+            for path, (new_html, new_sha, file_derived) in updates.items():
+                self.caches[path].apply_local_update(new_html, new_sha, derived=file_derived)
+            version = self.version()
+            for key, value in (derived or {}).items():
+                self._derived[key] = (version, value)
+
+    def save_snapshot(self, filename, meta=None):
+        """
+        Сохраняет файлы, разобранные карточки и индексы (pickle, атомарная запись).
+        meta — параметры, при несовпадении которых снапшот при загрузке игнорируется.
+        """
+        with self._lock:
+            version = self.version()
+            derived = {key: value for key, (v, value) in self._derived.items() if v == version}
+            state = {
+                "format": SNAPSHOT_FORMAT,
+                "meta": meta,
+                "files": {path: cache.snapshot() for path, cache in self.caches.items() if cache.html is not None},
+                "derived": derived,
+            }
+            if not state["files"]:
+                return False
+            # Сериализуем под локом: коммит в соседнем потоке может дописывать карточки в индексы
+            data = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp_path = f"{filename}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, filename)
+            self._snapshot_version = version
+            return True
+        except OSError as e:
+            logger.warning(f"Can't save site snapshot: {e}")
+            return False
+
+    def load_snapshot(self, filename, meta=None):
+        try:
+            with open(filename, "rb") as f:
+                state = pickle.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.warning(f"Can't read site snapshot {filename}: {e}")
+            return False
+        if state.get("format") != SNAPSHOT_FORMAT or state.get("meta") != meta:
+            logger.info("Site snapshot is from another layout or version, ignoring")
+            return False
+        if set(state["files"]) != set(self.caches):
+            return False
+        with self._lock:
+            for path, file_state in state["files"].items():
+                self.caches[path].restore(file_state)
+            version = self.version()
+            for key, value in state["derived"].items():
+                self._derived[key] = (version, value)
+            self._snapshot_version = version
+            self._dir_checked_at = time.monotonic()
+        logger.info(f"📦 Site snapshot restored: {len(state['files'])} file(s), {', '.join(state['derived']) or 'no indexes'}")
+        return True
+
+    def refresh(self):
+        """
+        Фоновая сверка всех файлов (см. SiteCache.refresh). С каталогом — один запрос к листингу,
+        докачиваются только файлы, которые он пометил измененными.
+        """
+        if self.directory and self._check_directory():
+            stale = [cache for cache in self.caches.values() if cache.html is None or not cache._checked_at]
+        else:
+            stale = list(self.caches.values())
+        for cache in stale:
+            cache.refresh()
+
+    def snapshot_is_stale(self):
+        with self._lock:
+            return self._snapshot_version != self.version()
+
+    def invalidate(self):
+        with self._lock:
+            if not self.directory:
+                for cache in self.caches.values():
+                    cache.invalidate()
+            # С каталогом полный листинг сам сбросит файлы, чьи sha разошлись с нашими
+            self._dir_etag = None
+            self._dir_checked_at = 0.0
+
+    def _check_directory(self):
+        try:
+            repo = self._repo_getter()
+            headers = {"If-None-Match": self._dir_etag} if self._dir_etag else {}
+            status, resp_headers, body = repo.requester.requestJson(
+                "GET", f"{repo.url}/contents/{self.directory}", parameters={"ref": self.ref}, headers=headers
+            )
+        except Exception as e:
+            logger.warning(f"Directory revalidation failed, checking files one by one: {e}")
+            return False
+        if status == 304:
+            self._dir_checked_at = time.monotonic()
+            for cache in self.caches.values():
+                cache.touch()
+            return True
+        if status != 200:
+            logger.warning(f"Directory listing for {self.directory} returned HTTP {status}")
+            return False
+        self._dir_checked_at = time.monotonic()
+        self._dir_etag = {k.lower(): v for k, v in resp_headers.items()}.get("etag")
+        shas = {item["path"]: item["sha"] for item in json.loads(body)}
+        for path, cache in self.caches.items():
+            if cache.sha is not None and shas.get(path) == cache.sha:
+                cache.touch()
+            else:
+                cache.invalidate()
+        return True
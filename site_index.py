@@ -0,0 +1,192 @@
+import re
+import json
+
+SEARCH_INDEX_FORMAT = 1
+
+_TOKEN_RE = re.compile(r'[a-zа-я0-9]+')
+
+FACETS = ("format", "focus", "platform", "source", "model")
+
+
+# --- Фасеты: те же правила, что в filters.js (detectFormat и т.д.) — менять вместе ---
+
+def _has(text, *needles):
+    return any(needle in text for needle in needles)
+
+
+def _unique(tags):
+    return list(dict.fromkeys(tags))
+
+
+def _domain(url):
+    return re.sub(r'^https?://', '', url).split('/')[0].lower()
+
+
+def detect_format(text, link, badge):
+    tags = []
+    if _has(text, 'prompt', 'промпт', 'prompting'): tags.append('Промпты')
+    if _has(text, 'course', 'курс', 'обуч', 'tutorial'): tags.append('Курс')
+    if _has(text, 'presentation', 'презентац', 'slides', 'ppt'): tags.append('Презентации')
+    if _has(text, 'image', 'картин', 'photo', 'logo', 'upscale'): tags.append('Изображения')
+    if _has(text, 'video', 'видео', 'movie', 'youtube'): tags.append('Видео')
+    if _has(text, 'audio', 'музык', 'sound', 'voice', 'podcast'): tags.append('Аудио')
+    if 'pdf' in text: tags.append('PDF')
+    if _has(text, 'extension', 'chrome', 'расширение'): tags.append('Расширение')
+    if _has(text, 'bot', 'чат-бот', 'chatbot'): tags.append('Бот')
+    if _has(text, 'app', 'apk', 'ios', 'android'): tags.append('Приложение')
+    if link and 'github.com' in link: tags.append('Репозиторий')
+    return _unique(tags)
+
+
+def detect_focus(text, link, badge):
+    tags = []
+    if _has(text, 'osint', 'security', 'vpn', 'privacy', 'hack', 'взлом'): tags.append('Безопасность')
+    if _has(text, 'design', 'ui', 'ux', 'logo'): tags.append('Дизайн')
+    if _has(text, 'code', 'dev', 'library', 'api', 'github'): tags.append('Разработка')
+    if _has(text, 'study', 'learn', 'курс', 'обуч', 'tutorial'): tags.append('Обучение')
+    if _has(text, 'research', 'paper', 'citation', 'конспект'): tags.append('Исследования')
+    if _has(text, 'automation', 'productivity', 'plan', 'notes'): tags.append('Продуктивность')
+    if _has(text, 'video', 'audio', 'image'): tags.append('Медиа')
+    return _unique(tags)
+
+
+def detect_platform(text, link, badge):
+    tags = []
+    badge = (badge or '').lower()
+    if 'android' in badge or 'android' in text: tags.append('Android')
+    if 'ios' in badge or 'ios' in text: tags.append('iOS')
+    if 'windows' in text: tags.append('Windows')
+    if 'linux' in text: tags.append('Linux')
+    if _has(text, 'mac', 'macos'): tags.append('macOS')
+    if link and 'chromewebstore.google.com' in link: tags.append('Chrome')
+    if not tags and link and link.startswith(('http://', 'https://')): tags.append('Web')
+    return _unique(tags)
+
+
+def detect_source(text, link, badge):
+    if not link or link == '#':
+        return []
+    domain = _domain(link)
+    tags = []
+    if 'github.com' in domain: tags.append('GitHub')
+    if _has(domain, 't.me', 'telegram.me'): tags.append('Telegram')
+    if 'chromewebstore.google.com' in domain: tags.append('Chrome Store')
+    if 'huggingface.co' in domain: tags.append('HuggingFace')
+    if 'openai.com' in domain: tags.append('OpenAI')
+    if 'google' in domain: tags.append('Google')
+    if _has(domain, 'app', 'cloud', 'ai'): tags.append('Web App')
+    if not tags: tags.append('Веб')
+    return _unique(tags)
+
+
+def detect_model(text, link, badge):
+    tags = []
+    if _has(text, 'gpt', 'openai'): tags.append('GPT')
+    if 'claude' in text: tags.append('Claude')
+    if 'gemini' in text: tags.append('Gemini')
+    if 'llama' in text: tags.append('Llama')
+    if 'qwen' in text: tags.append('Qwen')
+    if 'mistral' in text: tags.append('Mistral')
+    return _unique(tags)
+
+
+_DETECTORS = (detect_format, detect_focus, detect_platform, detect_source, detect_model)
+
+
+def card_badge(card):
+    """
+    Текст первого <span> карточки, как его видит filters.js: платформа у apk, "AI PROMPT" у промптов, иначе раздел.
+    """
+    if card.section == 'apk':
+        return card.platform
+    if card.section == 'prompts':
+        return 'AI PROMPT'
+    return card.section.upper()
+
+
+def card_facets(card):
+    text = f"{card.name} {card.desc} {card.prompt_body}".lower()
+    badge = card_badge(card)
+    return [detect(text, card.url, badge) for detect in _DETECTORS]
+
+
+def search_terms(card):
+    text = f"{card.name} {card.desc} {card.prompt_body}".lower().replace('ё', 'е')
+    return set(_TOKEN_RE.findall(text))
+
+
+class SiteIndex:
+    """
+    Компактный индекс для filters.js: карточки по разделам в порядке страницы, значения фасетов
+    и инвертированный список слов. Страница берет фильтры и поиск из него и не читает текст карточек из DOM.
+    Пополняется по одной карточке (add); списки, которые add меняет, заменяются новыми, а не дописываются,
+    поэтому clone() — дешевая поверхностная копия для предпросмотра перед коммитом.
+    """
+
+    def __init__(self):
+        self.cards = []         # [название, [[id значения фасета, ...] по FACETS]]
+        self.sections = {}      # раздел -> [id карточки] в порядке страницы
+        self.values = []        # id -> значение фасета
+        self._value_ids = {}
+        self.postings = {}      # слово -> [id карточки] по возрастанию
+
+    @classmethod
+    def from_cards(cls, cards):
+        index = cls()
+        for card in cards:
+            index._add(card, in_place=True)   # списки еще ни с кем не разделены
+        return index
+
+    def clone(self):
+        copy = SiteIndex()
+        copy.cards = list(self.cards)
+        copy.sections = dict(self.sections)
+        copy.values = list(self.values)
+        copy._value_ids = dict(self._value_ids)
+        copy.postings = dict(self.postings)
+        return copy
+
+    def __len__(self):
+        return len(self.cards)
+
+    def add(self, card):
+        """
+        Новая карточка встает в конец своего раздела — туда же, куда ее вставляет бот (перед маркером).
+        """
+        return self._add(card, in_place=False)
+
+    def _add(self, card, in_place):
+        card_id = len(self.cards)
+        facets = []
+        for values in card_facets(card):
+            ids = []
+            for value in values:
+                value_id = self._value_ids.get(value)
+                if value_id is None:
+                    value_id = self._value_ids[value] = len(self.values)
+                    self.values.append(value)
+                ids.append(value_id)
+            facets.append(ids)
+        self.cards.append([card.name, facets])
+        lists = [(self.sections, card.section)] + [(self.postings, term) for term in search_terms(card)]
+        for table, key in lists:
+            current = table.get(key)
+            if current is None:
+                table[key] = [card_id]
+            elif in_place:
+                current.append(card_id)
+            else:
+                table[key] = current + [card_id]
+        return card_id
+
+    def to_json(self):
+        terms = sorted(self.postings)
+        return json.dumps({
+            "format": SEARCH_INDEX_FORMAT,
+            "facets": FACETS,
+            "values": self.values,
+            "cards": self.cards,
+            "sections": self.sections,
+            "terms": terms,
+            "postings": [self.postings[term] for term in terms],
+        }, ensure_ascii=False, separators=(",", ":"))
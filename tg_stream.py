@@ -0,0 +1,129 @@
+import re
+import html
+import time
+import asyncio
+import logging
+
+from aiogram.enums import ParseMode
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+
+logger = logging.getLogger(__name__)
+
+TG_MAX_LEN = 4096
+# Теги, которые Telegram понимает в parse_mode=HTML
+_ALLOWED_TAGS = ('b', 'strong', 'i', 'em', 'u', 'ins', 's', 'strike', 'del', 'a', 'code', 'pre', 'tg-spoiler', 'blockquote')
+_TAG_RE = re.compile(r'<(/?)([a-zA-Z][\w-]*)[^>]*>')
+_TAIL_TAG_RE = re.compile(r'<[^>]*$')
+_TAIL_ENTITY_RE = re.compile(r'&[#\w]{0,8}$')
+
+
+def close_open_tags(text):
+    """
+    Делает валидным обрывок HTML-ответа: отрезает недописанный тег/сущность в конце
+    и закрывает все открытые теги в обратном порядке.
+    """
+    text = _TAIL_TAG_RE.sub('', text)
+    text = _TAIL_ENTITY_RE.sub('', text)
+    stack = []
+    for match in _TAG_RE.finditer(text):
+        closing, tag = match.group(1), match.group(2).lower()
+        if tag not in _ALLOWED_TAGS:
+            continue
+        if not closing:
+            stack.append(tag)
+        elif tag in stack:
+            # Закрываем до ближайшего совпадающего (кривую вложенность тоже переживем)
+            while stack and stack.pop() != tag:
+                pass
+    return text + ''.join(f'</{tag}>' for tag in reversed(stack))
+
+
+def strip_tags(text):
+    return _TAG_RE.sub('', text)
+
+
+class StreamingMessage:
+    """
+    Показывает ответ модели по мере генерации, редактируя одно сообщение.
+    Правки склеиваются: не чаще min_interval секунд, с учетом RetryAfter от Telegram.
+    """
+
+    def __init__(self, message, min_interval=1.2, cursor=" ▌"):
+        self.message = message
+        self.min_interval = min_interval
+        self.cursor = cursor
+        self.text = ""
+        self._shown = None
+        self._next_edit_at = 0.0
+        self._task = None
+
+    def feed(self, delta):
+        self.text += delta
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_later())
+
+    async def finish(self, suffix=""):
+        """
+        Финальная правка полным текстом (или тем, что успело прийти, плюс suffix).
+        """
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        delay = self._next_edit_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await self._edit(self.text.strip() + suffix, final=True)
+
+    async def _flush_later(self):
+        delay = self._next_edit_at - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        await self._edit(self.text.strip(), final=False)
+
+    async def _edit(self, text, final):
+        if not text:
+            return
+        if len(text) > TG_MAX_LEN - 16:
+            text = text[:TG_MAX_LEN - 16] + "…"
+        rendered = close_open_tags(text) + ("" if final else self.cursor)
+        if rendered == self._shown:
+            return
+        self._next_edit_at = time.monotonic() + self.min_interval
+        try:
+            await self.message.edit_text(rendered, parse_mode=ParseMode.HTML, disable_web_page_preview=True)
+            self._shown = rendered
+        except TelegramRetryAfter as e:
+            self._next_edit_at = time.monotonic() + e.retry_after
+            if final:
+                await asyncio.sleep(e.retry_after)
+                await self._edit(text, final)
+        except TelegramBadRequest as e:
+            if "not modified" in str(e):
+                return
+            # Модель накосячила с HTML — показываем голый текст, чтобы не потерять ответ
+            if final:
+                logger.error(f"HTML Parse error: {e}")
+            plain = html.unescape(strip_tags(text)) + ("" if final else self.cursor)
+            try:
+                await self.message.edit_text(plain, disable_web_page_preview=True)
+                self._shown = plain
+            except TelegramBadRequest:
+                pass
+
+
+class MessageRef:
+    """
+    Сообщение, известное только по chat_id/message_id (например, статус задачи после рестарта).
+    Умеет то же, что нужно стадиям от types.Message: edit_text.
+    """
+
+    def __init__(self, bot, chat_id, message_id):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+
+    async def edit_text(self, text, **kwargs):
+        return await self.bot.edit_message_text(text=text, chat_id=self.chat_id, message_id=self.message_id, **kwargs)
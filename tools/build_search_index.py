@@ -0,0 +1,48 @@
+"""
+Собирает search-index.json (индекс фильтров и поиска для filters.js) из index.html и шардов sections/,
+если они есть. Дальше бот обновляет файл сам в каждом коммите с карточками; скрипт нужен для первой
+выкладки и после ручной правки страницы.
+
+    python tools/build_search_index.py [path/to/index.html] [--out search-index.json]
+"""
+import os
+import sys
+import gzip
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cards import SECTIONS, parse_site
+from shards import SHARD_DIR, shard_path
+from site_index import SiteIndex
+
+
+def main():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", nargs="?", default=os.path.join(root, "index.html"))
+    parser.add_argument("--out", default=None, help="куда писать (по умолчанию search-index.json рядом с index.html)")
+    args = parser.parse_args()
+
+    base = os.path.dirname(os.path.abspath(args.path))
+    with open(args.path, encoding="utf-8") as f:
+        cards = parse_site(f.read()).cards
+    # Шарды — в том же порядке, что и у бота (SiteStore): index.html, затем разделы по SECTIONS
+    if os.path.isdir(os.path.join(base, SHARD_DIR)):
+        for section in SECTIONS:
+            path = os.path.join(base, shard_path(section))
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    cards += parse_site(f.read(), section=section).cards
+
+    text = SiteIndex.from_cards(cards).to_json()
+    out = args.out or os.path.join(base, "search-index.json")
+    with open(out, "w", encoding="utf-8") as f:
+        f.write(text)
+    raw = text.encode("utf-8")
+    print(f"Карточек: {len(cards)}; {out}: {len(raw) / 1024:.1f} KB raw / "
+          f"{len(gzip.compress(raw, compresslevel=6)) / 1024:.1f} KB gzip")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Разовый переход на шардированную раскладку: index.html -> оболочка + sections/<раздел>.html.
+Печатает размер первой загрузки до и после (сырые байты и gzip).
+
+    python tools/split_index.py [path/to/index.html] [--out DIR] [--dry-run]
+
+После выкладки результата бота нужно запускать с SITE_LAYOUT=sharded.
+"""
+import os
+import sys
+import gzip
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cards import SECTIONS, parse_site
+from shards import SHARD_DIR, shard_path, split_index
+
+
+def payload(text):
+    raw = text.encode("utf-8")
+    return len(raw), len(gzip.compress(raw, compresslevel=6))
+
+
+def fmt(sizes):
+    raw, packed = sizes
+    return f"{raw / 1024:8.1f} KB raw / {packed / 1024:7.1f} KB gzip"
+
+
+def main():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", nargs="?", default=os.path.join(root, "index.html"))
+    parser.add_argument("--out", default=None, help="куда писать результат (по умолчанию рядом с index.html)")
+    parser.add_argument("--dry-run", action="store_true", help="только посчитать размеры")
+    args = parser.parse_args()
+
+    with open(args.path, encoding="utf-8") as f:
+        html_content = f.read()
+
+    shell, shards = split_index(html_content)
+    missing = [section for section in SECTIONS if section not in shards]
+    if missing:
+        print(f"⚠️ Не найдены сетки/маркеры для разделов: {', '.join(missing)}")
+
+    before = len(parse_site(html_content).cards)
+    after = sum(len(parse_site(fragment, section=section).cards) for section, fragment in shards.items())
+    if before != after:
+        sys.exit(f"Потеряны карточки при разрезании: было {before}, стало {after}")
+
+    first = next((section for section in SECTIONS if section in shards), None)
+    print(f"Карточек: {before}, шардов: {len(shards)}")
+    print(f"До:    index.html целиком           {fmt(payload(html_content))}")
+    print(f"После: оболочка                     {fmt(payload(shell))}")
+    if first:
+        print(f"После: оболочка + {first:<18} {fmt(payload(shell + shards[first]))}")
+    for section, fragment in shards.items():
+        print(f"  {shard_path(section):<28} {fmt(payload(fragment))}")
+
+    if args.dry_run:
+        return
+    out = args.out or os.path.dirname(os.path.abspath(args.path))
+    os.makedirs(os.path.join(out, SHARD_DIR), exist_ok=True)
+    for section, fragment in shards.items():
+        with open(os.path.join(out, shard_path(section)), "w", encoding="utf-8") as f:
+            f.write(fragment)
+    with open(os.path.join(out, os.path.basename(args.path)), "w", encoding="utf-8") as f:
+        f.write(shell)
+    print(f"Записано в {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+import os
+import zlib
+import sqlite3
+import hashlib
+import logging
+import threading
+
+import numpy as np
+
+from classifier import card_text, features
+from dedup import canonical_url
+
+logger = logging.getLogger(__name__)
+
+
+def embedding_text(card):
+    return f"{card_text(card)}\n{card.url}"
+
+
+def card_key(card):
+    """
+    Ключ строки хранилища: меняется вместе с текстом карточки, одинаковые карточки делят строку.
+    """
+    raw = f"{card.section}\n{card_text(card)}\n{canonical_url(card.url)}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
+
+
+class HashingEmbedder:
+    """
+    Детерминированный локальный эмбеддер без модели: признаки классификатора (слова, пары слов,
+    домены ссылок) раскладываются знаковым хэшированием в dim измерений, вектор нормируется.
+    Ловит переформулированные названия и другие ссылки на тот же ресурс, если описания похожи;
+    годится и как заменитель нейросетевой модели в бенчмарках.
+    """
+
+    def __init__(self, dim=256):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def embed(self, texts):
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            feats = features(text)
+            if not feats:
+                continue
+            hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for f in feats), dtype=np.int64, count=len(feats))
+            idx, cnt = np.unique(hashes, return_counts=True)
+            signs = np.where(idx & (1 << 31), -1.0, 1.0)
+            np.add.at(out[row], idx % self.dim, signs * np.log1p(cnt))
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.where(norms > 0, norms, 1.0)
+
+
+class SentenceTransformerEmbedder:
+    """
+    Локальная модель sentence-transformers (пакет ставится отдельно, в requirements его нет).
+    """
+
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = f"st:{model_name}"
+
+    def embed(self, texts):
+        vectors = self.model.encode(list(texts), normalize_embeddings=True, convert_to_numpy=True)
+        return np.asarray(vectors, dtype=np.float32).reshape(len(texts), self.dim)
+
+
+def make_embedder(spec):
+    """
+    "hashing" / "hashing:512" — локальный эмбеддер без модели, иначе имя модели sentence-transformers.
+    """
+    if spec == "hashing" or spec.startswith("hashing:"):
+        _, _, dim = spec.partition(":")
+        return HashingEmbedder(int(dim) if dim else 256)
+    return SentenceTransformerEmbedder(spec)
+
+
+class VectorStore:
+    """
+    Эмбеддинги карточек на диске: матрица float32 в <path>.f32 (только дописывается, читается
+    через np.memmap) и таблица строк в <path>.sqlite3 (ключ, раздел, название, ссылка, активна ли).
+    В памяти — только отображение файла и маска активных строк; поиск — одно умножение матрицы
+    на вектор запроса и argpartition, метаданные поднимаются лишь для top-k.
+    Удаленные с сайта карточки не стираются, а помечаются неактивными. Сменился эмбеддер — хранилище
+    пересобирается с нуля. version — метка версии сайта, с которой хранилище сверено (ставит вызывающий).
+    """
+
+    def __init__(self, path, embedder):
+        self.embedder = embedder
+        self.dim = embedder.dim
+        self.version = None
+        self._matrix_path = f"{path}.f32"
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(f"{path}.sqlite3", check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS rows (row INTEGER PRIMARY KEY, key TEXT NOT NULL, section TEXT, "
+            "name TEXT, url TEXT, active INTEGER NOT NULL DEFAULT 1)"
+        )
+        self._db.execute("CREATE UNIQUE INDEX IF NOT EXISTS rows_key ON rows(key)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.commit()
+        self._open()
+
+    def _open(self):
+        meta = dict(self._db.execute("SELECT name, value FROM meta").fetchall())
+        if meta != {"embedder": self.embedder.name, "dim": str(self.dim)}:
+            if meta:
+                logger.info(f"Embedder changed ({meta.get('embedder')} -> {self.embedder.name}), rebuilding vectors")
+            self._db.execute("DELETE FROM rows")
+            self._db.execute("DELETE FROM meta")
+            self._db.executemany(
+                "INSERT INTO meta (name, value) VALUES (?, ?)",
+                (("embedder", self.embedder.name), ("dim", str(self.dim)))
+            )
+            self._db.commit()
+            open(self._matrix_path, "wb").close()
+
+        # Вектор дописывается раньше строки таблицы: после сбоя лишние байты в конце файла отрезаются
+        rows = self._db.execute("SELECT COUNT(*) FROM rows").fetchone()[0]
+        row_bytes = self.dim * 4
+        size = os.path.getsize(self._matrix_path) if os.path.exists(self._matrix_path) else 0
+        if size < rows * row_bytes:
+            logger.warning("Vector file is shorter than its id table, rebuilding vectors")
+            self._db.execute("DELETE FROM rows")
+            self._db.commit()
+            rows = 0
+        if size != rows * row_bytes:
+            with open(self._matrix_path, "ab") as f:
+                f.truncate(rows * row_bytes)
+        active = np.zeros(rows, dtype=bool)
+        active_rows = [row for (row,) in self._db.execute("SELECT row FROM rows WHERE active = 1")]
+        active[np.asarray(active_rows, dtype=np.int64)] = True
+        self._view = (self._map(rows), active)
+
+    def _map(self, rows):
+        if not rows:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.memmap(self._matrix_path, dtype=np.float32, mode="r", shape=(rows, self.dim))
+
+    def __len__(self):
+        return int(self._view[1].sum())
+
+    # --- запись ---
+
+    def add(self, card):
+        self.extend([card])
+
+    def extend(self, cards):
+        """
+        Добавляет карточки, которых еще нет (по card_key); ранее скрытые снова становятся активными.
+        """
+        with self._lock:
+            matrix, active = self._view
+            keyed = {}
+            revived = []
+            for card in cards:
+                key = card_key(card)
+                if key in keyed:
+                    continue
+                found = self._db.execute("SELECT row, active FROM rows WHERE key = ?", (key,)).fetchone()
+                if found is None:
+                    keyed[key] = card
+                elif not found[1]:
+                    revived.append(found[0])
+            if revived:
+                self._db.executemany("UPDATE rows SET active = 1 WHERE row = ?", ((row,) for row in revived))
+                active = active.copy()
+                active[revived] = True
+            if keyed:
+                vectors = self.embedder.embed([embedding_text(card) for card in keyed.values()])
+                start = len(active)
+                with open(self._matrix_path, "ab") as f:
+                    f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+                self._db.executemany(
+                    "INSERT INTO rows (row, key, section, name, url) VALUES (?, ?, ?, ?, ?)",
+                    ((start + i, key, card.section, card.name, card.url) for i, (key, card) in enumerate(keyed.items()))
+                )
+                active = np.concatenate([active, np.ones(len(keyed), dtype=bool)])
+                matrix = self._map(len(active))
+            self._db.commit()
+            # Ссылка на пару меняется целиком: поиск в другом потоке видит либо старое, либо новое
+            self._view = (matrix, active)
+            return len(keyed)
+
+    def sync(self, cards):
+        """
+        Сверка с карточками сайта: недостающие досчитываются, пропавшие с сайта скрываются.
+        Возвращает число досчитанных.
+        """
+        by_key = {card_key(card): card for card in cards}
+        with self._lock:
+            known = dict(self._db.execute("SELECT key, row FROM rows WHERE active = 1"))
+            gone = [row for key, row in known.items() if key not in by_key]
+            if gone:
+                self._db.executemany("UPDATE rows SET active = 0 WHERE row = ?", ((row,) for row in gone))
+                self._db.commit()
+                matrix, active = self._view
+                active = active.copy()
+                active[gone] = False
+                self._view = (matrix, active)
+        missing = [card for key, card in by_key.items() if key not in known]
+        return sum(self.extend(missing[i:i + 256]) for i in range(0, len(missing), 256))
+
+    # --- поиск ---
+
+    def nearest(self, card, k=3, min_score=0.0):
+        """
+        [(косинус, {"section", "name", "url"}), ...] — k самых похожих активных карточек, по убыванию.
+        """
+        matrix, active = self._view
+        if not len(matrix) or k <= 0:
+            return []
+        query = self.embedder.embed([embedding_text(card)])[0]
+        scores = np.asarray(matrix @ query)
+        scores[~active] = -np.inf
+        k = min(k, len(scores))
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+        top = [int(row) for row in top if scores[row] >= min_score and np.isfinite(scores[row])]
+        if not top:
+            return []
+        with self._lock:
+            meta = {
+                row: {"section": section, "name": name, "url": url}
+                for row, section, name, url in self._db.execute(
+                    f"SELECT row, section, name, url FROM rows WHERE row IN ({','.join('?' * len(top))})", top
+                )
+            }
+        return [(round(float(scores[row]), 3), meta[row]) for row in top if row in meta]
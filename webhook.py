@@ -0,0 +1,80 @@
+import hmac
+import asyncio
+import hashlib
+import logging
+
+from aiohttp import web
+from aiogram.methods import TelegramMethod
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def derive_secret(bot_token):
+    """
+    Секрет вебхука по умолчанию: стабилен между рестартами и не раскрывает сам токен.
+    Telegram допускает 1-256 символов A-Z, a-z, 0-9, _ и -.
+    """
+    return hashlib.sha256(f"webhook:{bot_token}".encode("utf-8")).hexdigest()
+
+
+class WebhookReceiver:
+    """
+    Принимает апдейты Telegram на том же aiohttp-сервере: проверяет секрет, кладет апдейт
+    в ограниченную очередь и сразу отвечает 200. Обрабатывают апдейты workers фоновых задач,
+    поэтому долгий вызов LLM не задерживает остальные. Если очередь полна — 503,
+    и Telegram повторит доставку позже (ничего не теряется).
+    """
+
+    def __init__(self, dispatcher, bot, secret, workers=4, queue_size=100):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.secret = secret
+        self.workers = workers
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.rejected = 0
+        self._tasks = []
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self, timeout=30.0):
+        """
+        Дорабатывает уже принятые апдейты (не дольше timeout), затем гасит воркеры.
+        """
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Webhook shutdown: {self.queue.qsize()} update(s) left unprocessed")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def handle(self, request):
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            logger.warning(f"Webhook call with a bad secret from {request.remote}")
+            return web.Response(status=401, text="Unauthorized")
+        try:
+            update = await request.json()
+        except ValueError:
+            return web.Response(status=400, text="Bad Request")
+        try:
+            self.queue.put_nowait(update)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            logger.warning("Webhook queue is full, asking Telegram to retry")
+            return web.Response(status=503, text="Busy")
+        return web.Response(text="ok")
+
+    async def _worker(self, idx):
+        while True:
+            update = await self.queue.get()
+            try:
+                result = await self.dispatcher.feed_raw_update(self.bot, update)
+                if isinstance(result, TelegramMethod):
+                    await self.dispatcher.silent_call_request(bot=self.bot, result=result)
+            except Exception as e:
+                logger.error(f"Webhook worker {idx}: update {update.get('update_id')} failed: {e}")
+            finally:
+                self.queue.task_done()